@@ -0,0 +1,30 @@
+"""Compare two load-test result files scenario by scenario.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def compare(before: dict, after: dict) -> list[str]:
+    lines = [f"{'scenario':>16} {'metric':>15} {'before':>10} {'after':>10} {'change':>8}"]
+    for name, result in after["scenarios"].items():
+        previous = before["scenarios"].get(name)
+        if previous is None:
+            continue
+        for metric in METRICS:
+            old, new = previous[metric], result[metric]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            lines.append(f"{name:>16} {metric:>15} {old:>10} {new:>10} {change:>8}")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+    with open(args.before) as before, open(args.after) as after:
+        print("\n".join(compare(json.load(before), json.load(after))))
@@ -0,0 +1,304 @@
+"""Generate millions of synthetic users and contacts with bulk writes.
+
+Contacts are spread over users with a Zipf-like skew (a few users own most
+contacts), have unique emails and phones and birthdays with a realistic age
+distribution. Rows are produced by a pool of worker processes in fixed-size
+chunks; each chunk has its own RNG seeded from ``--seed`` and the chunk
+number, so the output is identical for any number of workers. Rows are
+written with ``COPY`` on Postgres (asyncpg) and ``executemany`` on SQLite;
+secondary indexes are dropped for the load and rebuilt afterwards::
+
+    python -m benchmarks.datagen --users 10000 --contacts 2000000 --workers 4 \\
+        --db-url sqlite+aiosqlite:///./bench.db
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sqlite3
+import time
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from urllib.parse import urlsplit
+
+from sqlalchemy import create_engine
+
+from src.entity.models import Base
+
+FIRST_NAMES = [
+    "Olena", "Ivan", "Maryna", "Andrii", "Sofiia", "Taras", "Anna", "Dmytro", "Iryna", "Oleh",
+    "Kateryna", "Mykola", "Yulia", "Serhii", "Natalia", "Pavlo", "Oksana", "Bohdan", "Daria", "Yurii",
+    "Emma", "Liam", "Olivia", "Noah", "Mia", "Lucas", "Ava", "Leo", "Isla", "Hugo",
+]
+SURNAMES = [
+    "Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko", "Melnyk", "Boyko", "Koval",
+    "Oliynyk", "Shevchuk", "Polishchuk", "Lysenko", "Marchenko", "Savchenko", "Rudenko", "Moroz",
+    "Smith", "Johnson", "Brown", "Taylor", "Wilson", "Martin", "Garcia", "Muller", "Rossi", "Novak",
+]
+DOMAINS = ["gmail.com", "ukr.net", "outlook.com", "yahoo.com", "proton.me", "example.org"]
+CONTACT_COLUMNS = (
+    "name", "surname", "email", "phone", "birthday", "created_at", "updated_at", "user_id",
+    "email_normalized", "phone_normalized",
+)
+PHONE_SPACE = 10 ** 10
+PHONE_MULTIPLIER = 7_919_312_437  # coprime with 10 ** 10, so n -> phone is a bijection
+PHONE_OFFSET = 3_141_592_653
+
+# birthdays and timestamps count back from this date, not from the clock,
+# so a seed gives the same rows on any day
+DEFAULT_TODAY = "2024-01-01"
+USER_TABLE_BITS = 20
+BIRTHDAY_TABLE_BITS = 14
+
+_tables: dict = {}
+
+
+def _init_worker(users: int, skew: float, seed: int, today: date) -> None:
+    """Precompute the lookup tables the generator samples from.
+
+    Sampling a user from the Zipf distribution, a name and a birthday is
+    reduced to indexing tables with bits of a single ``getrandbits`` call.
+    """
+    cumulative = list(itertools.accumulate(1 / rank ** skew for rank in range(1, users + 1)))
+    total = cumulative[-1]
+    size = 1 << USER_TABLE_BITS
+    _tables["users"] = [
+        min(bisect_left(cumulative, (i + 0.5) / size * total), users - 1) + 1 for i in range(size)
+    ]
+    _tables["names"] = [
+        (first, last, f"{first.lower()}.{last.lower()}.") for first in FIRST_NAMES for last in SURNAMES
+    ]
+    rnd = random.Random(seed)
+    today_ordinal = today.toordinal()
+    birthdays = []
+    for _ in range(1 << BIRTHDAY_TABLE_BITS):
+        age_days = int(min(max(rnd.gauss(38, 14), 16), 95) * 365.25) + rnd.randrange(365)
+        birthdays.append(date.fromordinal(today_ordinal - age_days))
+    _tables["birthdays"] = birthdays
+    _tables["iso_birthdays"] = [birthday.isoformat() for birthday in birthdays]
+
+
+def generate_chunk(seed: int, chunk: int, start: int, count: int, today: date, iso: bool) -> list[tuple]:
+    """Generate ``count`` contact rows starting at global row number ``start``.
+
+    :param seed: global seed
+    :type seed: int
+    :param chunk: chunk number, mixed into the chunk RNG seed
+    :type chunk: int
+    :param start: global number of the first row; emails and phones derive from it
+    :type start: int
+    :param count: number of rows
+    :type count: int
+    :param today: reference date for timestamps
+    :type today: date
+    :param iso: produce ISO strings instead of date objects (SQLite)
+    :type iso: bool
+    :return: rows in :data:`CONTACT_COLUMNS` order
+    :rtype: list[tuple]
+    """
+    getrandbits = random.Random(seed * 1_000_003 + chunk).getrandbits
+    users = _tables["users"]
+    names = _tables["names"]
+    birthdays = _tables["iso_birthdays" if iso else "birthdays"]
+    name_count = len(names)
+    domains = DOMAINS
+    domain_count = len(domains)
+    user_mask = (1 << USER_TABLE_BITS) - 1
+    birthday_mask = (1 << BIRTHDAY_TABLE_BITS) - 1
+    created = datetime.combine(today, datetime.min.time())
+    created = created.isoformat(" ") if iso else created
+    rows = []
+    append = rows.append
+    for n in range(start, start + count):
+        bits = getrandbits(64)
+        first, last, prefix = names[(bits >> 34) % name_count]
+        # generated emails are lower-case and phones digits only: both are already normalized
+        email = f"{prefix}{n}@{domains[n % domain_count]}"
+        phone = f"{(n * PHONE_MULTIPLIER + PHONE_OFFSET) % PHONE_SPACE:010d}"
+        append(
+            (
+                first,
+                last,
+                email,
+                phone,
+                birthdays[(bits >> USER_TABLE_BITS) & birthday_mask],
+                created,
+                created,
+                users[bits & user_mask],
+                email,
+                phone,
+            )
+        )
+    return rows
+
+
+def chunks(contacts: int, size: int):
+    for chunk, start in enumerate(range(0, contacts, size)):
+        yield chunk, start, min(size, contacts - start)
+
+
+def user_rows(users: int, password: str, today: date, iso: bool) -> list[tuple]:
+    created = datetime.combine(today, datetime.min.time())
+    created = created.isoformat(" ") if iso else created
+    return [
+        (f"user{n}", f"user{n}@example.com", password, True, created, created)
+        for n in range(users)
+    ]
+
+
+USER_COLUMNS = ("username", "email", "password", "confirmed", "created_at", "updated_at")
+# users.contacts_count is kept by the application's writes; bulk loads set it once
+COUNT_CONTACTS = "UPDATE users SET contacts_count = (SELECT count(*) FROM contacts WHERE contacts.user_id = users.id)"
+
+
+def create_schema(sync_url: str) -> None:
+    engine = create_engine(sync_url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+
+def produce(args, executor: ProcessPoolExecutor | None, today: date, iso: bool):
+    """Yield contact chunks in order, keeping at most two chunks per worker in flight."""
+    if executor is None:
+        for chunk, start, count in chunks(args.contacts, args.batch_size):
+            yield generate_chunk(args.seed, chunk, start, count, today, iso)
+        return
+    pending = deque()
+    for chunk, start, count in chunks(args.contacts, args.batch_size):
+        pending.append(executor.submit(generate_chunk, args.seed, chunk, start, count, today, iso))
+        if len(pending) >= args.workers * 2:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def write_sqlite(path: str, args, executor: ProcessPoolExecutor | None, today: date, password: str) -> float:
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    connection.execute("PRAGMA cache_size = -262144")
+    users_sql = f"INSERT INTO users ({', '.join(USER_COLUMNS)}) VALUES ({', '.join('?' * len(USER_COLUMNS))})"
+    contacts_sql = f"INSERT INTO contacts ({', '.join(CONTACT_COLUMNS)}) VALUES ({', '.join('?' * len(CONTACT_COLUMNS))})"
+    indexes = connection.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'contacts' AND sql IS NOT NULL"
+    ).fetchall()
+    with connection:
+        for name, _ in indexes:
+            connection.execute(f"DROP INDEX {name}")
+        connection.executemany(users_sql, user_rows(args.users, password, today, True))
+        for rows in produce(args, executor, today, True):
+            connection.executemany(contacts_sql, rows)
+    started = time.perf_counter()
+    with connection:
+        for _, sql in indexes:
+            connection.execute(sql)
+    index_time = time.perf_counter() - started
+    with connection:
+        connection.execute(COUNT_CONTACTS)
+    connection.close()
+    return index_time
+
+
+async def write_postgres(dsn: str, args, executor: ProcessPoolExecutor | None, today: date, password: str) -> float:
+    import asyncpg
+
+    connections = max(args.workers, 1)
+    pool = await asyncpg.create_pool(dsn, min_size=connections, max_size=connections)
+    async with pool.acquire() as connection:
+        indexes = await connection.fetch(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'contacts' "
+            "AND indexname NOT IN (SELECT conname FROM pg_constraint)"
+        )
+        for index in indexes:
+            await connection.execute(f'DROP INDEX "{index["indexname"]}"')
+        await connection.copy_records_to_table(
+            "users", records=user_rows(args.users, password, today, False), columns=USER_COLUMNS
+        )
+
+    async def copy(rows: list[tuple]) -> None:
+        async with pool.acquire() as connection:
+            await connection.copy_records_to_table("contacts", records=rows, columns=CONTACT_COLUMNS)
+
+    copies: set[asyncio.Task] = set()
+    for rows in produce(args, executor, today, False):
+        if len(copies) >= connections:
+            done, copies = await asyncio.wait(copies, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        copies.add(asyncio.create_task(copy(rows)))
+        await asyncio.sleep(0)
+    await asyncio.gather(*copies)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(pool.execute(index["indexdef"]) for index in indexes))
+    index_time = time.perf_counter() - started
+    await pool.execute(COUNT_CONTACTS)
+    await pool.close()
+    return index_time
+
+
+def main(args) -> None:
+    from src.services.auth import auth_service
+
+    url = urlsplit(args.db_url)
+    dialect = url.scheme.split("+", 1)[0]
+    today = date.fromisoformat(args.today or DEFAULT_TODAY)
+    password = auth_service.get_password_hash("secret")
+
+    if dialect == "sqlite":
+        create_schema(args.db_url.replace("+aiosqlite", ""))
+    else:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        async def create_async_schema():
+            engine = create_async_engine(args.db_url)
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
+                await conn.run_sync(Base.metadata.create_all)
+            await engine.dispose()
+
+        asyncio.run(create_async_schema())
+
+    executor = None
+    if args.workers > 0:
+        executor = ProcessPoolExecutor(
+            args.workers, initializer=_init_worker, initargs=(args.users, args.skew, args.seed, today)
+        )
+    else:
+        _init_worker(args.users, args.skew, args.seed, today)
+    started = time.perf_counter()
+    try:
+        if dialect == "sqlite":
+            index_time = write_sqlite(url.path.lstrip("/"), args, executor, today, password)
+        else:
+            dsn = args.db_url.replace("+asyncpg", "")
+            index_time = asyncio.run(write_postgres(dsn, args, executor, today, password))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    elapsed = time.perf_counter() - started
+    load_time = elapsed - index_time
+    print(
+        f"wrote {args.users} users and {args.contacts} contacts in {load_time:.1f} s "
+        f"({args.contacts / load_time:,.0f} contacts/s), indexes built in {index_time:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", default="sqlite+aiosqlite:///./bench.db")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--contacts", type=int, default=1_000_000)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of contacts per user")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="producer processes; 0 generates in the writer process",
+    )
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--today", default=DEFAULT_TODAY, help="reference date (YYYY-MM-DD) of birthdays and timestamps")
+    main(parser.parse_args())
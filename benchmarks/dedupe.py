@@ -0,0 +1,88 @@
+"""Duplicate detection over one user's contacts with injected near-duplicates.
+
+Generates ``--contacts`` distinct contacts, adds ``--duplicates`` copies of
+random ones with the kind of changes imports make (dots or domain of the
+email, formatting and trunk prefix of the phone, a typo in the surname),
+and reports the time taken, the number of pairs scored against the
+``n * (n - 1) / 2`` of a full comparison and how many injected duplicates
+were found. Run from the project root::
+
+    python -m benchmarks.dedupe --contacts 100000 --duplicates 2000
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from benchmarks.datagen import DOMAINS, FIRST_NAMES, SURNAMES
+from src.services.dedupe import DuplicateFinder
+
+
+def contacts(count: int, duplicates: int, seed: int) -> tuple[list, list[tuple[int, int]]]:
+    rnd = random.Random(seed)
+    first_birthday = date(1950, 1, 1)
+    rows = []
+    for n in range(count):
+        first, last = rnd.choice(FIRST_NAMES), rnd.choice(SURNAMES)
+        rows.append(
+            SimpleNamespace(
+                id=n,
+                name=first,
+                surname=last,
+                email=f"{first.lower()}.{last.lower()}.{n}@{rnd.choice(DOMAINS)}",
+                phone=f"0{n:09d}",
+                birthday=first_birthday + timedelta(days=rnd.randrange(365 * 55)),
+            )
+        )
+    injected = []
+    for n in range(count, count + duplicates):
+        original = rows[rnd.randrange(count)]
+        change = rnd.randrange(3)
+        local = original.email.split("@")[0]
+        surname = original.surname
+        email = f"{local}@{rnd.choice(DOMAINS)}" if change == 0 else f"x{n}@{rnd.choice(DOMAINS)}"
+        phone = f"+38 {original.phone[1:4]} {original.phone[4:]}" if change == 1 else f"9{n:09d}"
+        if change == 2:
+            position = rnd.randrange(1, len(surname))
+            surname = surname[:position] + surname[position + 1 :]
+        rows.append(SimpleNamespace(id=n, name=original.name, surname=surname, email=email.replace(".", "", 1),
+                                    phone=phone, birthday=original.birthday))
+        injected.append((original.id, n))
+    return rows, injected
+
+
+def run(count: int, duplicates: int, threshold: float, window: int, seed: int) -> None:
+    rows, injected = contacts(count, duplicates, seed)
+    finder = DuplicateFinder(threshold, window)
+    pairs = 0
+    score = finder.score
+
+    def counting_score(a, b):
+        nonlocal pairs
+        pairs += 1
+        return score(a, b)
+
+    finder.score = counting_score
+    started = time.perf_counter()
+    groups = finder.find(rows)
+    elapsed = time.perf_counter() - started
+
+    group_of = {row.id: number for number, group in enumerate(groups) for row in group["contacts"]}
+    found = sum(1 for a, b in injected if a in group_of and group_of.get(a) == group_of.get(b))
+    total = len(rows)
+    print(f"contacts: {total} ({duplicates} injected duplicates)")
+    print(f"time: {elapsed:.2f} s")
+    print(f"pairs scored: {pairs} of {total * (total - 1) // 2} ({pairs / (total * (total - 1) / 2):.5%})")
+    print(f"groups: {len(groups)}, injected duplicates found: {found}/{duplicates}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contacts", type=int, default=100_000)
+    parser.add_argument("--duplicates", type=int, default=2_000)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--window", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.contacts, args.duplicates, args.threshold, args.window, args.seed)
@@ -0,0 +1,69 @@
+"""Per-request overhead of :class:`IPFilterMiddleware` with a large ban list.
+
+Run from the project root::
+
+    python -m benchmarks.ip_filter --ranges 100000 --requests 200000
+"""
+import argparse
+import asyncio
+import random
+import time
+from ipaddress import IPv4Address, IPv6Address
+
+from src.middleware.ip_filter import BanList, IPFilterMiddleware
+
+
+def random_ranges(count: int, seed: int) -> list[str]:
+    rnd = random.Random(seed)
+    ranges = []
+    for _ in range(count):
+        if rnd.random() < 0.8:
+            prefix = rnd.randint(16, 32)
+            ranges.append(f"{IPv4Address(rnd.getrandbits(32))}/{prefix}")
+        else:
+            prefix = rnd.randint(32, 128)
+            ranges.append(f"{IPv6Address(rnd.getrandbits(128))}/{prefix}")
+    return ranges
+
+
+async def run(ranges: int, requests: int, seed: int) -> None:
+    rnd = random.Random(seed + 1)
+    started = time.perf_counter()
+    ban_list = BanList(random_ranges(ranges, seed))
+    build_ms = (time.perf_counter() - started) * 1000
+
+    async def app(scope, receive, send):
+        pass
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    clients = [
+        str(IPv4Address(rnd.getrandbits(32))) if i % 5 else str(IPv6Address(rnd.getrandbits(128)))
+        for i in range(1000)
+    ]
+    scopes = [{"type": "http", "client": (host, 1234)} for host in clients]
+
+    results = {}
+    for name, handler in (("bare app", app), ("IPFilterMiddleware", IPFilterMiddleware(app, ban_list))):
+        started = time.perf_counter()
+        for i in range(requests):
+            await handler(scopes[i % len(scopes)], receive, send)
+        results[name] = (time.perf_counter() - started) / requests * 1e6
+
+    print(f"ban list: {ban_list.size} ranges, built in {build_ms:.1f} ms")
+    for name, micros in results.items():
+        print(f"{name:>20}: {micros:.2f} us/request")
+    print(f"{'overhead':>20}: {results['IPFilterMiddleware'] - results['bare app']:.2f} us/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ranges", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(run(args.ranges, args.requests, args.seed))
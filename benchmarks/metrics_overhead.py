@@ -0,0 +1,61 @@
+"""Hot-path cost of the metrics instrumentation.
+
+Measures a bare ``Histogram.observe`` / ``Counter.inc`` and the per-request
+overhead :class:`MetricsMiddleware` adds around a trivial ASGI app::
+
+    python -m benchmarks.metrics_overhead --requests 200000
+"""
+import argparse
+import asyncio
+import time
+
+from src.middleware.metrics import MetricsMiddleware
+from src.services.metrics import Counter, Histogram
+
+
+class _Route:
+    path = "/api/contacts/"
+
+
+async def run(requests: int) -> None:
+    histogram = Histogram("bench_seconds", "Benchmark.", ("method", "route"))
+    counter = Counter("bench_total", "Benchmark.", ("method", "route", "status"))
+    started = time.perf_counter()
+    for i in range(requests):
+        histogram.observe(0.003, "GET", "/api/contacts/")
+    observe_ns = (time.perf_counter() - started) / requests * 1e9
+    started = time.perf_counter()
+    for i in range(requests):
+        counter.inc("GET", "/api/contacts/", 200)
+    inc_ns = (time.perf_counter() - started) / requests * 1e9
+
+    async def app(scope, receive, send):
+        scope["route"] = _Route
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"[]"})
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    results = {}
+    for name, handler in (("bare app", app), ("MetricsMiddleware", MetricsMiddleware(app))):
+        started = time.perf_counter()
+        for i in range(requests):
+            await handler({"type": "http", "method": "GET", "path": "/api/contacts/"}, receive, send)
+        results[name] = (time.perf_counter() - started) / requests * 1e6
+
+    print(f"Histogram.observe: {observe_ns:.0f} ns")
+    print(f"Counter.inc: {inc_ns:.0f} ns")
+    for name, micros in results.items():
+        print(f"{name:>18}: {micros:.2f} us/request")
+    print(f"{'overhead':>18}: {results['MetricsMiddleware'] - results['bare app']:.2f} us/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
@@ -0,0 +1,143 @@
+"""Per-user query latency on Postgres before and after hash partitioning ``contacts``.
+
+Measures the per-user queries of the repository (a page of contacts, an
+exact email lookup, all of a user's contacts as loaded by the typeahead
+and duplicate finder, birthdays of a month) on the plain table, converts it
+with the same statements as the partitioning migration, and measures them
+again for the same users. Besides latency, the shared buffers each query
+touches are read from ``EXPLAIN (ANALYZE, BUFFERS)``. The table is
+converted back afterwards unless ``--keep`` is given. Needs Postgres; load
+the rows first with ``--load`` or ``benchmarks.datagen``::
+
+    python -m benchmarks.partitioning --db-url postgresql+asyncpg://postgres:pw@localhost/bench \\
+        --load --users 100000 --contacts 10000000 --partitions 16
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks import datagen
+from src.database.partitioning import partition_contacts, unpartition_contacts
+
+QUERIES = {
+    "page": ("SELECT * FROM contacts WHERE user_id = $1 LIMIT 10", lambda user: (user["user_id"],)),
+    "email": (
+        "SELECT * FROM contacts WHERE user_id = $1 AND email_normalized = $2",
+        lambda user: (user["user_id"], user["email"]),
+    ),
+    "all": ("SELECT id, name, surname, email FROM contacts WHERE user_id = $1", lambda user: (user["user_id"],)),
+    "birthdays": (
+        "SELECT * FROM contacts WHERE user_id = $1 AND extract(month FROM birthday) = $2",
+        lambda user: (user["user_id"], user["month"]),
+    ),
+}
+EXPLAIN_SAMPLES = 20
+
+
+async def is_partitioned(connection) -> bool:
+    return await connection.fetchval(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'contacts'::regclass)"
+    )
+
+
+async def convert(connection, statements: list[str]) -> float:
+    started = time.perf_counter()
+    async with connection.transaction():
+        for statement in statements:
+            await connection.execute(statement)
+    return time.perf_counter() - started
+
+
+async def sample_users(connection, count: int, seed: int) -> list[dict]:
+    # users weighted by their contacts, like the requests they make
+    rows = await connection.fetch(
+        "SELECT user_id, email_normalized AS email, extract(month FROM birthday)::int AS month "
+        "FROM contacts TABLESAMPLE SYSTEM (1) LIMIT $1",
+        count * 10,
+    )
+    rows = [dict(row) for row in rows]
+    random.Random(seed).shuffle(rows)
+    return rows[:count]
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)] * 1000
+
+
+async def measure(connection, users: list[dict]) -> dict[str, dict[str, float]]:
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        statement = await connection.prepare(sql)
+        samples = []
+        for user in users:
+            started = time.perf_counter()
+            await statement.fetch(*params(user))
+            samples.append(time.perf_counter() - started)
+        samples.sort()
+        buffers = 0
+        for user in users[:EXPLAIN_SAMPLES]:
+            plan = await connection.fetchval(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", *params(user))
+            plan = json.loads(plan)[0]["Plan"]
+            buffers += plan["Shared Hit Blocks"] + plan["Shared Read Blocks"]
+        results[name] = {
+            "p50_ms": percentile(samples, 0.5),
+            "p99_ms": percentile(samples, 0.99),
+            "buffers": buffers / min(len(users), EXPLAIN_SAMPLES),
+        }
+    return results
+
+
+def report(before: dict, after: dict) -> list[str]:
+    lines = [f"{'query':>10} {'metric':>8} {'plain':>10} {'partitioned':>12} {'change':>8}"]
+    for name, result in after.items():
+        for metric, new in result.items():
+            old = before[name][metric]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            lines.append(f"{name:>10} {metric:>8} {old:>10.2f} {new:>12.2f} {change:>8}")
+    return lines
+
+
+async def run(args) -> None:
+    import asyncpg
+
+    connection = await asyncpg.connect(args.db_url.replace("+asyncpg", ""))
+    try:
+        if await is_partitioned(connection):
+            print(f"converted back to a plain table in {await convert(connection, unpartition_contacts()):.1f} s")
+        await connection.execute("ANALYZE contacts")
+        users = await sample_users(connection, args.queries, args.seed)
+        # first pass warms the cache, the second is measured
+        await measure(connection, users)
+        before = await measure(connection, users)
+
+        elapsed = await convert(connection, partition_contacts(args.partitions))
+        print(f"partitioned into {args.partitions} partitions in {elapsed:.1f} s")
+        await measure(connection, users)
+        after = await measure(connection, users)
+        print("\n".join(report(before, after)))
+
+        if not args.keep:
+            await convert(connection, unpartition_contacts())
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", required=True, help="postgresql+asyncpg:// URL")
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=2_000, help="users sampled, one query of each kind per user")
+    parser.add_argument("--keep", action="store_true", help="leave the table partitioned")
+    parser.add_argument("--load", action="store_true", help="generate the rows with benchmarks.datagen first")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--contacts", type=int, default=10_000_000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if args.load:
+        datagen.main(argparse.Namespace(**vars(args), today=datagen.DEFAULT_TODAY))
+    asyncio.run(run(args))
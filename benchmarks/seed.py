@@ -0,0 +1,116 @@
+"""Seed a database with benchmark users and contacts.
+
+Users are ``bench-user-<n>@example.com`` with password ``bench1``; contact
+``n`` has email ``c<n>@example.com`` and phone ``<n>`` zero-padded to ten
+digits, so scenarios can address any contact without querying first.
+
+    python -m benchmarks.seed --scale 100k --db-url sqlite+aiosqlite:///./bench.db
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.database.counters import CONTACTS_COUNT
+from src.entity.models import Base, Contact, User
+from src.services.auth import auth_service
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+PASSWORD = "bench1"
+CHUNK = 5_000
+
+
+def parse_scale(value: str) -> int:
+    return SCALES.get(value.lower()) or int(value)
+
+
+def users_for(contacts: int) -> int:
+    return max(10, contacts // 1_000)
+
+
+def user_email(n: int) -> str:
+    return f"bench-user-{n}@example.com"
+
+
+def contact_email(n: int) -> str:
+    return f"c{n}@example.com"
+
+
+async def seed(engine: AsyncEngine, contacts: int, seed: int = 42) -> int:
+    """Create the schema and insert benchmark users and ``contacts`` contacts.
+
+    Seeding is skipped when the database already holds exactly that many
+    contacts and :func:`users_for` users; any other database, including one
+    grown by the ``create`` scenario, is reseeded.
+
+    :param engine: target engine
+    :type engine: AsyncEngine
+    :param contacts: number of contacts
+    :type contacts: int
+    :param seed: random seed
+    :type seed: int
+    :return: number of users
+    :rtype: int
+    """
+    users = users_for(contacts)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        existing = (await conn.execute(select(func.count()).select_from(Contact))).scalar_one()
+        existing_users = (await conn.execute(select(func.count()).select_from(User))).scalar_one()
+    if (existing, existing_users) == (contacts, users):
+        return users
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    rnd = random.Random(seed)
+    password = auth_service.get_password_hash(PASSWORD)
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        # the tables were just recreated, so users get ids 1..users in order
+        await conn.execute(
+            insert(User),
+            [
+                {"username": f"bench{n}", "email": user_email(n), "password": password, "confirmed": True}
+                for n in range(users)
+            ],
+        )
+        first_birthday = date(1950, 1, 1)
+        for start in range(0, contacts, CHUNK):
+            await conn.execute(
+                insert(Contact),
+                [
+                    {
+                        "name": f"name{n}",
+                        "surname": f"surname{n % 997}",
+                        "email": contact_email(n),
+                        "phone": f"{n:010d}",
+                        "birthday": first_birthday + timedelta(days=rnd.randrange(365 * 55)),
+                        "user_id": n % users + 1,
+                    }
+                    for n in range(start, min(start + CHUNK, contacts))
+                ],
+            )
+        # bulk inserts bypass the repository, which keeps the counter otherwise
+        await conn.execute(text(f"UPDATE users SET contacts_count = {CONTACTS_COUNT}"))
+    print(f"seeded {users} users and {contacts} contacts in {time.perf_counter() - started:.1f} s")
+    return users
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="10k", help="10k, 100k, 1m or a number of contacts")
+    parser.add_argument("--db-url", default="sqlite+aiosqlite:///./bench.db")
+    args = parser.parse_args()
+
+    async def main():
+        engine = create_async_engine(args.db_url)
+        await seed(engine, parse_scale(args.scale))
+        await engine.dispose()
+
+    asyncio.run(main())
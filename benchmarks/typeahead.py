@@ -0,0 +1,80 @@
+"""Latency of the contact typeahead index for one user with many contacts.
+
+Measures building a :class:`PrefixIndex` from ``--contacts`` rows, the
+latency of prefix queries of one to four characters (as typed, keystroke
+by keystroke) and of incremental adds and removes. Run from the project
+root::
+
+    python -m benchmarks.typeahead --contacts 50000 --queries 20000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.datagen import DOMAINS, FIRST_NAMES, SURNAMES
+from src.services.typeahead import PrefixIndex
+
+
+def contacts(count: int, seed: int) -> list[tuple[int, str, str, str]]:
+    rnd = random.Random(seed)
+    rows = []
+    for n in range(1, count + 1):
+        first, last = rnd.choice(FIRST_NAMES), rnd.choice(SURNAMES)
+        rows.append((n, first, last, f"{first.lower()}.{last.lower()}.{n}@{rnd.choice(DOMAINS)}"))
+    return rows
+
+
+def percentiles(samples: list[float]) -> str:
+    samples.sort()
+    p50 = samples[len(samples) // 2] * 1e6
+    p99 = samples[int(len(samples) * 0.99)] * 1e6
+    return f"p50 {p50:8.1f} us  p99 {p99:8.1f} us  max {samples[-1] * 1e6:8.1f} us"
+
+
+def run(count: int, queries: int, limit: int, seed: int) -> None:
+    rows = contacts(count, seed)
+    started = time.perf_counter()
+    index = PrefixIndex(rows)
+    print(f"index: {count} contacts, {len(index.entries)} keys, built in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    rnd = random.Random(seed + 1)
+    words = [field.lower() for _, name, surname, email in rows[:1000] for field in (name, surname, email)]
+    for length in (1, 2, 3, 4):
+        samples = []
+        for _ in range(queries):
+            prefix = rnd.choice(words)[:length]
+            started = time.perf_counter()
+            index.search(prefix, limit)
+            samples.append(time.perf_counter() - started)
+        print(f"{length}-char prefix: {percentiles(samples)}")
+
+    samples = []
+    for _ in range(queries):
+        _, name, surname, _ = rnd.choice(rows)
+        query = f"{name[:rnd.randint(1, len(name))]} {surname[:rnd.randint(1, 3)]}"
+        started = time.perf_counter()
+        index.search(query, limit)
+        samples.append(time.perf_counter() - started)
+    print(f"   two words: {percentiles(samples)}")
+
+    added, removed = [], []
+    for n in range(count + 1, count + 1 + min(queries, 5000)):
+        _, name, surname, email = rnd.choice(rows)
+        started = time.perf_counter()
+        index.add(n, name, surname, f"new.{n}.{email}")
+        added.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        index.remove(n)
+        removed.append(time.perf_counter() - started)
+    print(f"         add: {percentiles(added)}")
+    print(f"      remove: {percentiles(removed)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contacts", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.contacts, args.queries, args.limit, args.seed)
@@ -1,78 +1,157 @@
-import redis.asyncio as redis
-from fastapi import FastAPI, Depends, HTTPException, Request, status
-from fastapi_limiter import FastAPILimiter
+import asyncio
+import contextlib
+
+from fastapi import APIRouter, FastAPI, Depends, HTTPException
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.middleware.cors import CORSMiddleware
-from src.database.db import get_db
-from src.routes import contacts, auth, users
+from fastapi.responses import PlainTextResponse
+from src.database.db import get_db, sessionmanager
+from src.routes import contacts, auth, users, admin
 from src.conf.config import config
-from ipaddress import ip_address
-from typing import Callable
-from fastapi.responses import JSONResponse
-
-app = FastAPI()
-origins = ["*"]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-banned_ips = [
-    ip_address("192.168.1.1"),
-    ip_address("192.168.1.2"),
-]
-
-app.include_router(auth.router, prefix="/api")
-app.include_router(contacts.router, prefix="/api")
-app.include_router(users.router, prefix="/api")
-
-
-@app.middleware("http")
-async def ban_ips(request: Request, call_next: Callable):
+from src.middleware.coalesce import CoalescingMiddleware
+from src.middleware.idempotency import IdempotencyMiddleware
+from src.middleware.drain import DrainMiddleware, InFlightRequests
+from src.middleware.ip_filter import BanList, IPFilterMiddleware
+from src.middleware.loop_watchdog import LoopWatchdogMiddleware
+from src.middleware.metrics import MetricsMiddleware
+from src.middleware.profiler import ProfilerMiddleware
+from src.middleware.tracing import TracingMiddleware
+from src.services import metrics
+from src.services.auth import auth_service
+from src.services.contact_events import contact_events
+from src.services.email import mailer
+from src.services.loop_watchdog import loop_watchdog
+from src.services.tracing import tracer
+from src.services.rate_limit import rate_limiter
+from src.services.query_budget import query_budget
+from src.services.redis_pool import redis_pool
+from src.services.token_denylist import token_denylist
+
+router = APIRouter()
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the per-process resources, warm them up and tear them down.
+
+    Everything holding sockets or threads is built here, i.e. in the worker
+    after any fork, never at import time. On shutdown new requests are
+    refused, the ones in flight (and their background tasks) get
+    ``SHUTDOWN_TIMEOUT`` seconds to finish, and only then are the pools
+    closed.
+    """
+    sessionmanager.init()
+    redis_client = redis_pool.start()
+    auth_service.start_hashing_pool(config.HASHING_WORKERS)
+    mailer.start()
+    users.configure_cloudinary()
+
+    await sessionmanager.warmup()
+    # Redis being down must not keep the app from starting: the users of
+    # the pool degrade on their own and reconnect when it is back
     try:
-        ip = ip_address(request.client.host)
-        if ip in banned_ips:
-            return JSONResponse(
-                status_code=status.HTTP_403_FORBIDDEN,
-                content={"detail": "You are banned"},
-            )
-    except ValueError:
-        pass
-    response = await call_next(request)
-    return response
+        await redis_client.ping()
+        # BANNED_IPS only seeds a new list: addresses unbanned in Redis since
+        # must not come back with every restart
+        if config.BANNED_IPS and not await redis_client.exists(config.BANNED_IPS_KEY):
+            await redis_client.sadd(config.BANNED_IPS_KEY, *config.BANNED_IPS)
+    except Exception as err:
+        print(f"Error in Redis warmup: {err}")
+
+    rate_limiter.start(redis_client)
+    ban_list_watcher = asyncio.create_task(
+        app.state.ban_list.watch(redis_client, config.BANNED_IPS_KEY, config.BANNED_IPS_CHANNEL)
+    )
+    denylist_watcher = asyncio.create_task(token_denylist.watch())
+    events_watcher = asyncio.create_task(contact_events.watch())
+    try:
+        yield
+    finally:
+        # event streams never finish on their own; end them before draining
+        contact_events.close()
+        await app.state.in_flight.drain(config.SHUTDOWN_TIMEOUT)
+        ban_list_watcher.cancel()
+        denylist_watcher.cancel()
+        events_watcher.cancel()
+        await rate_limiter.stop()
+        await redis_pool.close()
+        await asyncio.to_thread(auth_service.stop_hashing_pool)
+        mailer.stop()
+        await sessionmanager.close()
+        await tracer.exporter.flush()
+        loop_watchdog.stop()
+
 
+def create_app() -> FastAPI:
+    """Build the application.
 
-redis_client = None
+    Usable directly as a uvicorn factory (``uvicorn --factory main:create_app``);
+    ``main:app`` is an instance built at import.
 
+    :return: the application
+    :rtype: FastAPI
+    """
+    app = FastAPI(lifespan=lifespan)
+    origins = ["*"]
 
-@app.on_event("startup")
-async def startup():
-    global redis_client
-    redis_client = redis.Redis(
-        host=config.REDIS_DOMAIN,
-        port=config.REDIS_PORT,
-        db=0,
-        password=config.REDIS_PASSWORD,
+    app.add_middleware(
+        CoalescingMiddleware,
+        paths=config.COALESCE_PATHS,
+        redis_pool=redis_pool if config.COALESCE_REDIS else None,
+        redis_ttl=config.COALESCE_REDIS_TTL,
+    )
+    app.add_middleware(
+        IdempotencyMiddleware,
+        redis_pool=redis_pool,
+        paths=config.IDEMPOTENCY_PATHS,
+        ttl=config.IDEMPOTENCY_TTL,
+        wait=config.IDEMPOTENCY_WAIT,
+        identify=auth_service.access_token_subject,
     )
-    await FastAPILimiter.init(redis_client)
+    app.add_middleware(
+        ProfilerMiddleware, secret=config.PROFILE_SECRET, directory=config.PROFILE_DIR
+    )
+    app.add_middleware(TracingMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    if config.LOOP_WATCHDOG_THRESHOLD_MS > 0:
+        app.add_middleware(LoopWatchdogMiddleware, watchdog=loop_watchdog)
 
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Total-Count", "X-Total-Pages", "X-Total-Count-Mode"],
+    )
+    app.state.ban_list = BanList(config.BANNED_IPS)
+    app.add_middleware(IPFilterMiddleware, ban_list=app.state.ban_list)
+    app.state.in_flight = InFlightRequests()
+    app.add_middleware(DrainMiddleware, in_flight=app.state.in_flight)
 
-@app.on_event("shutdown")
-async def shutdown():
-    if redis_client:
-        await redis_client.close()
+    app.include_router(auth.router, prefix="/api")
+    app.include_router(contacts.router, prefix="/api")
+    app.include_router(users.router, prefix="/api")
+    app.include_router(admin.router, prefix="/api")
+    app.include_router(router)
+    return app
 
 
-@app.get("/")
+@router.get("/")
+@query_budget(sql=0)
 def index():
     return {"message": "Contacts"}
 
 
-@app.get("/api/healthchecker")
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+@query_budget(sql=0)
+def read_metrics():
+    return metrics.registry.render()
+
+
+@router.get("/api/healthchecker")
+@query_budget(sql=1)
 async def healthchecker(db: AsyncSession = Depends(get_db)):
     try:
         # Make request
@@ -85,4 +164,8 @@ async def healthchecker(db: AsyncSession = Depends(get_db)):
         return {"message": "Welcome to FastAPI!"}
     except Exception as e:
         print(e)
+        metrics.healthcheck_failures.inc()
         raise HTTPException(status_code=500, detail="Error connecting to the database")
+
+
+app = create_app()
@@ -60,7 +60,9 @@ def run_migrations_offline() -> None:
 
 
 def run_migrations(connection: Connection):
-    context.configure(connection=connection, target_metadata=target_metadata)
+    # the autocommit blocks of src.database.online_migrations commit the
+    # current transaction: keep it to the revision they run in
+    context.configure(connection=connection, target_metadata=target_metadata, transaction_per_migration=True)
     with context.begin_transaction():
         context.run_migrations()
 
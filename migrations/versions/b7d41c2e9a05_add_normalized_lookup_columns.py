@@ -0,0 +1,37 @@
+"""add normalized lookup columns
+
+Revision ID: b7d41c2e9a05
+Revises: f98f16eb6d7b
+Create Date: 2026-10-19 10:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41c2e9a05'
+down_revision: Union[str, None] = 'f98f16eb6d7b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('email_normalized', sa.String(length=50), nullable=True))
+    op.add_column('contacts', sa.Column('phone_normalized', sa.String(length=10), nullable=True))
+    # backfill with the same rules as src.entity.models.normalize_email / normalize_phone
+    op.execute(
+        "UPDATE contacts SET email_normalized = lower(trim(email)), "
+        "phone_normalized = regexp_replace(phone, '\\D', '', 'g')"
+    )
+    op.create_index('ix_contacts_user_id_email_normalized', 'contacts', ['user_id', 'email_normalized'], unique=False)
+    op.create_index('ix_contacts_user_id_phone_normalized', 'contacts', ['user_id', 'phone_normalized'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_phone_normalized', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_email_normalized', table_name='contacts')
+    op.drop_column('contacts', 'phone_normalized')
+    op.drop_column('contacts', 'email_normalized')
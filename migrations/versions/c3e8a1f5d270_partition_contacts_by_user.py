@@ -0,0 +1,32 @@
+"""partition contacts by user
+
+Revision ID: c3e8a1f5d270
+Revises: b7d41c2e9a05
+Create Date: 2026-10-19 14:03:52.518730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from src.conf.config import config
+from src.database.partitioning import partition_contacts, unpartition_contacts
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8a1f5d270'
+down_revision: Union[str, None] = 'b7d41c2e9a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # hash partitions on user_id, CONTACTS_PARTITIONS of them; copies every
+    # row while holding the table lock, see src.database.partitioning
+    for statement in partition_contacts(config.CONTACTS_PARTITIONS):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for statement in unpartition_contacts():
+        op.execute(statement)
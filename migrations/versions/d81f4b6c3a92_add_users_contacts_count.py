@@ -0,0 +1,39 @@
+"""add users contacts count
+
+Revision ID: d81f4b6c3a92
+Revises: c3e8a1f5d270
+Create Date: 2026-10-19 16:41:07.284913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.database.counters import CONTACTS_COUNT, CONTACTS_COUNT_BACKFILL
+from src.database.online_migrations import backfill, reset_backfill
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81f4b6c3a92'
+down_revision: Union[str, None] = 'c3e8a1f5d270'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # a constant default is a catalog-only change; the counts are filled in
+    # chunks of users while the application keeps them up to date; writes
+    # by the old code until the deploy are fixed by src.database.counters
+    op.add_column('users', sa.Column('contacts_count', sa.Integer(), server_default='0', nullable=False))
+    backfill(
+        'users',
+        f'contacts_count = {CONTACTS_COUNT}',
+        name=CONTACTS_COUNT_BACKFILL,
+        chunk_size=1000,
+    )
+
+
+def downgrade() -> None:
+    reset_backfill(CONTACTS_COUNT_BACKFILL)
+    op.drop_column('users', 'contacts_count')
@@ -16,9 +16,48 @@ class Settings(BaseSettings):
     REDIS_DOMAIN: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: str | None = None
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 5
     CLOUDINARY_NAME: str = "test"
     CLOUDINARY_IP_KEY: int = 11111111111111
     CLOUDINARY_IP_SECRET: str = "secret"
+    BANNED_IPS: list[str] = ["192.168.1.1", "192.168.1.2"]
+    BANNED_IPS_KEY: str = "banned_ips"
+    BANNED_IPS_CHANNEL: str = "banned_ips:reload"
+    TRACE_SAMPLE_RATIO: float = 0.0
+    TRACE_EXPORT_PATH: str = "traces/spans.jsonl"
+    SLOW_QUERY_MS: float = 200
+    ADMIN_TOKEN: str | None = None
+    PROFILE_SECRET: str | None = None
+    PROFILE_DIR: str = "profiles"
+    LOOP_WATCHDOG_THRESHOLD_MS: float = 100
+    LOOP_WATCHDOG_STRICT: bool = False
+    HASHING_WORKERS: int = 4
+    TOKEN_DENYLIST_KEY: str = "revoked_tokens"
+    TOKEN_DENYLIST_CAPACITY: int = 100_000
+    TOKEN_DENYLIST_ERROR_RATE: float = 0.001
+    COALESCE_PATHS: list[str] = ["/api/contacts/", "/api/contacts/birthdays"]
+    COALESCE_REDIS: bool = False
+    COALESCE_REDIS_TTL: float = 1.0
+    TYPEAHEAD_MAX_USERS: int = 1000
+    TYPEAHEAD_TTL: float = 60
+    DEDUPE_THRESHOLD: float = 0.7
+    DEDUPE_WINDOW: int = 50
+    IDEMPOTENCY_PATHS: list[str] = [
+        "/api/contacts/",
+        "/api/contacts/update",
+        "/api/contacts/delete",
+        "/api/contacts/batch",
+        "/api/contacts/merge",
+    ]
+    IDEMPOTENCY_TTL: float = 86400
+    IDEMPOTENCY_WAIT: float = 30
+    CONTACT_EVENTS_PREFIX: str = "contact_events"
+    CONTACT_EVENTS_QUEUE_SIZE: int = 100
+    CONTACT_EVENTS_HEARTBEAT: float = 15
+    # read by the partitioning migration only; changing it later needs a new one
+    CONTACTS_PARTITIONS: int = 16
+    SHUTDOWN_TIMEOUT: float = 30
 
     @field_validator("ALGORITHM")
     @classmethod
@@ -6,3 +6,8 @@ INVALID_REFRESH_TOKEN = "Invalid refresh token"
 VERIFICATION_ERROR = "Verification error"
 NO_CONTACT_FOUND = "No contact found"
 BIRTHDAYS_NOT_FOUND = "No birthdays found"
+MERGE_PRIMARY_IN_DUPLICATES = "Primary contact cannot be merged into itself"
+MERGE_UNKNOWN_SOURCE = "Kept values must come from the merged contacts"
+CONTACT_EXISTS = "Contact with this email or phone already exists"
+BATCH_NOT_APPLIED = "Not applied because another operation failed"
+LOGOUT_NOT_REVOKED = "Logged out, but the access token could not be revoked and stays valid until it expires"
@@ -0,0 +1,83 @@
+"""Reconciliation of ``users.contacts_count`` with the rows of ``contacts``.
+
+The repository keeps the counter in step with each write in the same
+transaction, but rows written behind its back (raw SQL, restores, writes
+by code deployed before the counter existed, between the backfill of its
+migration and the deploy) leave it off. :func:`reconcile_contacts_count`
+recounts the users whose counter drifted; run it after each deploy::
+
+    python -m src.database.counters
+"""
+import argparse
+import asyncio
+from typing import Callable
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.conf.config import config
+from src.database.online_migrations import backfill, reset_backfill
+
+CONTACTS_COUNT_BACKFILL = "d81f4b6c3a92_contacts_count"
+CONTACTS_COUNT = "(SELECT count(*) FROM contacts WHERE contacts.user_id = users.id)"
+
+
+def reconcile_contacts_count(
+    connection: Connection | None = None,
+    chunk_size: int = 1000,
+    pause: float = 0.1,
+    report: Callable[[str], None] = print,
+) -> int:
+    """Recount ``users.contacts_count`` of every user whose counter differs from the contacts.
+
+    Forgets the checkpoint of the migration's backfill and runs it again,
+    in chunks of users, updating only the drifted rows. Concurrent writes
+    keep working; a count taken while a write is in flight is corrected by
+    that write's own increment.
+
+    :param connection: connection in autocommit mode; defaults to the migration's
+    :type connection: Connection | None
+    :param chunk_size: users per chunk
+    :type chunk_size: int
+    :param pause: seconds to sleep between chunks
+    :type pause: float
+    :param report: receives a progress line after each chunk
+    :type report: Callable[[str], None]
+    :return: number of users whose counter was corrected
+    :rtype: int
+    """
+    reset_backfill(CONTACTS_COUNT_BACKFILL, connection=connection)
+    return backfill(
+        "users",
+        f"contacts_count = {CONTACTS_COUNT}",
+        name=CONTACTS_COUNT_BACKFILL,
+        where=f"contacts_count <> {CONTACTS_COUNT}",
+        chunk_size=chunk_size,
+        pause=pause,
+        connection=connection,
+        report=report,
+    )
+
+
+async def reconcile(engine: AsyncEngine, **kwargs) -> int:
+    """Run :func:`reconcile_contacts_count` on an autocommit connection of ``engine``."""
+    async with engine.connect() as connection:
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        return await connection.run_sync(lambda sync: reconcile_contacts_count(connection=sync, **kwargs))
+
+
+async def main(db_url: str, chunk_size: int, pause: float) -> None:
+    engine = create_async_engine(db_url)
+    try:
+        await reconcile(engine, chunk_size=chunk_size, pause=pause)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", default=config.DB_URL)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.1)
+    args = parser.parse_args()
+    asyncio.run(main(args.db_url, args.chunk_size, args.pause))
@@ -1,20 +1,97 @@
 import contextlib
+import os
 
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from src.conf.config import config
+from src.database.query_log import query_log
+from src.services import metrics, tracing
+
+
+def enable_sqlite_savepoints(engine: AsyncEngine) -> None:
+    """Make SQLite transactions start where SQLAlchemy begins them.
+
+    The ``sqlite3`` driver defers ``BEGIN`` until the first write, so a
+    ``SAVEPOINT`` issued before it opens and commits a transaction of its
+    own. Turning the driver's handling off and emitting ``BEGIN`` from the
+    engine keeps nested transactions inside the outer one.
+
+    :param engine: engine connected to SQLite
+    :type engine: AsyncEngine
+    """
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def begin(connection):
+        # autocommit connections, such as backfills, commit each statement
+        if connection.get_execution_options().get("isolation_level") != "AUTOCOMMIT":
+            connection.exec_driver_sql("BEGIN")
 
 
 class DatabaseSessionManager:
+    """Own the engine and session factory of the current process.
+
+    The engine is created on first use rather than at import time, so a
+    process forked after importing the app (gunicorn ``--preload``, uvicorn
+    ``--workers``) never shares pooled connections with its parent: the
+    child drops the inherited engine in an ``os.register_at_fork`` hook
+    and builds its own.
+    """
+
     def __init__(self, url: str):
-        self._engine: AsyncEngine | None = create_async_engine(url)
-        self._session_maker: async_sessionmaker = async_sessionmaker(
-            autoflush=False, autocommit=False, bind=self._engine
+        self.url = url
+        self._engine: AsyncEngine | None = None
+        self._session_maker: async_sessionmaker | None = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            self.init()
+        return self._engine
+
+    def init(self) -> None:
+        """Create the engine and session factory if they do not exist yet."""
+        if self._engine is not None:
+            return
+        self._engine = create_async_engine(self.url)
+        if self._engine.dialect.name == "sqlite":
+            enable_sqlite_savepoints(self._engine)
+        metrics.instrument_engine(self._engine)
+        tracing.instrument_engine(self._engine)
+        query_log.instrument_engine(self._engine)
+        # entities returned by INSERT/UPDATE ... RETURNING must stay readable after commit
+        self._session_maker = async_sessionmaker(
+            autoflush=False, autocommit=False, expire_on_commit=False, bind=self._engine
         )
 
+    def _after_fork(self) -> None:
+        if self._engine is not None:
+            # leave the parent's connections alone, just stop using them
+            self._engine.sync_engine.dispose(close=False)
+        self._engine = None
+        self._session_maker = None
+
+    async def warmup(self) -> None:
+        """Open a pooled connection, so the first request does not pay for it."""
+        async with self.engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    async def close(self) -> None:
+        """Close all pooled connections; the next use creates a fresh engine."""
+        if self._engine is not None:
+            await self._engine.dispose()
+        self._engine = None
+        self._session_maker = None
+
     @contextlib.asynccontextmanager
     async def session(self):
         if self._session_maker is None:
-            raise Exception("Session is not initialized")
+            self.init()
         session = self._session_maker()
         try:
             yield session
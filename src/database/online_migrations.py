@@ -0,0 +1,261 @@
+"""Helpers for migrations that must not lock large tables.
+
+A migration adding a derived column does it in three steps: ``op.add_column``
+with a nullable column (a catalog-only change), :func:`backfill` to fill it
+in small committed chunks, and :func:`create_index_concurrently` for its
+indexes::
+
+    def upgrade() -> None:
+        op.add_column("contacts", sa.Column("email_domain", sa.String(50), nullable=True))
+        backfill(
+            "contacts",
+            "email_domain = split_part(email, '@', 2)",
+            where="email_domain IS NULL",
+            name="c0ffee123456_email_domain",
+        )
+        create_index_concurrently("ix_contacts_user_id_email_domain", "contacts", ["user_id", "email_domain"])
+
+Both run in an Alembic autocommit block: the migration's transaction is
+committed first, so keep such migrations in a revision of their own. Both
+can be run again after a crash: the backfill resumes after its last
+checkpoint and index builds skip valid indexes and rebuild invalid ones.
+"""
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+CHECKPOINT_TABLE = "migration_checkpoints"
+
+
+@contextmanager
+def _autocommit(connection: Connection | None):
+    if connection is not None:
+        yield connection
+        return
+    from alembic import op
+
+    with op.get_context().autocommit_block():
+        yield op.get_bind()
+
+
+def _ensure_checkpoints(connection: Connection) -> None:
+    connection.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} ("
+            "name VARCHAR(200) PRIMARY KEY, last_key BIGINT NOT NULL, "
+            "rows_updated BIGINT NOT NULL, finished BOOLEAN NOT NULL)"
+        )
+    )
+
+
+def _save_checkpoint(connection: Connection, name: str, last_key: int, rows: int, finished: bool) -> None:
+    connection.execute(
+        text(
+            f"INSERT INTO {CHECKPOINT_TABLE} (name, last_key, rows_updated, finished) "
+            "VALUES (:name, :last_key, :rows, :finished) ON CONFLICT (name) DO UPDATE SET "
+            "last_key = excluded.last_key, rows_updated = excluded.rows_updated, finished = excluded.finished"
+        ),
+        {"name": name, "last_key": last_key, "rows": rows, "finished": finished},
+    )
+
+
+def backfill(
+    table: str,
+    values: str,
+    name: str,
+    where: str | None = None,
+    chunk_size: int = 10_000,
+    pause: float = 0.1,
+    key: str = "id",
+    connection: Connection | None = None,
+    report: Callable[[str], None] = print,
+) -> int:
+    """Run ``UPDATE table SET values`` in chunks of ``chunk_size`` rows ordered by ``key``.
+
+    Each chunk commits on its own and locks only its rows, so concurrent
+    writes wait milliseconds instead of the whole backfill. After each
+    chunk the last key is saved under ``name`` in ``migration_checkpoints``
+    and the helper sleeps ``pause`` seconds to leave room for the
+    application and for replicas to catch up. A crash loses at most one
+    chunk: run again, the backfill resumes after the checkpoint, and once
+    finished it is skipped. A chunk can run twice (the crash may come
+    between the update and its checkpoint), so ``values`` must be
+    idempotent; a ``where`` such as ``col IS NULL`` also skips rows that
+    need nothing.
+
+    :param table: table to update
+    :type table: str
+    :param values: SQL ``SET`` clause
+    :type values: str
+    :param name: checkpoint name, unique per backfill; prefix it with the revision
+    :type name: str
+    :param where: SQL condition limiting the rows to update
+    :type where: str | None
+    :param chunk_size: rows per chunk, counted on ``key`` before ``where`` applies
+    :type chunk_size: int
+    :param pause: seconds to sleep between chunks
+    :type pause: float
+    :param key: unique, indexed integer column to walk the table by
+    :type key: str
+    :param connection: connection in autocommit mode; defaults to the migration's
+    :type connection: Connection | None
+    :param report: receives a progress line after each chunk
+    :type report: Callable[[str], None]
+    :return: number of rows updated, including earlier runs
+    :rtype: int
+    """
+    with _autocommit(connection) as connection:
+        _ensure_checkpoints(connection)
+        checkpoint = connection.execute(
+            text(f"SELECT last_key, rows_updated, finished FROM {CHECKPOINT_TABLE} WHERE name = :name"),
+            {"name": name},
+        ).first()
+        last_key, rows, finished = checkpoint if checkpoint is not None else (None, 0, False)
+        if finished:
+            report(f"{name}: already finished, {rows} rows updated")
+            return rows
+
+        first_key, max_key = connection.execute(text(f"SELECT min({key}), max({key}) FROM {table}")).first()
+        start_key = last_key if last_key is not None else (first_key or 0) - 1
+        condition = f" AND ({where})" if where else ""
+        next_chunk = text(
+            f"SELECT max({key}) FROM (SELECT {key} FROM {table} WHERE {key} > :last_key "
+            f"ORDER BY {key} LIMIT :chunk_size) AS chunk"
+        )
+        update = text(f"UPDATE {table} SET {values} WHERE {key} > :last_key AND {key} <= :upper{condition}")
+        origin = start_key
+        started = time.monotonic()
+        while True:
+            upper = connection.execute(next_chunk, {"last_key": start_key, "chunk_size": chunk_size}).scalar()
+            if upper is None:
+                break
+            rows += connection.execute(update, {"last_key": start_key, "upper": upper}).rowcount
+            start_key = upper
+            _save_checkpoint(connection, name, start_key, rows, False)
+            # progress over the key range seen at the start; later rows come on top
+            progress = min((start_key - origin) / max(max_key - origin, 1), 1.0)
+            elapsed = time.monotonic() - started
+            report(
+                f"{name}: {rows} rows updated, {key} up to {start_key} ({progress:.1%}), "
+                f"~{elapsed * (1 - progress) / progress:.0f} s left"
+            )
+            time.sleep(pause)
+        _save_checkpoint(connection, name, start_key, rows, True)
+        report(f"{name}: finished, {rows} rows updated in {time.monotonic() - started:.1f} s")
+        return rows
+
+
+def reset_backfill(name: str, connection: Connection | None = None) -> None:
+    """Forget the checkpoint of a backfill, e.g. in the ``downgrade`` of its migration."""
+    with _autocommit(connection) as connection:
+        _ensure_checkpoints(connection)
+        connection.execute(text(f"DELETE FROM {CHECKPOINT_TABLE} WHERE name = :name"), {"name": name})
+
+
+def _index_state(connection: Connection, name: str) -> bool | None:
+    # None when the index does not exist, else whether it is valid
+    return connection.execute(
+        text(
+            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND pg_catalog.pg_table_is_visible(c.oid)"
+        ),
+        {"name": name},
+    ).scalar()
+
+
+def _build_concurrently(connection: Connection, name: str, table: str, definition: str, report) -> None:
+    state = _index_state(connection, name)
+    if state:
+        report(f"{name}: exists")
+        return
+    if state is False:
+        # left behind by an interrupted build
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    started = time.monotonic()
+    connection.execute(text(f"CREATE {definition.format(name=name, table=table, concurrently=' CONCURRENTLY')}"))
+    report(f"{name}: built in {time.monotonic() - started:.1f} s")
+
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: list[str],
+    unique: bool = False,
+    where: str | None = None,
+    connection: Connection | None = None,
+    report: Callable[[str], None] = print,
+) -> None:
+    """Build an index without blocking writes to ``table``.
+
+    On Postgres the index is built with ``CREATE INDEX CONCURRENTLY``. A
+    partitioned table cannot be indexed concurrently, so its index is
+    created on the parent only and then built concurrently on each
+    partition and attached; it becomes valid with the last one. A valid
+    index is left alone and an invalid one, left by an interrupted build,
+    is rebuilt. On other databases a plain ``CREATE INDEX IF NOT EXISTS``
+    is run.
+
+    :param name: index name
+    :type name: str
+    :param table: table to index
+    :type table: str
+    :param columns: columns or expressions
+    :type columns: list[str]
+    :param unique: unique index; on a partitioned table it must include the partition key
+    :type unique: bool
+    :param where: condition of a partial index
+    :type where: str | None
+    :param connection: connection in autocommit mode; defaults to the migration's
+    :type connection: Connection | None
+    :param report: receives a line per index built
+    :type report: Callable[[str], None]
+    """
+    definition = (
+        f"{'UNIQUE ' if unique else ''}INDEX{{concurrently}} {{name}} ON {{table}} ({', '.join(columns)})"
+        + (f" WHERE {where}" if where else "")
+    )
+    with _autocommit(connection) as connection:
+        if connection.dialect.name != "postgresql":
+            connection.execute(
+                text(f"CREATE {definition.format(name=f'IF NOT EXISTS {name}', table=table, concurrently='')}")
+            )
+            return
+        partitions = connection.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = CAST(:table AS regclass) ORDER BY c.relname"
+            ),
+            {"table": table},
+        ).scalars().all()
+        if not partitions:
+            _build_concurrently(connection, name, table, definition, report)
+            return
+        connection.execute(
+            text(f"CREATE {definition.format(name=f'IF NOT EXISTS {name}', table=f'ONLY {table}', concurrently='')}")
+        )
+        for partition in partitions:
+            partition_index = f"{name}_{partition}"[:63]
+            _build_concurrently(connection, partition_index, partition, definition, report)
+            # a no-op when already attached
+            connection.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}"))
+
+
+def drop_index_concurrently(name: str, connection: Connection | None = None) -> None:
+    """Drop an index without blocking writes; the counterpart of :func:`create_index_concurrently`.
+
+    Indexes of partitioned tables cannot be dropped concurrently and are
+    dropped with a plain ``DROP INDEX``.
+    """
+    with _autocommit(connection) as connection:
+        if connection.dialect.name != "postgresql":
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            return
+        partitioned = connection.execute(
+            text("SELECT relkind = 'I' FROM pg_class WHERE relname = :name AND pg_catalog.pg_table_is_visible(oid)"),
+            {"name": name},
+        ).scalar()
+        concurrently = "" if partitioned else "CONCURRENTLY "
+        connection.execute(text(f"DROP INDEX {concurrently}IF EXISTS {name}"))
@@ -0,0 +1,93 @@
+"""Postgres DDL converting ``contacts`` to and from hash partitioning on ``user_id``.
+
+Used by the partitioning migration and by ``benchmarks.partitioning``, so
+both run exactly the same statements.
+"""
+
+# indexes of src.entity.models.Contact; the partitioned table carries the same
+# ones, created on the parent so that every partition gets its own copy
+CONTACT_INDEXES = (
+    "CREATE INDEX ix_contacts_email ON contacts (email)",
+    "CREATE INDEX ix_contacts_name ON contacts (name)",
+    "CREATE INDEX ix_contacts_surname ON contacts (surname)",
+    "CREATE INDEX ix_contacts_user_id_email_normalized ON contacts (user_id, email_normalized)",
+    "CREATE INDEX ix_contacts_user_id_phone_normalized ON contacts (user_id, phone_normalized)",
+)
+
+
+def partition_name(remainder: int) -> str:
+    return f"contacts_p{remainder}"
+
+
+def partition_contacts(partitions: int) -> list[str]:
+    """Statements replacing ``contacts`` with a table hash partitioned on ``user_id``.
+
+    Rows are copied in one ``INSERT ... SELECT`` before the indexes are
+    built, and the table is locked for the whole copy: run it in a
+    maintenance window, inside one transaction so a failure leaves the
+    original table in place. ``user_id`` becomes ``NOT NULL`` (it is part
+    of the primary key), so contacts without an owner make it fail.
+
+    Postgres cannot enforce uniqueness across partitions, so the primary
+    key becomes ``(id, user_id)`` and emails and phones are unique per
+    user instead of globally.
+
+    :param partitions: number of hash partitions
+    :type partitions: int
+    :return: SQL statements, in order
+    :rtype: list[str]
+    """
+    if partitions < 1:
+        raise ValueError("partitions must be at least 1")
+    statements = [
+        # keep the id sequence when the old table is dropped
+        "ALTER SEQUENCE contacts_id_seq OWNED BY NONE",
+        "CREATE TABLE contacts_partitioned (LIKE contacts INCLUDING DEFAULTS) PARTITION BY HASH (user_id)",
+    ]
+    statements += [
+        f"CREATE TABLE {partition_name(remainder)} PARTITION OF contacts_partitioned "
+        f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        for remainder in range(partitions)
+    ]
+    statements += [
+        "INSERT INTO contacts_partitioned SELECT * FROM contacts",
+        "DROP TABLE contacts",
+        "ALTER TABLE contacts_partitioned RENAME TO contacts",
+        "ALTER TABLE contacts ALTER COLUMN user_id SET NOT NULL",
+        "ALTER TABLE contacts ADD CONSTRAINT contacts_pkey PRIMARY KEY (id, user_id)",
+        "ALTER TABLE contacts ADD CONSTRAINT uq_contacts_user_id_email UNIQUE (user_id, email)",
+        "ALTER TABLE contacts ADD CONSTRAINT uq_contacts_user_id_phone UNIQUE (user_id, phone)",
+        "ALTER TABLE contacts ADD CONSTRAINT contacts_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)",
+        *CONTACT_INDEXES,
+        "ALTER SEQUENCE contacts_id_seq OWNED BY contacts.id",
+        "ANALYZE contacts",
+    ]
+    return statements
+
+
+def unpartition_contacts() -> list[str]:
+    """Statements replacing a partitioned ``contacts`` with a single table again.
+
+    The inverse of :func:`partition_contacts`, restoring the primary key on
+    ``id`` and global uniqueness of emails and phones; it fails if two users
+    meanwhile saved the same email or phone.
+
+    :return: SQL statements, in order
+    :rtype: list[str]
+    """
+    return [
+        "ALTER SEQUENCE contacts_id_seq OWNED BY NONE",
+        "CREATE TABLE contacts_unpartitioned (LIKE contacts INCLUDING DEFAULTS)",
+        "INSERT INTO contacts_unpartitioned SELECT * FROM contacts",
+        # drops the partitions with it
+        "DROP TABLE contacts",
+        "ALTER TABLE contacts_unpartitioned RENAME TO contacts",
+        "ALTER TABLE contacts ALTER COLUMN user_id DROP NOT NULL",
+        "ALTER TABLE contacts ADD CONSTRAINT contacts_pkey PRIMARY KEY (id)",
+        "ALTER TABLE contacts ADD CONSTRAINT contacts_phone_key UNIQUE (phone)",
+        "ALTER TABLE contacts ADD CONSTRAINT contacts_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)",
+        "CREATE UNIQUE INDEX ix_contacts_email ON contacts (email)",
+        *[statement for statement in CONTACT_INDEXES if "ix_contacts_email " not in statement],
+        "ALTER SEQUENCE contacts_id_seq OWNED BY contacts.id",
+        "ANALYZE contacts",
+    ]
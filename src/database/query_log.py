@@ -0,0 +1,158 @@
+import logging
+import re
+import time
+from collections import deque
+
+from sqlalchemy import event
+
+from src.conf.config import config
+from src.services.request_context import current_route
+
+logger = logging.getLogger(__name__)
+
+_normalizers = [
+    (re.compile(r"--[^\n]*"), " "),
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\$\d+|%\(\w+\)s|%s|(?<![:\w]):\w+|\?"), "?"),
+    (re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?+)"),
+    (re.compile(r"(?:\(\?\+\)\s*,\s*)+\(\?\+\)"), "(?+)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def fingerprint(statement: str) -> str:
+    """Normalize a SQL statement so that queries differing only in values match.
+
+    Literals and bind parameters become ``?``, ``IN``/``VALUES`` lists of any
+    length collapse to ``(?+)`` and whitespace is squeezed.
+
+    >>> fingerprint("SELECT * FROM contacts WHERE id IN (1, 2, 3) AND email = 'a@b.c'")
+    'SELECT * FROM contacts WHERE id IN (?+) AND email = ?'
+    >>> fingerprint("SELECT * FROM users WHERE users.email = $1::VARCHAR")
+    'SELECT * FROM users WHERE users.email = ?::VARCHAR'
+
+    :param statement: SQL statement
+    :type statement: str
+    :return: statement fingerprint
+    :rtype: str
+    """
+    for pattern, replacement in _normalizers:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+class QueryStats:
+    __slots__ = ("count", "total", "max", "rows", "durations", "routes")
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.durations: deque[float] = deque(maxlen=window)
+        self.routes: dict[str, int] = {}
+
+    def add(self, duration: float, rows: int, route: str | None) -> None:
+        self.count += 1
+        self.total += duration
+        self.rows += max(rows, 0)
+        if duration > self.max:
+            self.max = duration
+        self.durations.append(duration)
+        if route is not None:
+            self.routes[route] = self.routes.get(route, 0) + 1
+
+    def p95(self) -> float:
+        durations = sorted(self.durations)
+        return durations[int(0.95 * (len(durations) - 1))] if durations else 0.0
+
+
+class QueryLog:
+    """Per-fingerprint SQL statistics and a log of statements above a threshold.
+
+    Aggregates count, total/max/p95 latency, rows and the routes issuing each
+    fingerprint. p95 is computed over the last ``window`` executions. At most
+    ``max_fingerprints`` distinct fingerprints are tracked; the rest are
+    accounted under ``<other>`` so memory stays bounded.
+    """
+
+    OTHER = "<other>"
+
+    def __init__(self, threshold_ms: float, window: int = 1000, max_fingerprints: int = 2000):
+        self.threshold = threshold_ms / 1000
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self._stats: dict[str, QueryStats] = {}
+        self._fingerprints: dict[str, str] = {}
+
+    def record(self, statement: str, duration: float, rows: int) -> None:
+        key = self._fingerprints.get(statement)
+        if key is None:
+            key = fingerprint(statement)
+            if len(self._fingerprints) < 10 * self.max_fingerprints:
+                self._fingerprints[statement] = key
+        stats = self._stats.get(key)
+        if stats is None:
+            if len(self._stats) >= self.max_fingerprints:
+                key = self.OTHER
+                stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats(self.window)
+        route = current_route()
+        stats.add(duration, rows, route)
+        if duration >= self.threshold:
+            logger.warning(
+                "Slow query (%.1f ms, %s rows) from %s: %s",
+                duration * 1000, rows, route or "<no request>", key,
+            )
+
+    def report(self, limit: int = 20, order_by: str = "total") -> list[dict]:
+        """Return the top ``limit`` fingerprints.
+
+        :param limit: number of fingerprints to return
+        :type limit: int
+        :param order_by: ``total``, ``count``, ``p95``, ``max`` or ``rows``
+        :type order_by: str
+        :return: fingerprint statistics, times in milliseconds
+        :rtype: list[dict]
+        """
+        rows = [
+            {
+                "fingerprint": key,
+                "count": stats.count,
+                "total": stats.total * 1000,
+                "mean": stats.total / stats.count * 1000,
+                "p95": stats.p95() * 1000,
+                "max": stats.max * 1000,
+                "rows": stats.rows,
+                "routes": dict(sorted(stats.routes.items(), key=lambda item: -item[1])[:5]),
+            }
+            for key, stats in list(self._stats.items())
+        ]
+        rows.sort(key=lambda row: row[order_by], reverse=True)
+        return rows[:limit]
+
+    def reset(self) -> None:
+        self._stats.clear()
+        self._fingerprints.clear()
+
+    def instrument_engine(self, engine) -> None:
+        """Hook the log into ``engine``'s cursor events.
+
+        :param engine: SQLAlchemy engine, sync or async
+        """
+        sync_engine = getattr(engine, "sync_engine", engine)
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info["query_log_start"] = time.perf_counter()
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.pop("query_log_start", None)
+            if started is not None:
+                self.record(statement, time.perf_counter() - started, cursor.rowcount)
+
+
+query_log = QueryLog(config.SLOW_QUERY_MS)
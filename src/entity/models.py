@@ -1,8 +1,30 @@
+import re
 from datetime import date
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Date, Integer, ForeignKey, DateTime, func, Boolean
+from sqlalchemy import String, Date, Integer, ForeignKey, DateTime, func, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import DeclarativeBase
 
+NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_email(email: str | None) -> str | None:
+    """Lookup form of an email address: trimmed and lower-cased."""
+    return email.strip().lower() if email is not None else None
+
+
+def normalize_phone(phone: str | None) -> str | None:
+    """Lookup form of a phone number: its digits only."""
+    return NON_DIGITS.sub("", phone) if phone is not None else None
+
+
+def _normalized(column: str, normalize):
+    # insert default computed from the raw column, so ORM adds and bulk
+    # Core inserts fill the lookup columns without repeating the rule
+    def default(context):
+        return normalize(context.get_current_parameters().get(column))
+
+    return default
+
 
 class Base(DeclarativeBase):
     pass
@@ -13,8 +35,14 @@ class Contact(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(50), index=True)
     surname: Mapped[str] = mapped_column(String(50), index=True)
-    email: Mapped[str] = mapped_column(String(50), index=True, unique=True)
-    phone: Mapped[str] = mapped_column(String(10), unique=True)
+    email: Mapped[str] = mapped_column(String(50), index=True)
+    phone: Mapped[str] = mapped_column(String(10))
+    email_normalized: Mapped[str] = mapped_column(
+        String(50), default=_normalized("email", normalize_email), nullable=True
+    )
+    phone_normalized: Mapped[str] = mapped_column(
+        String(10), default=_normalized("phone", normalize_phone), nullable=True
+    )
     birthday: Mapped[Date] = mapped_column(Date)
     created_at: Mapped[date] = mapped_column(
         "created_at", DateTime, default=func.now(), nullable=True
@@ -22,9 +50,20 @@ class Contact(Base):
     updated_at: Mapped[date] = mapped_column(
         "updated_at", DateTime, default=func.now(), onupdate=func.now(), nullable=True
     )
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
     user: Mapped["User"] = relationship("User", backref="contacts", lazy="joined")
 
+    # On Postgres the table is hash partitioned on user_id (see
+    # src.database.partitioning): unique keys must include it, and the ORM
+    # identity does too, so flushes, refreshes and deletes name the partition.
+    __mapper_args__ = {"primary_key": [id, user_id]}
+    __table_args__ = (
+        UniqueConstraint("user_id", "email", name="uq_contacts_user_id_email"),
+        UniqueConstraint("user_id", "phone", name="uq_contacts_user_id_phone"),
+        Index("ix_contacts_user_id_email_normalized", "user_id", "email_normalized"),
+        Index("ix_contacts_user_id_phone_normalized", "user_id", "phone_normalized"),
+    )
+
 
 class User(Base):
     __tablename__ = "users"
@@ -39,3 +78,5 @@ class User(Base):
         "updated_at", DateTime, default=func.now(), onupdate=func.now()
     )
     confirmed: Mapped[bool] = mapped_column(Boolean, default=False, nullable=True)
+    # maintained by the contact writes in src.repository.contacts
+    contacts_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
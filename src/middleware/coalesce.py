@@ -0,0 +1,192 @@
+import asyncio
+import base64
+import hashlib
+import json
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services.metrics import cache_requests, coalesced_requests
+from src.services.redis_pool import RedisPool
+
+
+class CapturedResponse:
+    """A complete HTTP response recorded from the ASGI messages of one request."""
+
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int = 500, headers: list | None = None, body: bytes = b""):
+        self.status = status
+        self.headers = headers or []
+        self.body = body
+
+    async def capture(self, app: ASGIApp, scope: Scope, receive: Receive) -> "CapturedResponse":
+        """Run ``app`` and record its response instead of sending it."""
+        chunks = []
+
+        async def send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                self.status = message["status"]
+                self.headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await app(scope, receive, send)
+        self.body = b"".join(chunks)
+        return self
+
+    async def replay(self, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status, "headers": self.headers})
+        await send({"type": "http.response.body", "body": self.body})
+
+    def to_bytes(self) -> bytes:
+        return json.dumps(
+            {
+                "status": self.status,
+                "headers": [[name.decode("latin-1"), value.decode("latin-1")] for name, value in self.headers],
+                "body": base64.b64encode(self.body).decode("ascii"),
+            }
+        ).encode()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CapturedResponse":
+        payload = json.loads(data)
+        return cls(
+            payload["status"],
+            [(name.encode("latin-1"), value.encode("latin-1")) for name, value in payload["headers"]],
+            base64.b64decode(payload["body"]),
+        )
+
+
+class NotShareable(Exception):
+    def __init__(self, response: CapturedResponse):
+        self.response = response
+
+
+class CoalescingMiddleware:
+    """Pure ASGI middleware letting identical concurrent reads share one response.
+
+    ``GET`` requests to ``paths`` are keyed by path, query string and the
+    ``Authorization`` header, so only requests of the same user with the same
+    parameters are ever merged. The first such request in a worker runs the
+    route; the ones arriving while it is in flight wait on its future and
+    replay its response without decoding the JWT or querying the database.
+
+    With ``redis_pool`` the leader of each worker also goes through
+    :meth:`RedisPool.single_flight`, so one worker computes the response and
+    the others read it from Redis. The shared copy lives for ``redis_ttl``
+    seconds, which bounds how stale a coalesced read can be.
+
+    Responses with a ``5xx`` status are never shared: the waiting requests
+    run the route themselves.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        paths: list[str],
+        redis_pool: RedisPool | None = None,
+        redis_ttl: float = 1.0,
+        redis_wait: float = 5.0,
+    ):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.redis_pool = redis_pool
+        self.redis_ttl = redis_ttl
+        self.redis_wait = redis_wait
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._routes: dict[str, object] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        key = self._key(scope)
+        future = self._in_flight.get(key)
+        if future is not None:
+            response = await asyncio.shield(future)
+            if response is not None:
+                self._set_route(scope)
+                coalesced_requests.inc(scope["path"], "follower")
+                cache_requests.inc("coalesce", "hit")
+                await response.replay(send)
+                return
+            await self.app(scope, receive, send)
+            return
+
+        future = self._in_flight[key] = asyncio.get_running_loop().create_future()
+        response = None
+        try:
+            response, role = await self._lead(key, scope, receive)
+            coalesced_requests.inc(scope["path"], role)
+            cache_requests.inc("coalesce", "miss" if role == "leader" else "hit")
+        finally:
+            del self._in_flight[key]
+            shared = response if response is not None and response.status < 500 else None
+            future.set_result(shared)
+        await response.replay(send)
+
+    @staticmethod
+    def _key(scope: Scope) -> str:
+        authorization = b""
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value
+                break
+        digest = hashlib.sha256()
+        for part in (scope["path"].encode(), scope["query_string"], authorization):
+            digest.update(part)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    async def _lead(self, key: str, scope: Scope, receive: Receive) -> tuple[CapturedResponse, str]:
+        if self.redis_pool is None:
+            return await CapturedResponse().capture(self.app, scope, receive), "leader"
+
+        computed = None
+        computing = False
+
+        async def compute() -> bytes:
+            nonlocal computed, computing
+            computing = True
+            computed = await CapturedResponse().capture(self.app, scope, receive)
+            computing = False
+            if computed.status >= 500:
+                raise NotShareable(computed)
+            return computed.to_bytes()
+
+        try:
+            data = await self.redis_pool.single_flight(
+                f"coalesce:{key}", compute, ttl=self.redis_ttl, lock_ttl=self.redis_wait
+            )
+        except NotShareable as err:
+            return err.response, "leader"
+        except Exception as err:
+            if computing:
+                raise
+            print(f"Error in request coalescing: {err}")
+            if computed is None:
+                computed = await CapturedResponse().capture(self.app, scope, receive)
+            return computed, "leader"
+        if computed is not None:
+            return computed, "leader"
+        self._set_route(scope)
+        return CapturedResponse.from_bytes(data), "remote"
+
+    def _set_route(self, scope: Scope) -> None:
+        # requests answered from a shared response never reach the router;
+        # give the metrics and tracing middlewares the route they would have matched
+        path = scope["path"]
+        if path not in self._routes:
+            app = scope.get("app")
+            routes = getattr(app, "routes", [])
+            self._routes[path] = next(
+                (
+                    route
+                    for route in routes
+                    if getattr(route, "path", None) == path and "GET" in getattr(route, "methods", ())
+                ),
+                None,
+            )
+        if self._routes[path] is not None:
+            scope["route"] = self._routes[path]
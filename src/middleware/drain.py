@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class InFlightRequests:
+    """Count the HTTP requests a worker is serving, so shutdown can wait for them.
+
+    Starlette runs ``BackgroundTasks`` after the response is sent but before
+    the ASGI call returns, so a request stays in flight until its background
+    tasks (confirmation emails) are done as well.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.draining = False
+        self._idle: asyncio.Event | None = None
+
+    def enter(self) -> None:
+        self.count += 1
+
+    def leave(self) -> None:
+        self.count -= 1
+        if self.count == 0 and self._idle is not None:
+            self._idle.set()
+
+    async def drain(self, timeout: float) -> int:
+        """Refuse new requests and wait up to ``timeout`` seconds for the rest.
+
+        :param timeout: seconds to wait
+        :type timeout: float
+        :return: number of requests still running when the wait ended
+        :rtype: int
+        """
+        self.draining = True
+        if self.count == 0:
+            return 0
+        self._idle = asyncio.Event()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Shutdown: {self.count} requests still running after {time.monotonic() - started:.1f} s")
+        finally:
+            self._idle = None
+        return self.count
+
+
+class DrainMiddleware:
+    """Pure ASGI middleware tracking in-flight requests in :class:`InFlightRequests`.
+
+    Once draining has started, new requests get ``503 Service Unavailable``
+    with ``Connection: close``, so clients holding a keep-alive connection to
+    a stopping worker retry on another one.
+    """
+
+    def __init__(self, app: ASGIApp, in_flight: InFlightRequests):
+        self.app = app
+        self.in_flight = in_flight
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.in_flight.draining:
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is shutting down"},
+                headers={"Connection": "close", "Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        self.in_flight.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight.leave()
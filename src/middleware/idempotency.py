@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import time
+from typing import Awaitable, Callable
+
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.middleware.coalesce import CapturedResponse
+from src.services.metrics import cache_requests, idempotent_requests
+from src.services.redis_pool import RedisPool
+
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+PENDING = b"pending"
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware making writes safe to retry with an ``Idempotency-Key`` header.
+
+    The first response to a write carrying the header is stored in Redis for
+    ``ttl`` seconds under a key made of the method, path, query string, user
+    and the idempotency key, together with a hash of the request body. A retry with the same key is answered from Redis
+    with an ``Idempotent-Replayed: true`` header: the route and the database
+    are not touched.
+
+    The first request claims the key with ``SET NX`` before running the
+    route, so a retry arriving meanwhile, in any worker, polls for the
+    stored response instead of running the route again; one still waiting
+    after ``wait`` seconds gets ``409``. The claim expires after ``wait``
+    seconds, so a crashed worker does not block the key. Either way a
+    request costs two Redis commands.
+
+    Reusing a key with a different body is rejected with ``422``. Responses
+    with a ``5xx`` status or ``429`` are not stored, and neither are routes
+    that raise, so a retry runs the route again. Without Redis the request
+    simply runs.
+
+    The user is the one ``identify`` returns for the bearer token, so a
+    retry made with a refreshed token still finds the response stored for
+    the expired one. A request whose token ``identify`` rejects gets ``401``
+    before Redis is touched: a logged-out or expired token can neither claim
+    a key nor read a stored response back. Without ``identify`` the raw
+    ``Authorization`` header stands for the user.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        redis_pool: RedisPool,
+        paths: list[str],
+        ttl: float = 86400,
+        wait: float = 30,
+        poll: float = 0.05,
+        methods: tuple[str, ...] = ("POST", "PUT", "PATCH", "DELETE"),
+        identify: Callable[[str], Awaitable[str | None]] | None = None,
+    ):
+        self.app = app
+        self.redis_pool = redis_pool
+        self.paths = frozenset(paths)
+        self.ttl = ttl
+        self.wait = wait
+        self.poll = poll
+        self.methods = frozenset(methods)
+        self.identify = identify
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in self.methods or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            response = JSONResponse({"detail": "Invalid Idempotency-Key header"}, status_code=400)
+            await response(scope, receive, send)
+            return
+
+        user = await self._user(headers.get(b"authorization", b""))
+        if user is None:
+            idempotent_requests.inc(scope["path"], "unauthorized")
+            response = JSONResponse(
+                {"detail": "Could not validate credentials"},
+                status_code=401,
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+            await response(scope, receive, send)
+            return
+
+        body, receive = await self._read_body(receive)
+        fingerprint = hashlib.sha256(body).hexdigest().encode()
+        key = self._key(scope, user, idempotency_key)
+        try:
+            redis = self.redis_pool.start()
+            claimed, stored = await self._claim(redis, key)
+        except Exception as err:
+            print(f"Error in idempotency store: {err}")
+            await self.app(scope, receive, send)
+            return
+
+        if claimed:
+            cache_requests.inc("idempotency", "miss")
+            try:
+                response = await CapturedResponse().capture(self.app, scope, receive)
+            except BaseException:
+                # also on cancellation: a key left pending would answer 409 to every retry
+                try:
+                    await redis.delete(key)
+                except Exception as err:
+                    print(f"Error in idempotency store: {err}")
+                raise
+            try:
+                if response.status >= 500 or response.status == 429:
+                    await redis.delete(key)
+                else:
+                    await redis.set(key, fingerprint + response.to_bytes(), px=int(self.ttl * 1000))
+                    idempotent_requests.inc(scope["path"], "stored")
+            except Exception as err:
+                print(f"Error in idempotency store: {err}")
+            await response.replay(send)
+            return
+        if stored is None:
+            idempotent_requests.inc(scope["path"], "in_progress")
+            response = JSONResponse(
+                {"detail": "A request with this Idempotency-Key is still in progress"}, status_code=409
+            )
+            await response(scope, receive, send)
+            return
+        if stored[: len(fingerprint)] != fingerprint:
+            idempotent_requests.inc(scope["path"], "mismatch")
+            response = JSONResponse(
+                {"detail": "Idempotency-Key was already used with a different request body"}, status_code=422
+            )
+            await response(scope, receive, send)
+            return
+        idempotent_requests.inc(scope["path"], "replayed")
+        cache_requests.inc("idempotency", "hit")
+        self._set_route(scope)
+        response = CapturedResponse.from_bytes(stored[len(fingerprint) :])
+        response.headers.append((b"idempotent-replayed", b"true"))
+        await response.replay(send)
+
+    async def _user(self, authorization: bytes) -> bytes | None:
+        if self.identify is None:
+            return authorization
+        scheme, _, token = authorization.decode("latin-1").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        subject = await self.identify(token)
+        return subject.encode() if subject is not None else None
+
+    async def _claim(self, redis, key: str) -> tuple[bool, bytes | None]:
+        # the key holds PENDING while a request runs and its response once it
+        # is done; it is gone again if that request failed or its claim expired
+        deadline = time.monotonic() + self.wait
+        while True:
+            if await redis.set(key, PENDING, nx=True, px=int(self.wait * 1000)):
+                return True, None
+            stored = await redis.get(key)
+            if stored is not None and stored != PENDING:
+                return False, stored
+            if time.monotonic() >= deadline:
+                return False, None
+            await asyncio.sleep(self.poll)
+
+    @staticmethod
+    def _key(scope: Scope, user: bytes, idempotency_key: bytes) -> str:
+        digest = hashlib.sha256()
+        for part in (scope["method"].encode(), scope["path"].encode(), scope["query_string"], user):
+            digest.update(part)
+            digest.update(b"\0")
+        digest.update(idempotency_key)
+        return f"idempotency:{digest.hexdigest()}"
+
+    @staticmethod
+    async def _read_body(receive: Receive) -> tuple[bytes, Receive]:
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+        replayed = False
+
+        async def replay() -> Message:
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return body, replay
+
+    @staticmethod
+    def _set_route(scope: Scope) -> None:
+        # replayed responses never reach the router; give the metrics and
+        # tracing middlewares the route the request would have matched
+        for route in getattr(scope.get("app"), "routes", []):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                scope["route"] = route
+                return
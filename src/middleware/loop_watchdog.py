@@ -0,0 +1,19 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.services.loop_watchdog import LoopWatchdog
+
+
+class LoopWatchdogMiddleware:
+    """Pure ASGI middleware attaching the watchdog to the event loop serving requests.
+
+    Attaching lazily from the request path covers every way the app is run
+    (uvicorn, gunicorn workers, the test client) without a startup hook.
+    """
+
+    def __init__(self, app: ASGIApp, watchdog: LoopWatchdog):
+        self.app = app
+        self.watchdog = watchdog
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.watchdog.ensure_running()
+        await self.app(scope, receive, send)
@@ -0,0 +1,51 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services.metrics import http_request_duration, http_requests
+from src.services.request_context import request_scope
+
+
+def route_template(scope: Scope) -> str:
+    """Return the path template of the route that handled ``scope``.
+
+    Templates (``/api/contacts/{id}``) keep the number of label values bounded;
+    requests that matched no route are grouped under ``<unmatched>``.
+    """
+    route = scope.get("route")
+    return getattr(route, "path", "<unmatched>")
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request count and latency per route template.
+
+    It also publishes the ASGI scope in :data:`request_scope`, so code further
+    down the stack can tell which route it is running for.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = request_scope.set(scope)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_scope.reset(token)
+            route = route_template(scope)
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - started, method, route)
+            http_requests.inc(method, route, status_code)
@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.middleware.metrics import route_template
+
+
+def sign_profile_token(secret: str, expires: int) -> str:
+    """Build a value for the ``X-Profile`` header valid until ``expires``.
+
+    :param secret: ``PROFILE_SECRET``
+    :type secret: str
+    :param expires: Unix timestamp after which the token is rejected
+    :type expires: int
+    :return: header value ``<expires>.<hex HMAC-SHA256>``
+    :rtype: str
+    """
+    signature = hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def verify_profile_token(secret: str, token: str) -> bool:
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = sign_profile_token(secret, int(expires)).partition(".")[2]
+    return hmac.compare_digest(expected, signature)
+
+
+class SamplingProfiler:
+    """Sample the stack of one thread from a background thread.
+
+    Stacks are aggregated in the collapsed format understood by
+    ``flamegraph.pl`` and speedscope: ``frame;frame;frame count`` per line,
+    root first.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: dict[str, int] = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack = ";".join(reversed(frames))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware profiling requests that carry a valid ``X-Profile`` header.
+
+    The profiled request runs under :class:`SamplingProfiler`, which samples the
+    event loop thread, so the stacks cover everything from authentication
+    through the repository calls to response serialization. Because the loop is
+    shared, samples taken while other requests run are included as well; only
+    one request per worker is profiled at a time. Collapsed stacks are written
+    to ``directory`` and the response carries an ``X-Profile-Summary`` header.
+    Streamed responses are passed through chunk by chunk; their summary only
+    names the file, written once the stream ends.
+
+    Requests without the header only pay for the header scan.
+    """
+
+    def __init__(self, app: ASGIApp, secret: str | None, directory: str, interval: float = 0.001):
+        self.app = app
+        self.secret = secret
+        self.directory = directory
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.secret:
+            await self.app(scope, receive, send)
+            return
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                break
+        else:
+            await self.app(scope, receive, send)
+            return
+        if not verify_profile_token(self.secret, value.decode("latin-1")) or not self._lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            self._lock.release()
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route = re.sub(r"[^\w.-]+", "_", route_template(scope)).strip("_") or "root"
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{scope['method']}-{route}.collapsed"
+        profiler = SamplingProfiler(threading.get_ident(), self.interval)
+        response_start: Message | None = None
+
+        async def send_wrapper(message: Message) -> None:
+            # only the start is held back, to add the summary header; body
+            # chunks pass through as they come so streams are not buffered
+            nonlocal response_start
+            if message["type"] == "http.response.start":
+                response_start = message
+                return
+            if response_start is not None:
+                if message.get("more_body", False):
+                    summary = f"streaming; file={filename}"
+                else:
+                    wall_ms = (time.perf_counter() - started) * 1000
+                    summary = f"samples={profiler.samples}; wall_ms={wall_ms:.1f}; file={filename}"
+                headers = list(response_start.get("headers", []))
+                headers.append((b"x-profile-summary", summary.encode("latin-1")))
+                await send({**response_start, "headers": headers})
+                response_start = None
+            await send(message)
+
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+        await asyncio.to_thread(self._write, filename, profiler.collapsed())
+
+    def _write(self, filename: str, stacks: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, filename), "w", encoding="utf-8") as file:
+            file.write(stacks)
@@ -0,0 +1,49 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.middleware.metrics import route_template
+from src.services.tracing import parse_traceparent, tracer
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening a server span for every HTTP request.
+
+    An incoming W3C ``traceparent`` header is continued; the response carries
+    the ``traceparent`` of the server span so callers can find the trace.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                header = value.decode("latin-1")
+                break
+        span = tracer.start_span(f"HTTP {scope['method']}", parent=parse_traceparent(header), kind="server")
+        span.set_attribute("http.method", scope["method"])
+        span.set_attribute("http.target", scope["path"])
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                headers = list(message.get("headers", []))
+                headers.append((b"traceparent", span.traceparent.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = tracer.activate(span)
+        error = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as err:
+            error = err
+            raise
+        finally:
+            tracer.deactivate(token)
+            span.name = f"{scope['method']} {route_template(scope)}"
+            tracer.end_span(span, error)
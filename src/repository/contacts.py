@@ -1,13 +1,24 @@
+import json
+import re
+from itertools import groupby
 from typing import Optional
 from datetime import datetime, timedelta
-from sqlalchemy import select, update, extract, and_
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select, insert, update, delete, extract, and_, or_, func, text
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.entity.models import Contact, User
+from src.conf import messages
+from src.entity.models import Contact, User, normalize_email, normalize_phone
 from src.schemas.contact import ContactSchema, ContactUpdateSchema
+from src.services.contact_events import contact_events
+from src.services.tracing import traced
 
+FULL_EMAIL = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+FULL_PHONE = re.compile(r"\+?[\d\s().-]+")
+FULL_PHONE_MIN_DIGITS = 7
 
+
+@traced()
 async def get_contacts(limit: int, offset: int, db: AsyncSession, user: User):
     '''
     Get all contacts for a given contact schema.
@@ -29,10 +40,90 @@ async def get_contacts(limit: int, offset: int, db: AsyncSession, user: User):
     return contacts.scalars().all()
 
 
-async def get_contact(name: str, surname: str, email: str, db: AsyncSession, user: User):
+async def _count_contacts(db: AsyncSession, user: User, delta: int) -> None:
+    # keeps users.contacts_count in step with the write in the same transaction
+    if delta:
+        await db.execute(
+            update(User)
+            .where(User.id == user.id)
+            .values(contacts_count=User.contacts_count + delta)
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def _estimate_contacts(db: AsyncSession, user: User) -> int:
+    plan = await db.execute(
+        text("EXPLAIN (FORMAT JSON) SELECT 1 FROM contacts WHERE user_id = :user_id"), {"user_id": user.id}
+    )
+    plan = plan.scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+@traced()
+async def get_contacts_page(limit: int, offset: int, count: str, db: AsyncSession, user: User):
+    '''
+    Get a page of contacts together with the total number of the user's contacts.
+
+    ``exact`` counts with a window function in the page query itself,
+    ``counter`` reads ``users.contacts_count`` in the same query, and
+    ``estimate`` asks the Postgres planner instead of counting, which costs
+    a cheap ``EXPLAIN`` but no scan (other databases fall back to
+    ``counter``). A short page gives the exact total in any mode, and an
+    empty page past the end costs one extra query.
+
+    :param limit: Limit of contacts to return
+    :type limit: int
+    :param offset: Offset for pagination
+    :type offset: int
+    :param count: exact, counter or estimate
+    :type count: str
+    :param db: SQLAlchemy database session
+    :type db: AsyncSession
+    :param user: Current user
+    :type user: User
+    :returns: the contacts, the total and the count mode used
+    :rtype: tuple[list[Contact], int, str]
+
+    '''
+    if count == "estimate" and db.get_bind().dialect.name != "postgresql":
+        count = "counter"
+    page = select(Contact).where(Contact.user_id == user.id).offset(offset).limit(limit)
+    if count == "estimate":
+        contacts = (await db.execute(page)).scalars().all()
+        total = max(await _estimate_contacts(db, user), offset + len(contacts))
+    else:
+        if count == "exact":
+            total_column = func.count().over()
+            total_query = select(func.count()).select_from(Contact).where(Contact.user_id == user.id)
+        else:
+            total_column = select(User.contacts_count).where(User.id == user.id).scalar_subquery()
+            total_query = select(User.contacts_count).where(User.id == user.id)
+        rows = (await db.execute(page.add_columns(total_column))).all()
+        contacts = [row[0] for row in rows]
+        if rows:
+            # a drifted counter must not report fewer contacts than were returned
+            total = max(rows[0][1], offset + len(contacts))
+        elif offset:
+            total = (await db.execute(total_query)).scalar_one()
+        else:
+            total = 0
+    if len(contacts) < limit and (contacts or not offset):
+        total = offset + len(contacts)
+    return contacts, total, count
+
+
+@traced()
+async def get_contact(
+    name: str, surname: str, email: str, db: AsyncSession, user: User, phone: str | None = None
+):
     '''
     Get a contact from the database and return the contact.
 
+    A full email address or phone number is matched exactly against the
+    indexed normalized columns; anything shorter is matched as a
+    case-insensitive substring.
+
     :param name: Name of the contact
     :type name: str
     :param surname: Surname of the contact
@@ -43,24 +134,36 @@ async def get_contact(name: str, surname: str, email: str, db: AsyncSession, use
     :type db: AsyncSession
     :param user: User to get the contact
     :type user: User
+    :param phone: Phone of the contact
+    :type phone: str | None
     :returns: Contact if found, otherwise None
     :rtype: Optional[Contact]
 
     '''
 
-    query = select(Contact).filter_by(user=user)
+    query = select(Contact).where(Contact.user_id == user.id)
 
+    if email:
+        if FULL_EMAIL.fullmatch(email.strip()):
+            query = query.where(Contact.email_normalized == normalize_email(email))
+        else:
+            query = query.filter(Contact.email.ilike(f"%{email}%"))
+    if phone:
+        digits = normalize_phone(phone)
+        if FULL_PHONE.fullmatch(phone.strip()) and len(digits) >= FULL_PHONE_MIN_DIGITS:
+            query = query.where(Contact.phone_normalized == digits)
+        else:
+            query = query.filter(Contact.phone_normalized.contains(digits or phone, autoescape=True))
     if name:
         query = query.filter(Contact.name.ilike(f"%{name}%"))
     if surname:
         query = query.filter(Contact.surname.ilike(f"%{surname}%"))
-    if email:
-        query = query.filter(Contact.email.ilike(f"%{email}%"))
 
     contact = await db.execute(query)
     return contact.scalar_one_or_none()
 
 
+@traced()
 async def create_contact(body: ContactSchema, db: AsyncSession, user: User):
     '''
     Create a new contact in the database and return the new contact.
@@ -78,11 +181,14 @@ async def create_contact(body: ContactSchema, db: AsyncSession, user: User):
 
     contact = Contact(**body.model_dump(exclude_unset=True), user=user)
     db.add(contact)
+    await _count_contacts(db, user, 1)
     await db.commit()
     await db.refresh(contact)
+    await contact_events.publish(user.id, [("create", contact.id)])
     return contact
 
 
+@traced()
 async def update_contact(contact_id: int, body: ContactUpdateSchema, db: AsyncSession, user: User):
     '''
     Update contact information for a contact with a given contact id.
@@ -101,11 +207,15 @@ async def update_contact(contact_id: int, body: ContactUpdateSchema, db: AsyncSe
     '''
 
     update_data = body.dict(exclude_unset=True)
+    if "email" in update_data:
+        update_data["email_normalized"] = normalize_email(update_data["email"])
+    if "phone" in update_data:
+        update_data["phone_normalized"] = normalize_phone(update_data["phone"])
     stmt = (
         update(Contact)
-        .where(Contact.id == contact_id)
+        .where(Contact.id == contact_id, Contact.user_id == user.id)
         .values(**update_data)
-        .execution_options(synchronize_session="fetch")
+        .execution_options(synchronize_session="evaluate")
     )
     try:
         result = await db.execute(stmt)
@@ -116,11 +226,13 @@ async def update_contact(contact_id: int, body: ContactUpdateSchema, db: AsyncSe
 
     if result.rowcount == 0:
         return None
+    await contact_events.publish(user.id, [("update", contact_id)])
     stmt = select(Contact).filter_by(id=contact_id, user=user)
     updated_contact = await db.execute(stmt)
     return updated_contact.scalar_one_or_none()
 
 
+@traced()
 async def delete_contact(contact_id: int, db: AsyncSession, user: User):
     '''
     Delete a contact from the database by contact id.
@@ -141,10 +253,13 @@ async def delete_contact(contact_id: int, db: AsyncSession, user: User):
     contact = contact.scalar_one_or_none()
     if contact:
         await db.delete(contact)
+        await _count_contacts(db, user, -1)
         await db.commit()
+        await contact_events.publish(user.id, [("delete", contact_id)])
     return contact
 
 
+@traced()
 async def get_upcoming_birthdays(db: AsyncSession, user: User):
     '''
     Get all contacts with upcoming birthdays for the current week.
@@ -178,3 +293,256 @@ async def get_upcoming_birthdays(db: AsyncSession, user: User):
     )
     result = await db.execute(stmt)
     return result.scalars().all()
+
+
+@traced()
+async def get_duplicate_candidates(db: AsyncSession, user: User):
+    '''
+    Get the fields of all contacts of a user that duplicate detection compares.
+
+    :param db: SQLAlchemy database session
+    :type db: AsyncSession
+    :param user: Current user
+    :type user: User
+    :returns: rows with id, name, surname, email, phone and birthday
+    :rtype: list[Row]
+
+    '''
+
+    stmt = select(
+        Contact.id, Contact.name, Contact.surname, Contact.email, Contact.phone, Contact.birthday
+    ).where(Contact.user_id == user.id)
+    result = await db.execute(stmt)
+    return result.all()
+
+
+@traced()
+async def merge_contacts(
+    primary_id: int, duplicate_ids: list[int], keep: dict[str, int], db: AsyncSession, user: User
+):
+    '''
+    Merge duplicates into a primary contact in one transaction.
+
+    The duplicates are deleted and the primary contact takes the value of
+    each field in ``keep`` from the contact given for it. The duplicates are
+    deleted first, so the primary contact can take over their unique email
+    or phone.
+
+    :param primary_id: ID of the contact to keep
+    :type primary_id: int
+    :param duplicate_ids: IDs of the contacts to merge into it
+    :type duplicate_ids: list[int]
+    :param keep: field name to the ID of the contact whose value to keep
+    :type keep: dict[str, int]
+    :param db: SQLAlchemy database session
+    :type db: AsyncSession
+    :param user: Current user
+    :type user: User
+    :returns: merged contact, or None if any of the contacts was not found
+    :rtype: Optional[Contact]
+
+    '''
+
+    duplicate_ids = list(dict.fromkeys(duplicate_ids))
+    ids = {primary_id, *duplicate_ids}
+    stmt = (
+        select(Contact)
+        .where(Contact.user_id == user.id, Contact.id.in_(ids))
+        .with_for_update(of=Contact)
+    )
+    try:
+        result = await db.execute(stmt)
+        contacts = {contact.id: contact for contact in result.scalars()}
+        if len(contacts) != len(ids):
+            await db.rollback()
+            return None
+        values = {field: getattr(contacts[source], field) for field, source in keep.items()}
+        deleted = await db.execute(
+            delete(Contact)
+            .where(Contact.user_id == user.id, Contact.id.in_(duplicate_ids))
+            .execution_options(synchronize_session=False)
+        )
+        await _count_contacts(db, user, -deleted.rowcount)
+        primary = contacts[primary_id]
+        for field, value in values.items():
+            setattr(primary, field, value)
+        if "email" in values:
+            primary.email_normalized = normalize_email(primary.email)
+        if "phone" in values:
+            primary.phone_normalized = normalize_phone(primary.phone)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise e
+    await contact_events.publish(
+        user.id, [("delete", duplicate_id) for duplicate_id in duplicate_ids] + [("update", primary_id)]
+    )
+    if values:
+        # updated_at is set by the database and expired by the flush
+        await db.refresh(primary)
+    return primary
+
+
+BATCH_STATUS = {"create": 201, "update": 200, "delete": 204}
+
+
+async def _execute_batch_run(kind: str, items: list, db: AsyncSession, user: User) -> list[int]:
+    # one multi-row statement for a run of consecutive operations of one kind
+    if kind == "create":
+        rows = [{**op.data.model_dump(), "user_id": user.id} for _, op in items]
+        result = await db.execute(insert(Contact).returning(Contact.id, sort_by_parameter_order=True), rows)
+        return list(result.scalars())
+    if kind == "update":
+        rows = []
+        for _, op in items:
+            values = op.data.model_dump(exclude_unset=True)
+            if "email" in values:
+                values["email_normalized"] = normalize_email(values["email"])
+            if "phone" in values:
+                values["phone_normalized"] = normalize_phone(values["phone"])
+            if values:
+                # user_id is part of the ORM primary key: the UPDATE names the partition
+                rows.append({"id": op.id, "user_id": user.id, **values})
+        if rows:
+            await db.execute(update(Contact), rows)
+        return [op.id for _, op in items]
+    ids = [op.id for _, op in items]
+    await db.execute(
+        delete(Contact)
+        .where(Contact.user_id == user.id, Contact.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    )
+    return ids
+
+
+async def _batch_conflicts(items: list, db: AsyncSession, user: User) -> set[int]:
+    # operations whose email or phone is taken by another contact of the user
+    # or by an earlier operation of the same run; found with one query
+    # instead of a failed statement and a retry per row
+    values = [(index, getattr(op, "id", None), op.data.email, op.data.phone) for index, op in items]
+    emails = {email for _, _, email, _ in values if email is not None}
+    phones = {phone for _, _, _, phone in values if phone is not None}
+    if not emails and not phones:
+        return set()
+    result = await db.execute(
+        select(Contact.id, Contact.email, Contact.phone).where(
+            Contact.user_id == user.id, or_(Contact.email.in_(emails), Contact.phone.in_(phones))
+        )
+    )
+    taken = {}
+    for contact_id, email, phone in result.all():
+        taken[("email", email)] = contact_id
+        taken[("phone", phone)] = contact_id
+    conflicts = set()
+    for index, contact_id, email, phone in values:
+        keys = [key for key in (("email", email), ("phone", phone)) if key[1] is not None]
+        if any(taken.get(key, contact_id) != contact_id for key in keys):
+            conflicts.add(index)
+            continue
+        for key in keys:
+            taken[key] = contact_id if contact_id is not None else ("new", index)
+    return conflicts
+
+
+@traced()
+async def execute_batch(operations: list, atomic: bool, db: AsyncSession, user: User):
+    '''
+    Execute an ordered list of create, update and delete operations in one transaction.
+
+    Consecutive operations of the same kind run as one multi-row statement
+    inside a savepoint, after one query has ruled out the ones whose email
+    or phone is taken. When the statement still fails, because a concurrent
+    request took a value in between, its operations are retried one by one
+    in savepoints of their own to find the failing ones.
+    In ``atomic`` mode the first failure stops the batch and rolls back the
+    whole transaction; otherwise failed operations are skipped and the rest
+    is committed.
+
+    :param operations: operations in the order the client sent them
+    :type operations: list[BatchOperation]
+    :param atomic: all-or-nothing instead of best-effort
+    :type atomic: bool
+    :param db: SQLAlchemy database session
+    :type db: AsyncSession
+    :param user: Current user
+    :type user: User
+    :returns: whether the transaction was committed, and one result per operation
+    :rtype: tuple[bool, list[dict]]
+
+    '''
+
+    results = [{"op": op.op, "status": None, "id": getattr(op, "id", None)} for op in operations]
+    referenced = {op.id for op in operations if op.op != "create"}
+    owned = set()
+    if referenced:
+        result = await db.execute(
+            select(Contact.id).where(Contact.user_id == user.id, Contact.id.in_(referenced))
+        )
+        owned = set(result.scalars())
+
+    failed = False
+    try:
+        for kind, run in groupby(enumerate(operations), key=lambda item: item[1].op):
+            if failed and atomic:
+                break
+            items = []
+            for index, op in run:
+                if kind != "create" and op.id not in owned:
+                    results[index].update(status=404, error=messages.NO_CONTACT_FOUND)
+                    failed = True
+                    continue
+                if kind == "delete":
+                    owned.discard(op.id)
+                items.append((index, op))
+            if kind != "delete" and items:
+                conflicts = await _batch_conflicts(items, db, user)
+                for index in conflicts:
+                    results[index].update(status=409, error=messages.CONTACT_EXISTS)
+                failed = failed or bool(conflicts)
+                items = [(index, op) for index, op in items if index not in conflicts]
+            if not items or (failed and atomic):
+                continue
+            try:
+                async with db.begin_nested():
+                    done = list(zip(items, await _execute_batch_run(kind, items, db, user)))
+            except IntegrityError:
+                done = []
+                for item in items:
+                    try:
+                        async with db.begin_nested():
+                            done.extend(zip([item], await _execute_batch_run(kind, [item], db, user)))
+                    except IntegrityError:
+                        results[item[0]].update(status=409, error=messages.CONTACT_EXISTS)
+                        failed = True
+                        if atomic:
+                            break
+            for (index, _), id in done:
+                results[index].update(status=BATCH_STATUS[kind], id=id)
+
+        if failed and atomic:
+            await db.rollback()
+            for result in results:
+                if result["status"] is None or result["status"] < 400:
+                    result.update(status=424, error=messages.BATCH_NOT_APPLIED)
+            return False, results
+        await _count_contacts(
+            db,
+            user,
+            sum({201: 1, 204: -1}.get(result["status"], 0) for result in results),
+        )
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise e
+
+    await contact_events.publish(
+        user.id, [(result["op"], result["id"]) for result in results if result["status"] in (200, 201, 204)]
+    )
+    changed = [result["id"] for result in results if result["status"] in (200, 201)]
+    if changed:
+        contacts = await db.execute(select(Contact).where(Contact.user_id == user.id, Contact.id.in_(changed)))
+        contacts = {contact.id: contact for contact in contacts.scalars()}
+        for result in results:
+            if result["status"] in (200, 201):
+                result["contact"] = contacts.get(result["id"])
+    return True, results
@@ -1,12 +1,20 @@
 from fastapi import Depends
-from sqlalchemy import select
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
 from src.entity.models import User
 from src.schemas.user import UserSchema
+from src.services.tracing import traced
 
 
+def _insert(db: AsyncSession):
+    # ON CONFLICT is dialect specific; the app runs on Postgres, the tests on SQLite
+    return sqlite.insert if db.get_bind().dialect.name == "sqlite" else postgresql.insert
+
+
+@traced()
 async def get_user_by_email(email: str, db: AsyncSession):
     ''' Get a user by email from the database.
 
@@ -27,28 +35,38 @@ async def get_user_by_email(email: str, db: AsyncSession):
         raise
 
 
-async def create_user(body: UserSchema, db: AsyncSession):
+@traced()
+async def create_user(body: UserSchema, db: AsyncSession) -> User | None:
     ''' Create a new user in the database.
 
+    The existence check and the insert are one ``INSERT ... ON CONFLICT DO
+    NOTHING RETURNING`` statement, which also closes the race between two
+    signups with the same email.
+
     :param body: User data
     :type body: UserSchema
     :param db: The database session
     :type db: AsyncSession
-    :return: Created user
-    :rtype: UserSchema'''
+    :return: Created user, None if the email is already registered
+    :rtype: User | None'''
 
-    avatar = None
     try:
-        new_user = User(**body.dict())
-        db.add(new_user)
+        stmt = (
+            _insert(db)(User)
+            .values(**body.model_dump())
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User)
+        )
+        result = await db.execute(stmt)
+        new_user = result.scalar_one_or_none()
         await db.commit()
-        await db.refresh(new_user)
         return new_user
     except Exception as e:
         print(f"Error in create_user: {e}")
         raise
 
 
+@traced()
 async def update_token(user: User, token: str | None, db: AsyncSession):
     ''' Update user's refresh token.
 
@@ -63,24 +81,57 @@ async def update_token(user: User, token: str | None, db: AsyncSession):
     await db.commit()
 
 
-async def confirmed_email(email: str, db: AsyncSession) -> None:
-    ''' Confirm user's email.
+@traced()
+async def rotate_refresh_token(email: str, old_token: str, new_token: str, db: AsyncSession) -> bool:
+    ''' Replace user's refresh token if it is still ``old_token``.
+
+    A single compare-and-set ``UPDATE``: no prior read, and of two concurrent
+    refreshes with the same token only one succeeds.
 
     :param email: The email
     :type email: str
+    :param old_token: The refresh token presented by the client
+    :type old_token: str
+    :param new_token: The new refresh token
+    :type new_token: str
+    :param db: The database session
+    :type db: AsyncSession
+    :return: True if the token was rotated
+    :rtype: bool'''
+
+    stmt = (
+        update(User)
+        .where(User.email == email, User.refresh_token == old_token)
+        .values(refresh_token=new_token)
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    rotated = result.scalar_one_or_none() is not None
+    await db.commit()
+    return rotated
+
+
+@traced()
+async def confirmed_email(user: User, db: AsyncSession) -> None:
+    ''' Confirm user's email.
+
+    :param user: The user, as loaded by the caller
+    :type user: User
     :param db: The database session
     :type db: AsyncSession'''
 
-    user = await get_user_by_email(email, db)
-    user.confirmed = True
+    stmt = update(User).where(User.id == user.id).values(confirmed=True)
+    await db.execute(stmt)
     await db.commit()
 
 
-async def update_avatar(email, url: str, db: AsyncSession) -> User:
+@traced()
+async def update_avatar(user: User, url: str, db: AsyncSession) -> User:
     ''' Update user's avatar.
 
-    :param email: users email
-    :type email: str
+    :param user: The user, as loaded by the caller
+    :type user: User
     :param url: The avatar URL
     :type url: str
     :param db: The database session
@@ -88,8 +139,8 @@ async def update_avatar(email, url: str, db: AsyncSession) -> User:
     :return: The updated user
     :rtype: User'''
 
-    user = await get_user_by_email(email, db)
-    user.avatar = url
+    stmt = update(User).where(User.id == user.id).values(avatar=url).returning(User)
+    result = await db.execute(stmt)
+    user = result.scalar_one()
     await db.commit()
-    await db.refresh(user)
     return user
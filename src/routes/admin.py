@@ -0,0 +1,65 @@
+import secrets
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+
+from src.conf.config import config
+from src.database.query_log import query_log
+from src.services.query_budget import query_budget
+from src.services.redis_pool import redis_pool
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+async def verify_admin_token(x_admin_token: str | None = Header(None)):
+    """Allow the request only if ``X-Admin-Token`` matches ``ADMIN_TOKEN``.
+
+    The admin endpoints are disabled while ``ADMIN_TOKEN`` is not configured.
+
+    :param x_admin_token: value of the ``X-Admin-Token`` header
+    :type x_admin_token: str | None"""
+    if not config.ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(
+        x_admin_token, config.ADMIN_TOKEN
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+
+@router.get("/queries", dependencies=[Depends(verify_admin_token)])
+@query_budget(sql=0)
+async def get_query_report(
+    limit: int = Query(20, ge=1, le=500),
+    order_by: Literal["total", "count", "p95", "max", "rows"] = Query("total"),
+):
+    """Get the top SQL fingerprints of this worker.
+
+    :param limit: number of fingerprints to return
+    :type limit: int
+    :param order_by: statistic to sort by
+    :type order_by: str
+    :return: per-fingerprint count, latency in milliseconds, rows and routes
+    :rtype: list[dict]"""
+    return query_log.report(limit, order_by)
+
+
+@router.delete("/queries", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(verify_admin_token)])
+@query_budget(sql=0)
+async def reset_query_report():
+    """Reset the SQL statistics of this worker."""
+    query_log.reset()
+
+
+@router.get("/redis", dependencies=[Depends(verify_admin_token)])
+@query_budget(sql=0)
+async def get_redis_report():
+    """Get the per-command Redis latency statistics of this worker.
+
+    :return: per-command count, errors and latency in milliseconds
+    :rtype: list[dict]"""
+    return redis_pool.report()
+
+
+@router.delete("/redis", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(verify_admin_token)])
+@query_budget(sql=0)
+async def reset_redis_report():
+    """Reset the Redis statistics of this worker."""
+    redis_pool.reset()
@@ -16,12 +16,14 @@ from fastapi.security import (
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
+from src.entity.models import User
 
 from src.repository import users as repositories_users
 from src.schemas.user import UserSchema, UserResponse, TokenSchema, RequestEmail
 from src.services.auth import auth_service
 from src.services.email import send_email
 from src.conf import messages
+from src.services.query_budget import query_budget
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 get_refresh_token = HTTPBearer()
@@ -30,6 +32,7 @@ get_refresh_token = HTTPBearer()
 @router.post(
     "/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED
 )
+@query_budget(sql=1)
 async def signup(
     body: UserSchema,
     background_tasks: BackgroundTasks,
@@ -48,21 +51,20 @@ async def signup(
     :type db: AsyncSession
     :returns: new user
     :rtype: UserResponse"""
-    exist_user = await repositories_users.get_user_by_email(body.email, db)
-    if exist_user:
+    body.password = await auth_service.get_password_hash_async(body.password)
+    new_user = await repositories_users.create_user(body, db)
+    if new_user is None:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail=messages.ACCOUNT_EXIST
         )
-    else:
-        body.password = auth_service.get_password_hash(body.password)
-        new_user = await repositories_users.create_user(body, db)
-        background_tasks.add_task(
-            send_email, new_user.email, new_user.username, str(request.base_url)
-        )
-        return new_user
+    background_tasks.add_task(
+        send_email, new_user.email, new_user.username, str(request.base_url)
+    )
+    return new_user
 
 
 @router.post("/login")
+@query_budget(sql=2)
 async def login(
     body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)
 ):
@@ -83,7 +85,7 @@ async def login(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=messages.UNCONFIRMED_EMAIL
         )
-    if not auth_service.verify_password(body.password, user.password):
+    if not await auth_service.verify_password_async(body.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=messages.INVALID_PASSWORD
         )
@@ -98,7 +100,35 @@ async def login(
     }
 
 
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(sql=2, redis=2)
+async def logout(
+    token: str = Depends(auth_service.oauth2_scheme),
+    user: User = Depends(auth_service.get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Log the user out: drop the refresh token and revoke the access token.
+
+    The refresh token is dropped first, so the session cannot be renewed even
+    when Redis is down; the access token then cannot be revoked and the
+    response is ``503``.
+
+    :param token: access token of the request
+    :type token: str
+    :param user: current authenticated user
+    :type user: User
+    :param db: database
+    :type db: AsyncSession"""
+    await repositories_users.update_token(user, None, db)
+    try:
+        await auth_service.revoke_access_token(token)
+    except Exception as err:
+        print(f"Error in logout: {err}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=messages.LOGOUT_NOT_REVOKED)
+
+
 @router.post("/refresh_token", response_model=TokenSchema)
+@query_budget(sql=1)
 async def refresh_token(
     credentials: HTTPAuthorizationCredentials = Security(get_refresh_token),
     db: AsyncSession = Depends(get_db),
@@ -121,16 +151,13 @@ async def refresh_token(
             detail=messages.INVALID_REFRESH_TOKEN,
         )
 
-    user = await repositories_users.get_user_by_email(email, db)
-    if user is None or user.refresh_token != token:
+    access_token = await auth_service.create_access_token(data={"sub": email})
+    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
+    if not await repositories_users.rotate_refresh_token(email, token, refresh_token, db):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=messages.INVALID_REFRESH_TOKEN,
         )
-
-    access_token = await auth_service.create_access_token(data={"sub": email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
-    await repositories_users.update_token(user, refresh_token, db)
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -139,6 +166,7 @@ async def refresh_token(
 
 
 @router.get("/confirmed_email/{token}")
+@query_budget(sql=2)
 async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """Confirm the user's email  address and password from the database.
 
@@ -156,11 +184,12 @@ async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
         )
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
-    await repositories_users.confirmed_email(email, db)
+    await repositories_users.confirmed_email(user, db)
     return {"message": "Email confirmed"}
 
 
 @router.post("/request_email")
+@query_budget(sql=1)
 async def request_email(
     body: RequestEmail,
     background_tasks: BackgroundTasks,
@@ -181,7 +210,7 @@ async def request_email(
     :rtype: str"""
     user = await repositories_users.get_user_by_email(body.email, db)
 
-    if user.confirmed:
+    if user and user.confirmed:
         return {"message": "Your email is already confirmed"}
     if user:
         background_tasks.add_task(
@@ -1,50 +1,88 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Query
+import asyncio
+import math
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Depends, status, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.conf import messages
 from src.database.db import get_db
 from src.entity.models import User
-from fastapi_limiter.depends import RateLimiter
 
 from src.repository import contacts as repositories_contacts
-from src.schemas.contact import ContactSchema, ContactResponse, ContactUpdateSchema
+from src.schemas.contact import (
+    ContactSchema,
+    ContactResponse,
+    ContactUpdateSchema,
+    ContactSuggestion,
+    ContactMergeSchema,
+    DuplicateGroup,
+    BatchRequest,
+    BatchResponse,
+)
 from src.services.auth import auth_service
+from src.services.contact_events import contact_events
+from src.services.dedupe import duplicate_finder
+from src.services.rate_limit import rate_limiter
+from src.services.query_budget import query_budget
+from src.services.typeahead import typeahead
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
 
 @router.get("/", response_model=list[ContactResponse])
+@query_budget(sql=3, redis=1)
 async def get_contacts(
+    response: Response,
     limit: int = Query(10, ge=1, le=500),
     offset: int = Query(0, ge=0),
+    count: Literal["none", "exact", "counter", "estimate"] = Query("none"),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(auth_service.get_current_user),
 ):
     """Get contacts for a given user.
 
+    With ``count`` other than ``none`` the total number of the user's
+    contacts is returned in the ``X-Total-Count`` header, the number of
+    pages of ``limit`` contacts in ``X-Total-Pages`` and the way it was
+    counted in ``X-Total-Count-Mode``; see
+    :func:`src.repository.contacts.get_contacts_page`.
+
+    :param response: response whose headers carry the total
+    :type response: Response
     :param limit: Limit of contacts to return
     :type limit: int
     :param offset: Offset of contacts to skip
     :type offset: int
+    :param count: none, exact, counter or estimate
+    :type count: str
     :param db: database connection
     :type db: AsyncSession
     :param user: current authenticated user
     :type user: User
     :return: List of contacts for the user
     :rtype: List[ContactResponse]"""
-    contacts = await repositories_contacts.get_contacts(limit, offset, db, user)
+    if count == "none":
+        return await repositories_contacts.get_contacts(limit, offset, db, user)
+    contacts, total, mode = await repositories_contacts.get_contacts_page(limit, offset, count, db, user)
+    response.headers["X-Total-Count"] = str(total)
+    response.headers["X-Total-Pages"] = str(math.ceil(total / limit))
+    response.headers["X-Total-Count-Mode"] = mode
     return contacts
 
 
 @router.get("/search", response_model=ContactResponse)
+@query_budget(sql=2, redis=1)
 async def search_contact(
     name: str = Query(None, min_length=1, max_length=50),
     surname: str = Query(None, min_length=1, max_length=50),
     email: str = Query(None),
+    phone: str = Query(None, min_length=1, max_length=20),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(auth_service.get_current_user),
 ):
-    """Search for a contact by name, surname or email.
+    """Search for a contact by name, surname, email or phone.
 
     :param name: Name of the contact
     :type name: str
@@ -52,19 +90,21 @@ async def search_contact(
     :type surname: str
     :param email: Email of the contact
     :type email: str
+    :param phone: Phone of the contact
+    :type phone: str
     :param db: database connection
     :type db: AsyncSession
     :param user: current authenticated user
     :type user: User
     :return: Contact matching the search criteria
     :rtype: ContactResponse"""
-    if not any([name, surname, email]):
+    if not any([name, surname, email, phone]):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="At least one search parameter must be provided",
         )
 
-    contact = await repositories_contacts.get_contact(name, surname, email, db, user)
+    contact = await repositories_contacts.get_contact(name, surname, email, db, user, phone)
     if not contact:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.NO_CONTACT_FOUND
@@ -72,12 +112,66 @@ async def search_contact(
     return contact
 
 
+@router.get("/suggest", response_model=list[ContactSuggestion])
+@query_budget(sql=2, redis=1)
+async def suggest_contacts(
+    q: str = Query(min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(auth_service.get_current_user),
+):
+    """Suggest contacts whose name, surname or email start with the typed text.
+
+    Served from an in-memory prefix index of the user's contacts; the
+    database is queried only to build it.
+
+    :param q: text typed so far
+    :type q: str
+    :param limit: Maximum number of suggestions
+    :type limit: int
+    :param db: database connection
+    :type db: AsyncSession
+    :param user: current authenticated user
+    :type user: User
+    :return: Matching contacts
+    :rtype: List[ContactSuggestion]"""
+    return await typeahead.suggest(q, limit, db, user.id)
+
+
+@router.get("/events", response_class=StreamingResponse)
+@query_budget(sql=1, redis=1)
+async def contact_events_stream(
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(auth_service.get_current_user),
+):
+    """Stream changes of the user's contacts as server-sent events.
+
+    Each ``contacts`` event carries a JSON list of ``{"op", "id"}`` changes
+    made by any worker. A ``resync`` event means changes were dropped
+    because the client fell behind and the contacts should be fetched again.
+
+    :param db: database connection
+    :type db: AsyncSession
+    :param user: current authenticated user
+    :type user: User
+    :return: Event stream
+    :rtype: StreamingResponse"""
+    # the stream may stay open for hours; do not hold a database connection
+    await db.close()
+    return StreamingResponse(
+        contact_events.stream(user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post(
     "/",
     response_model=ContactResponse,
-    dependencies=[Depends(RateLimiter(times=1, seconds=30))],
+    dependencies=[Depends(rate_limiter.limit(times=1, seconds=30))],
     status_code=status.HTTP_201_CREATED,
 )
+@query_budget(sql=4, redis=4)
 async def create_contact(
     body: ContactSchema,
     db: AsyncSession = Depends(get_db),
@@ -94,19 +188,22 @@ async def create_contact(
     :return: Created contact
     :rtype: ContactResponse"""
     contact = await repositories_contacts.create_contact(body, db, user)
+    typeahead.add(contact)
     return contact
 
 
 @router.patch("/update", response_model=ContactResponse)
+@query_budget(sql=4, redis=4)
 async def update_contact(
     body: ContactUpdateSchema,
     name: str = Query(None, min_length=1, max_length=50),
     surname: str = Query(None, min_length=1, max_length=50),
     email: str = Query(None),
+    phone: str = Query(None, min_length=1, max_length=20),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(auth_service.get_current_user),
 ):
-    """Update contact by name, surname or email.
+    """Update contact by name, surname, email or phone.
 
     :param body: Contact data to update
     :type body: ContactUpdateSchema
@@ -116,19 +213,21 @@ async def update_contact(
     :type surname: str
     :param email: Email of the contact
     :type email: str
+    :param phone: Phone of the contact
+    :type phone: str
     :param db: database connection
     :type db: AsyncSession
     :param user: current authenticated user
     :type user: User
     :return: Updated contact
     :rtype: ContactResponse"""
-    if not any([name, surname, email]):
+    if not any([name, surname, email, phone]):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="At least one search parameter must be provided",
         )
 
-    contact = await repositories_contacts.get_contact(name, surname, email, db, user)
+    contact = await repositories_contacts.get_contact(name, surname, email, db, user, phone)
     if not contact:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="No contact found"
@@ -141,18 +240,21 @@ async def update_contact(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
         )
+    typeahead.add(updated_contact)
     return updated_contact
 
 
 @router.delete("/delete", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(sql=5, redis=4)
 async def delete_contact(
     name: str = Query(None, min_length=1, max_length=50),
     surname: str = Query(None, min_length=1, max_length=50),
     email: str = Query(None),
+    phone: str = Query(None, min_length=1, max_length=20),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(auth_service.get_current_user),
 ):
-    """Delete contact by name, surname or email.
+    """Delete contact by name, surname, email or phone.
 
     :param name: Name of the contact
     :type name: str
@@ -160,25 +262,29 @@ async def delete_contact(
     :type surname: str
     :param email: Email of the contact
     :type email: str
+    :param phone: Phone of the contact
+    :type phone: str
     :param db: database connection
     :type db: AsyncSession
     :param user: current authenticated user
     :type user: User"""
-    if not any([name, surname, email]):
+    if not any([name, surname, email, phone]):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="At least one search parameter must be provided",
         )
-    contact = await repositories_contacts.get_contact(name, surname, email, db, user)
+    contact = await repositories_contacts.get_contact(name, surname, email, db, user, phone)
     if not contact:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="No contact found"
         )
     await repositories_contacts.delete_contact(contact.id, db, user)
+    typeahead.remove(user.id, contact.id)
     return None
 
 
 @router.get("/birthdays", response_model=list[ContactResponse])
+@query_budget(sql=2, redis=1)
 async def get_upcoming_birthdays(
     db: AsyncSession = Depends(get_db),
     user: User = Depends(auth_service.get_current_user),
@@ -198,3 +304,104 @@ async def get_upcoming_birthdays(
             detail=messages.BIRTHDAYS_NOT_FOUND,
         )
     return contacts
+
+
+@router.get("/duplicates", response_model=list[DuplicateGroup])
+@query_budget(sql=2, redis=1)
+async def get_duplicates(
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(auth_service.get_current_user),
+):
+    """Report groups of probable duplicate contacts.
+
+    :param limit: Maximum number of groups to return
+    :type limit: int
+    :param db: database connection
+    :type db: AsyncSession
+    :param user: current authenticated user
+    :type user: User
+    :return: Groups of contacts, most likely duplicates first
+    :rtype: List[DuplicateGroup]"""
+    rows = await repositories_contacts.get_duplicate_candidates(db, user)
+    groups = await asyncio.to_thread(duplicate_finder.find, rows)
+    return groups[:limit]
+
+
+@router.post("/merge", response_model=ContactResponse)
+@query_budget(sql=6, redis=4)
+async def merge_contacts(
+    body: ContactMergeSchema,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(auth_service.get_current_user),
+):
+    """Merge duplicate contacts into a primary contact.
+
+    The duplicates are deleted and the primary contact takes the fields
+    listed in ``keep`` from the given contacts, all in one transaction.
+
+    :param body: Contacts to merge and the values to keep
+    :type body: ContactMergeSchema
+    :param db: database connection
+    :type db: AsyncSession
+    :param user: current authenticated user
+    :type user: User
+    :return: Merged contact
+    :rtype: ContactResponse"""
+    if body.primary_id in body.duplicate_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=messages.MERGE_PRIMARY_IN_DUPLICATES,
+        )
+    if not set(body.keep.values()) <= {body.primary_id, *body.duplicate_ids}:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=messages.MERGE_UNKNOWN_SOURCE,
+        )
+    contact = await repositories_contacts.merge_contacts(
+        body.primary_id, body.duplicate_ids, body.keep, db, user
+    )
+    if not contact:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.NO_CONTACT_FOUND
+        )
+    for duplicate_id in body.duplicate_ids:
+        typeahead.remove(user.id, duplicate_id)
+    typeahead.add(contact)
+    return contact
+
+
+@router.post(
+    "/batch",
+    response_model=BatchResponse,
+    dependencies=[Depends(rate_limiter.limit(times=10, seconds=60))],
+)
+@query_budget(sql=15, redis=4)
+async def batch_contacts(
+    body: BatchRequest,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(auth_service.get_current_user),
+):
+    """Create, update and delete contacts in one request and one transaction.
+
+    Operations run in order; consecutive operations of the same kind are
+    executed as one statement. With ``atomic`` (the default) nothing is
+    applied unless every operation succeeds; otherwise failed operations
+    are skipped. The query budget covers a batch with one run of each kind.
+
+    :param body: Operations and the transaction mode
+    :type body: BatchRequest
+    :param db: database connection
+    :type db: AsyncSession
+    :param user: current authenticated user
+    :type user: User
+    :return: Whether the batch was committed and the result of each operation
+    :rtype: BatchResponse"""
+    committed, results = await repositories_contacts.execute_batch(body.operations, body.atomic, db, user)
+    if committed:
+        for result in results:
+            if result["status"] == status.HTTP_204_NO_CONTENT:
+                typeahead.remove(user.id, result["id"])
+            elif result.get("contact") is not None:
+                typeahead.add(result["contact"])
+    return {"committed": committed, "results": results}
@@ -1,5 +1,3 @@
-import cloudinary
-import cloudinary.uploader
 from fastapi import (
     APIRouter,
     Depends,
@@ -15,17 +13,29 @@ from src.schemas.user import UserResponse
 from src.services.auth import auth_service
 from src.conf.config import config
 from src.repository import users as repositories_users
+from src.services.query_budget import query_budget
 
 router = APIRouter(prefix="/users", tags=["users"])
-cloudinary.config(
-    cloud_name=config.CLOUDINARY_NAME,
-    api_key=config.CLOUDINARY_IP_KEY,
-    api_secret=config.CLOUDINARY_IP_SECRET,
-    secure=True,
-)
+
+
+def configure_cloudinary() -> None:
+    """Configure the Cloudinary client; called per worker by the app lifespan.
+
+    ``cloudinary`` is imported here and in the avatar route, not when the
+    routes are imported.
+    """
+    import cloudinary
+
+    cloudinary.config(
+        cloud_name=config.CLOUDINARY_NAME,
+        api_key=config.CLOUDINARY_IP_KEY,
+        api_secret=config.CLOUDINARY_IP_SECRET,
+        secure=True,
+    )
 
 
 @router.get("/me/", response_model=UserResponse)
+@query_budget(sql=1, redis=1)
 async def read_users_me(current_user: User = Depends(auth_service.get_current_user)):
     '''Read user information from the database.
 
@@ -37,6 +47,7 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 
 
 @router.patch("/avatar", response_model=UserResponse)
+@query_budget(sql=2, redis=1)
 async def update_avatar_user(
     file: UploadFile = File(),
     current_user: User = Depends(auth_service.get_current_user),
@@ -52,6 +63,8 @@ async def update_avatar_user(
     :type db: AsyncSession
     :return: updated user information
     :rtype: UserResponse'''
+    import cloudinary
+    import cloudinary.uploader
 
     r = cloudinary.uploader.upload(
         file.file, public_id=f"NotesApp/{current_user.username}", overwrite=True
@@ -59,5 +72,5 @@ async def update_avatar_user(
     src_url = cloudinary.CloudinaryImage(f"NotesApp/{current_user.username}").build_url(
         width=250, height=250, crop="fill", version=r.get("version")
     )
-    user = await repositories_users.update_avatar(current_user.email, src_url, db)
+    user = await repositories_users.update_avatar(current_user, src_url, db)
     return user
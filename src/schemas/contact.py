@@ -1,6 +1,7 @@
 from datetime import date, datetime
+from typing import Annotated, Literal, Union
 
-from pydantic import BaseModel, EmailStr, Field, ConfigDict
+from pydantic import BaseModel, EmailStr, Field, ConfigDict, field_validator
 
 
 from src.schemas.user import UserResponse
@@ -31,3 +32,75 @@ class ContactResponse(BaseModel):
     updated_at: datetime | None
     user: UserResponse | None
     model_config = ConfigDict(from_attributes=True)  # noqa
+
+
+class ContactSuggestion(BaseModel):
+    id: int
+    name: str
+    surname: str
+    email: str
+
+
+class DuplicateContact(BaseModel):
+    id: int
+    name: str
+    surname: str
+    email: str
+    phone: str
+    birthday: date
+    model_config = ConfigDict(from_attributes=True)  # noqa
+
+
+class DuplicateGroup(BaseModel):
+    score: float
+    reasons: list[str]
+    contacts: list[DuplicateContact]
+
+
+class ContactMergeSchema(BaseModel):
+    primary_id: int
+    duplicate_ids: list[int] = Field(min_length=1, max_length=100)
+    keep: dict[Literal["name", "surname", "email", "phone", "birthday"], int] = {}
+
+    @field_validator("duplicate_ids")
+    @classmethod
+    def unique_duplicate_ids(cls, value: list[int]) -> list[int]:
+        # a repeated id is one contact, deleted and counted once
+        return list(dict.fromkeys(value))
+
+
+class BatchCreate(BaseModel):
+    op: Literal["create"]
+    data: ContactSchema
+
+
+class BatchUpdate(BaseModel):
+    op: Literal["update"]
+    id: int
+    data: ContactUpdateSchema
+
+
+class BatchDelete(BaseModel):
+    op: Literal["delete"]
+    id: int
+
+
+BatchOperation = Annotated[Union[BatchCreate, BatchUpdate, BatchDelete], Field(discriminator="op")]
+
+
+class BatchRequest(BaseModel):
+    operations: list[BatchOperation] = Field(min_length=1, max_length=500)
+    atomic: bool = True
+
+
+class BatchResult(BaseModel):
+    op: str
+    status: int
+    id: int | None = None
+    contact: ContactResponse | None = None
+    error: str | None = None
+
+
+class BatchResponse(BaseModel):
+    committed: bool
+    results: list[BatchResult]
@@ -1,28 +1,99 @@
+import asyncio
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
-from jose import JWTError, jwt
+from jose import JWTError
 from fastapi import HTTPException, status, Depends, BackgroundTasks, Request
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
 from src.repository import users as repository_users
 from src.conf.config import config
+from src.services.metrics import password_hash_duration
+from src.services.token_denylist import token_denylist
+from src.services.tracing import tracer
+
+
+def _jwt():
+    # jose.jwt loads the crypto backends; import it on the first token instead of at startup
+    from jose import jwt
+
+    return jwt
 
 
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    _pwd_context = None
     SECRET_KEY = config.SECRET_KEY_JWT
     ALGORITHM = config.ALGORITHM
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+    hashing_pool: ThreadPoolExecutor | None = None
+
+    @property
+    def pwd_context(self):
+        """passlib context, built on first use: importing passlib costs tens of milliseconds."""
+        if Auth._pwd_context is None:
+            from passlib.context import CryptContext
+
+            Auth._pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        return Auth._pwd_context
 
     def verify_password(self, plain_password, hashed_password):
-        return self.pwd_context.verify(plain_password, hashed_password)
+        started = time.perf_counter()
+        try:
+            return self.pwd_context.verify(plain_password, hashed_password)
+        finally:
+            password_hash_duration.observe(time.perf_counter() - started, "verify")
 
     def get_password_hash(self, password: str):
-        return self.pwd_context.hash(password)
+        started = time.perf_counter()
+        try:
+            return self.pwd_context.hash(password)
+        finally:
+            password_hash_duration.observe(time.perf_counter() - started, "hash")
+
+    def start_hashing_pool(self, workers: int) -> None:
+        """Run password hashing on a dedicated thread pool of this process.
+
+        bcrypt releases the GIL, so hashing on threads keeps the event loop
+        responsive while still using every core given to the pool.
+
+        :param workers: number of hashing threads
+        :type workers: int
+        """
+        if self.hashing_pool is None:
+            self.pwd_context
+            self.hashing_pool = ThreadPoolExecutor(workers, thread_name_prefix="password-hash")
+            for _ in range(workers):
+                self.hashing_pool.submit(time.sleep, 0)
+
+    def stop_hashing_pool(self) -> None:
+        """Wait for the hashes in progress and stop the pool."""
+        if self.hashing_pool is not None:
+            self.hashing_pool.shutdown(wait=True)
+            self.hashing_pool = None
+
+    def _forget_hashing_pool(self) -> None:
+        # the pool threads do not exist in a forked child
+        self.hashing_pool = None
+
+    async def verify_password_async(self, plain_password, hashed_password) -> bool:
+        """:meth:`verify_password` off the event loop, on the hashing pool.
+
+        Without a pool (the app was not started through its lifespan) the
+        loop's default executor is used.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.hashing_pool, self.verify_password, plain_password, hashed_password)
+
+    async def get_password_hash_async(self, password: str) -> str:
+        """:meth:`get_password_hash` off the event loop, on the hashing pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.hashing_pool, self.get_password_hash, password)
 
     # define a function to generate a new access token
     async def create_access_token(
@@ -34,9 +105,9 @@ class Auth:
         else:
             expire = datetime.utcnow() + timedelta(minutes=15)
         to_encode.update(
-            {"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"}
+            {"iat": datetime.utcnow(), "exp": expire, "scope": "access_token", "jti": uuid.uuid4().hex}
         )
-        encoded_access_token = jwt.encode(
+        encoded_access_token = _jwt().encode(
             to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
         )
         return encoded_access_token
@@ -52,14 +123,14 @@ class Auth:
         to_encode.update(
             {"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"}
         )
-        encoded_refresh_token = jwt.encode(
+        encoded_refresh_token = _jwt().encode(
             to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
         )
         return encoded_refresh_token
 
     async def decode_refresh_token(self, refresh_token: str):
         try:
-            payload = jwt.decode(
+            payload = _jwt().decode(
                 refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
             )
             if payload["scope"] == "refresh_token":
@@ -86,7 +157,8 @@ class Auth:
 
         try:
             # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            with tracer.span("auth.decode_jwt"):
+                payload = _jwt().decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
             if payload["scope"] == "access_token":
                 email = payload["sub"]
                 if email is None:
@@ -96,21 +168,52 @@ class Auth:
         except JWTError as e:
             raise credentials_exception
 
+        if await token_denylist.is_revoked(payload.get("jti")):
+            raise credentials_exception
+
         user = await repository_users.get_user_by_email(email, db)
         if user is None:
             raise credentials_exception
         return user
 
+    async def access_token_subject(self, token: str) -> str | None:
+        """Return the user of an unexpired, unrevoked access token, without the database.
+
+        :param token: encoded access token
+        :type token: str
+        :return: the token's ``sub`` (the user's email), or None if the token is not valid
+        :rtype: str | None
+        """
+        try:
+            payload = _jwt().decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+        except JWTError:
+            return None
+        if payload.get("scope") != "access_token" or payload.get("sub") is None:
+            return None
+        if await token_denylist.is_revoked(payload.get("jti")):
+            return None
+        return payload["sub"]
+
+    async def revoke_access_token(self, token: str) -> None:
+        """Revoke an access token for the rest of its lifetime.
+
+        :param token: encoded access token, already validated by :meth:`get_current_user`
+        :type token: str
+        """
+        payload = _jwt().decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+        if "jti" in payload:
+            await token_denylist.revoke(payload["jti"], payload["exp"])
+
     def create_email_token(self, data: dict):
         to_encode = data.copy()
         expire = datetime.utcnow() + timedelta(days=7)
         to_encode.update({"iat": datetime.utcnow(), "exp": expire})
-        token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        token = _jwt().encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
         return token
 
     async def get_email_from_token(self, token: str):
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = _jwt().decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
             email = payload["sub"]
             return email
         except JWTError as e:
@@ -122,3 +225,5 @@ class Auth:
 
 
 auth_service = Auth()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=auth_service._forget_hashing_pool)
@@ -0,0 +1,168 @@
+import asyncio
+import json
+from typing import AsyncIterator
+
+from src.conf.config import config
+from src.services.metrics import Counter, Gauge, registry
+from src.services.redis_pool import RedisPool, redis_pool
+
+contact_event_messages = registry.register(
+    Counter(
+        "contact_events_total",
+        "Contact change messages received from Redis by result: delivered to a stream, or "
+        "overflow when a slow stream's buffer was full and it was told to resync.",
+        ("result",),
+    )
+)
+
+RESYNC = b"event: resync\ndata: {}\n\n"
+HEARTBEAT = b": ping\n\n"
+CLOSED = object()
+
+
+class Subscription:
+    """Bounded buffer of one event stream."""
+
+    __slots__ = ("queue",)
+
+    def __init__(self, size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(size)
+
+    def put(self, message) -> bool:
+        """Buffer ``message``; when the buffer is full, replace its content with a resync."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            return False
+
+
+class ContactEvents:
+    """Per-worker fan-out of contact changes from Redis pub/sub to event streams.
+
+    Writes publish a JSON list of ``{"op", "id"}`` changes on
+    ``<prefix>:<user_id>``. Each worker keeps one pattern subscription on
+    ``<prefix>:*`` (started by :meth:`watch` in the lifespan) and copies
+    every message into the buffers of that user's open streams, so an idle
+    stream costs a queue and a suspended generator, not a Redis or database
+    connection.
+
+    Buffers hold ``queue_size`` messages. A stream that does not keep up is
+    never waited for: its buffer is emptied and replaced with a ``resync``
+    event, after which the client refetches its contacts.
+    """
+
+    def __init__(self, redis_pool: RedisPool, prefix: str, queue_size: int, heartbeat: float):
+        self.redis_pool = redis_pool
+        self.prefix = prefix
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._subscribers: dict[int, set[Subscription]] = {}
+        self.closed = False
+
+    def open_streams(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+    async def publish(self, user_id: int, changes: list[tuple[str, int]]) -> None:
+        """Publish changes of a user's contacts; failures are logged, never raised.
+
+        :param user_id: owner of the contacts
+        :type user_id: int
+        :param changes: ``(op, contact_id)`` pairs, ``op`` being create, update or delete
+        :type changes: list[tuple[str, int]]
+        """
+        if not changes:
+            return
+        payload = json.dumps([{"op": op, "id": contact_id} for op, contact_id in changes], separators=(",", ":"))
+        try:
+            await self.redis_pool.start().publish(f"{self.prefix}:{user_id}", payload)
+        except Exception as err:
+            print(f"Error in contact events: {err}")
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id: int, subscription: Subscription) -> None:
+        subscriptions = self._subscribers.get(user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[user_id]
+
+    def dispatch(self, user_id: int, data: bytes) -> None:
+        """Copy one published message into the buffers of the user's streams."""
+        subscriptions = self._subscribers.get(user_id)
+        if not subscriptions:
+            return
+        message = b"event: contacts\ndata: " + data + b"\n\n"
+        for subscription in subscriptions:
+            contact_event_messages.inc("delivered" if subscription.put(message) else "overflow")
+
+    async def stream(self, user_id: int) -> AsyncIterator[bytes]:
+        """Server-sent events for ``user_id`` until the client disconnects or the worker stops."""
+        if self.closed:
+            return
+        subscription = self.subscribe(user_id)
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    async with asyncio.timeout(self.heartbeat):
+                        message = await subscription.queue.get()
+                except TimeoutError:
+                    # keeps proxies from closing an idle stream
+                    yield HEARTBEAT
+                    continue
+                if message is CLOSED:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(user_id, subscription)
+
+    def close(self) -> None:
+        """End every open stream and refuse new ones, so shutdown does not wait for them."""
+        self.closed = True
+        for subscriptions in self._subscribers.values():
+            for subscription in subscriptions:
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.queue.put_nowait(CLOSED)
+
+    async def watch(self) -> None:
+        """Receive the changes published by every worker until cancelled."""
+        pattern = f"{self.prefix}:*"
+        skip = len(self.prefix) + 1
+        while True:
+            try:
+                async with self.redis_pool.start().pubsub() as pubsub:
+                    await pubsub.psubscribe(pattern)
+                    while True:
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                        if message is None or message["type"] != "pmessage":
+                            continue
+                        channel = message["channel"]
+                        channel = channel.decode() if isinstance(channel, bytes) else channel
+                        data = message["data"]
+                        self.dispatch(int(channel[skip:]), data.encode() if isinstance(data, str) else data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                print(f"Error in contact events watcher: {err}")
+                await asyncio.sleep(5)
+
+
+contact_events = ContactEvents(
+    redis_pool, config.CONTACT_EVENTS_PREFIX, config.CONTACT_EVENTS_QUEUE_SIZE, config.CONTACT_EVENTS_HEARTBEAT
+)
+registry.register(
+    Gauge(
+        "contact_event_streams",
+        "Open contact event streams in this worker.",
+        lambda: {(): contact_events.open_streams()},
+    )
+)
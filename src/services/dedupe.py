@@ -0,0 +1,191 @@
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from src.conf.config import config
+from src.entity.models import normalize_email, normalize_phone
+
+SOUNDEX_CODES = {
+    letter: str(code)
+    for code, letters in enumerate(("aehiouwy", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"))
+    for letter in letters
+}
+PHONE_KEY_DIGITS = 9
+# domains delivering a.b@ and ab@ to the same mailbox
+DOTLESS_DOMAINS = frozenset({"gmail.com", "googlemail.com"})
+
+# evidence weights, combined as independent signals: 1 - prod(1 - weight)
+EMAIL_WEIGHT = 0.7
+PHONE_WEIGHT = 0.7
+NAME_WEIGHT = 0.6
+BIRTHDAY_WEIGHT = 0.3
+NAME_SIMILARITY = 0.85
+
+
+def soundex(word: str) -> str:
+    """American Soundex code of ``word``; words without Latin letters key on their first four letters."""
+    letters = [letter for letter in word.lower() if letter in SOUNDEX_CODES]
+    if not letters:
+        return word.lower()[:4]
+    code = [letters[0].upper()]
+    previous = SOUNDEX_CODES[letters[0]]
+    for letter in letters[1:]:
+        digit = SOUNDEX_CODES[letter]
+        if digit != "0" and digit != previous:
+            code.append(digit)
+        if letter not in "hw":
+            previous = digit
+    return ("".join(code) + "000")[:4]
+
+
+def email_key(email: str | None) -> str | None:
+    email = normalize_email(email)
+    if not email or "@" not in email:
+        return None
+    return email.split("@", 1)[0].replace(".", "")
+
+
+def email_address(email: str | None) -> str | None:
+    email = normalize_email(email)
+    if not email or "@" not in email:
+        return None
+    local, domain = email.split("@", 1)
+    if domain in DOTLESS_DOMAINS:
+        return f"{local.replace('.', '')}@gmail.com"
+    return email
+
+
+def phone_key(phone: str | None) -> str | None:
+    phone = normalize_phone(phone)
+    if not phone or len(phone) < PHONE_KEY_DIGITS:
+        return None
+    return phone[-PHONE_KEY_DIGITS:]
+
+
+class DuplicateFinder:
+    """Groups probable duplicate contacts of one user without comparing every pair.
+
+    Each contact is put into blocks keyed by
+
+    * the local part of its email without dots (``olena.shev@gmail.com`` and
+      ``olenashev@ukr.net`` share a block, though only the same address
+      counts as evidence: ``info@`` of two companies is not one person),
+    * the last nine digits of its phone, ignoring country and trunk prefixes,
+    * the Soundex code of the surname and the birthday,
+    * the Soundex code of the first name and the birthday, so a typo in
+      one of the names still leaves the other key in common.
+
+    Only pairs inside a block are scored. Any pair that can reach
+    ``threshold`` shares at least one of these keys: a similar name alone is
+    not enough evidence. Blocks larger than ``window`` are sorted by name
+    and each contact is compared with its ``window`` neighbours only. Scored
+    pairs are merged into groups with a union-find.
+    """
+
+    def __init__(self, threshold: float, window: int):
+        self.threshold = threshold
+        self.window = window
+
+    @staticmethod
+    def blocking_keys(row) -> list[tuple]:
+        keys = []
+        email = email_key(row.email)
+        if email:
+            keys.append(("email", email))
+        phone = phone_key(row.phone)
+        if phone:
+            keys.append(("phone", phone))
+        if row.surname:
+            keys.append(("surname", soundex(row.surname), row.birthday))
+        if row.name:
+            keys.append(("name", soundex(row.name), row.birthday))
+        return keys
+
+    def score(self, a, b) -> tuple[float, list[str]]:
+        """Score how likely contacts ``a`` and ``b`` are the same person.
+
+        :return: score in ``[0, 1]`` and the matching fields
+        :rtype: tuple[float, list[str]]
+        """
+        reasons = []
+        weights = []
+        email = email_address(a.email)
+        if email and email == email_address(b.email):
+            reasons.append("email")
+            weights.append(EMAIL_WEIGHT)
+        phone = phone_key(a.phone)
+        if phone and phone == phone_key(b.phone):
+            reasons.append("phone")
+            weights.append(PHONE_WEIGHT)
+        similarity = SequenceMatcher(
+            None, f"{a.name} {a.surname}".lower(), f"{b.name} {b.surname}".lower()
+        ).ratio()
+        if similarity >= NAME_SIMILARITY:
+            reasons.append("name")
+            weights.append(NAME_WEIGHT * similarity)
+        if a.birthday is not None and a.birthday == b.birthday:
+            reasons.append("birthday")
+            weights.append(BIRTHDAY_WEIGHT)
+        unlikely = 1.0
+        for weight in weights:
+            unlikely *= 1 - weight
+        return round(1 - unlikely, 3), reasons
+
+    def find(self, rows) -> list[dict]:
+        """Find groups of probable duplicates among ``rows``.
+
+        :param rows: contacts with ``id``, ``name``, ``surname``, ``email``,
+            ``phone`` and ``birthday`` attributes
+        :return: groups ordered by score, each with ``score``, ``reasons``
+            and the ``contacts`` in it
+        :rtype: list[dict]
+        """
+        rows = {row.id: row for row in rows}
+        blocks = defaultdict(list)
+        for row in rows.values():
+            for key in self.blocking_keys(row):
+                blocks[key].append(row)
+
+        parent = {}
+
+        def root(contact_id):
+            parent.setdefault(contact_id, contact_id)
+            while parent[contact_id] != contact_id:
+                parent[contact_id] = parent[parent[contact_id]]
+                contact_id = parent[contact_id]
+            return contact_id
+
+        scored = set()
+        matches = []
+        for block in blocks.values():
+            if len(block) < 2:
+                continue
+            if len(block) > self.window:
+                block.sort(key=lambda row: (row.surname.lower(), row.name.lower(), row.id))
+            for i, a in enumerate(block):
+                for b in block[i + 1 : i + 1 + self.window]:
+                    pair = (a.id, b.id) if a.id < b.id else (b.id, a.id)
+                    if pair in scored:
+                        continue
+                    scored.add(pair)
+                    score, reasons = self.score(a, b)
+                    if score >= self.threshold:
+                        matches.append((pair[0], score, reasons))
+                        parent[root(pair[1])] = root(pair[0])
+
+        groups = {}
+        for contact_id in list(parent):
+            group = groups.setdefault(root(contact_id), {"score": 0.0, "reasons": set(), "contacts": []})
+            group["contacts"].append(rows[contact_id])
+        for contact_id, score, reasons in matches:
+            group = groups[root(contact_id)]
+            group["score"] = max(group["score"], score)
+            group["reasons"].update(reasons)
+        report = list(groups.values())
+        for group in report:
+            group["contacts"].sort(key=lambda row: row.id)
+            group["reasons"] = sorted(group["reasons"])
+        report.sort(key=lambda group: (-group["score"], group["contacts"][0].id))
+        return report
+
+
+duplicate_finder = DuplicateFinder(config.DEDUPE_THRESHOLD, config.DEDUPE_WINDOW)
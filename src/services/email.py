@@ -1,28 +1,64 @@
+import os
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
 from pydantic import EmailStr
 
 from src.services.auth import auth_service
 from src.conf.config import config
+from src.services.tracing import traced
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=config.MAIL_USERNAME,
-    MAIL_PASSWORD=config.MAIL_PASSWORD,
-    MAIL_FROM=config.MAIL_FROM,
-    MAIL_PORT=config.MAIL_PORT,
-    MAIL_SERVER=config.MAIL_SERVER,
-    MAIL_FROM_NAME="Your Contacts Service",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / "templates",
-)
+if TYPE_CHECKING:
+    from fastapi_mail import FastMail
 
 
+class Mailer:
+    """Per-process mail transport, created by the app lifespan or on first use.
+
+    ``fastapi_mail`` opens an SMTP connection per message, so there is no
+    connection to share; building the transport lazily keeps configuration
+    errors out of import time and nothing of it crosses a fork. The package
+    itself is imported only here and in :func:`send_email`, as it is the
+    slowest import of the app.
+    """
+
+    def __init__(self):
+        self._mail: "FastMail | None" = None
+
+    def start(self) -> "FastMail":
+        if self._mail is None:
+            from fastapi_mail import ConnectionConfig, FastMail
+
+            conf = ConnectionConfig(
+                MAIL_USERNAME=config.MAIL_USERNAME,
+                MAIL_PASSWORD=config.MAIL_PASSWORD,
+                MAIL_FROM=config.MAIL_FROM,
+                MAIL_PORT=config.MAIL_PORT,
+                MAIL_SERVER=config.MAIL_SERVER,
+                MAIL_FROM_NAME="Your Contacts Service",
+                MAIL_STARTTLS=False,
+                MAIL_SSL_TLS=True,
+                USE_CREDENTIALS=True,
+                VALIDATE_CERTS=True,
+                TEMPLATE_FOLDER=Path(__file__).parent / "templates",
+            )
+            self._mail = FastMail(conf)
+        return self._mail
+
+    def stop(self) -> None:
+        self._mail = None
+
+
+mailer = Mailer()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=mailer.stop)
+
+
+@traced("email.send")
 async def send_email(email: EmailStr, username: str, host: str):
+    from fastapi_mail import MessageSchema, MessageType
+    from fastapi_mail.errors import ConnectionErrors
+
     try:
         token_verification = auth_service.create_email_token({"sub": email})
         message = MessageSchema(
@@ -36,7 +72,6 @@ async def send_email(email: EmailStr, username: str, host: str):
             subtype=MessageType.html,
         )
 
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
+        await mailer.start().send_message(message, template_name="email_template.html")
     except ConnectionErrors as err:
         print(err)
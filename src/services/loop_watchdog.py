@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from src.conf.config import config
+from src.services.metrics import Counter, Histogram, registry
+from src.services.request_context import request_scope
+
+logger = logging.getLogger(__name__)
+
+loop_lag = registry.register(
+    Histogram(
+        "event_loop_lag_seconds",
+        "Delay between the scheduled and the actual run of the loop heartbeat.",
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+    )
+)
+loop_blocked = registry.register(
+    Counter("event_loop_blocked_total", "Callbacks that blocked the event loop past the threshold.", ("route",))
+)
+
+
+def _route_of(task: asyncio.Task | None, frame) -> str:
+    # the request scope of the task's context (Python 3.12+), else the
+    # nearest ASGI ``__call__(scope, ...)`` on the blocked stack
+    scope = None
+    if task is not None and hasattr(task, "get_context"):
+        scope = task.get_context().get(request_scope)
+    while scope is None and frame is not None:
+        candidate = frame.f_locals.get("scope") if frame.f_code.co_name == "__call__" else None
+        if isinstance(candidate, dict) and candidate.get("type") == "http":
+            scope = candidate
+        frame = frame.f_back
+    if scope is None:
+        return "<no request>"
+    route = scope.get("route")
+    return f"{scope.get('method')} {getattr(route, 'path', scope.get('path'))}"
+
+
+class LoopWatchdog:
+    """Detect callbacks that block the event loop.
+
+    A heartbeat callback rescheduled with ``call_later`` measures the loop lag
+    continuously. A daemon thread checks the time of the last heartbeat; when
+    the loop has not run it for longer than ``threshold`` seconds, the thread
+    captures the stack of the loop thread, which is exactly the code that is
+    blocking, and reports it with the route of the running task. Each stall is
+    reported once, to the log and to the ``event_loop_blocked_total`` metric.
+
+    In ``strict`` mode stalls are also kept in :attr:`violations`, so a test
+    run can be failed on them.
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.02, strict: bool = False):
+        self.threshold = threshold
+        self.interval = interval
+        self.strict = strict
+        self.violations: list[dict] = []
+        self._loops: dict[asyncio.AbstractEventLoop, list] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def ensure_running(self) -> None:
+        """Start watching the running event loop, if it is not watched yet."""
+        loop = asyncio.get_running_loop()
+        if loop in self._loops:
+            return
+        with self._lock:
+            self._loops[loop] = [time.monotonic(), threading.get_ident(), None]
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+                self._thread.start()
+        loop.call_later(self.interval, self._beat, loop, time.monotonic() + self.interval)
+
+    def _beat(self, loop: asyncio.AbstractEventLoop, expected: float) -> None:
+        now = time.monotonic()
+        loop_lag.observe(max(now - expected, 0.0))
+        state = self._loops.get(loop)
+        if state is None:
+            return
+        state[0] = now
+        loop.call_later(self.interval, self._beat, loop, now + self.interval)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.threshold / 4):
+            now = time.monotonic()
+            with self._lock:
+                loops = list(self._loops.items())
+            for loop, state in loops:
+                if loop.is_closed():
+                    with self._lock:
+                        self._loops.pop(loop, None)
+                    continue
+                last_beat, thread_id, reported = state
+                if now - last_beat > self.threshold + self.interval and reported != last_beat:
+                    state[2] = last_beat
+                    self._report(loop, state, now - last_beat)
+
+    def _report(self, loop: asyncio.AbstractEventLoop, state: list, blocked_for: float) -> None:
+        last_beat, thread_id, _ = state
+        frame = sys._current_frames().get(thread_id)
+        task = asyncio.current_task(loop)
+        if frame is None or state[0] != last_beat:
+            return
+        route = _route_of(task, frame)
+        stack = "".join(traceback.format_stack(frame))
+        loop_blocked.inc(route)
+        logger.warning(
+            "Event loop blocked for more than %.0f ms in %s (task %s):\n%s",
+            blocked_for * 1000, route, task.get_name() if task else None, stack,
+        )
+        if self.strict:
+            self.violations.append({"route": route, "blocked_ms": blocked_for * 1000, "stack": stack})
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._loops.clear()
+
+
+loop_watchdog = LoopWatchdog(config.LOOP_WATCHDOG_THRESHOLD_MS / 1000, strict=config.LOOP_WATCHDOG_STRICT)
@@ -0,0 +1,201 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonic counter. ``inc`` is a dict lookup and an addition."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, labels)} {value}"
+
+
+class Gauge(Metric):
+    """Gauge whose values are read from a callback when the registry is scraped."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], dict[tuple, float]], labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.callback().items():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {value}"
+
+
+class Histogram(Metric):
+    """Fixed-bucket histogram.
+
+    Observations are stored as per-bucket (non-cumulative) counts, so
+    ``observe`` costs one dict lookup, one ``bisect`` and two additions;
+    cumulative counts are only computed when rendering.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._children: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        child[0][bisect_left(self.buckets, value)] += 1
+        child[1] += value
+
+    def count(self, *labels) -> int:
+        child = self._children.get(labels)
+        return sum(child[0]) if child else 0
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total) in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(
+    Counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+)
+http_request_duration = registry.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"))
+)
+db_query_duration = registry.register(
+    Histogram("db_query_duration_seconds", "SQL statement latency by statement type.", ("operation",))
+)
+redis_command_duration = registry.register(
+    Histogram("redis_command_duration_seconds", "Redis call latency by command.", ("command",))
+)
+cache_requests = registry.register(
+    Counter(
+        "cache_requests_total",
+        "Cache lookups by cache and result (hit or miss): typeahead per-user indexes, coalesce shared "
+        "reads, idempotency stored responses.",
+        ("cache", "result"),
+    )
+)
+coalesced_requests = registry.register(
+    Counter(
+        "http_coalesced_requests_total",
+        "Coalescible reads by path and role: leader ran the route, follower shared a response "
+        "in the worker, remote read one computed by another worker.",
+        ("path", "role"),
+    )
+)
+idempotent_requests = registry.register(
+    Counter(
+        "http_idempotent_requests_total",
+        "Writes with an Idempotency-Key by path and result: stored ran the route, replayed was "
+        "answered from Redis, unauthorized had an invalid or revoked token, "
+        "mismatch reused a key with another body, in_progress timed out waiting.",
+        ("path", "result"),
+    )
+)
+password_hash_duration = registry.register(
+    Histogram(
+        "password_hash_duration_seconds",
+        "bcrypt hashing and verification time.",
+        ("operation",),
+        buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0),
+    )
+)
+healthcheck_failures = registry.register(
+    Counter("healthcheck_failures_total", "Failed database health checks.")
+)
+
+
+def instrument_engine(engine) -> None:
+    """Record statement latency and expose pool usage for a SQLAlchemy engine.
+
+    :param engine: SQLAlchemy engine, sync or async
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_query_start"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("metrics_query_start", None)
+        if started is not None:
+            operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+            db_query_duration.observe(time.perf_counter() - started, operation)
+
+    def pool_usage() -> dict[tuple, float]:
+        pool = sync_engine.pool
+        usage = {}
+        for state in ("checkedout", "checkedin", "overflow", "size"):
+            method = getattr(pool, state, None)
+            if method is not None:
+                usage[(state,)] = method()
+        return usage
+
+    registry.register(Gauge("db_pool_connections", "Connection pool usage.", pool_usage, ("state",)))
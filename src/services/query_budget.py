@@ -0,0 +1,24 @@
+from typing import Callable
+
+
+def query_budget(sql: int, redis: int = 0) -> Callable:
+    """Declare how many SQL statements and Redis commands a route may issue per request.
+
+    The budget is stored on the endpoint and enforced by the test suite, which
+    fails any request going over it::
+
+        @router.get("/", response_model=list[ContactResponse])
+        @query_budget(sql=2)
+        async def get_contacts(...):
+
+    :param sql: maximum number of SQL statements, including authentication
+    :type sql: int
+    :param redis: maximum number of Redis commands; a pipeline counts as one
+    :type redis: int
+    """
+
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__query_budget__ = {"sql": sql, "redis": redis}
+        return endpoint
+
+    return decorator
@@ -0,0 +1,195 @@
+import asyncio
+import time
+
+from fastapi import Depends, HTTPException, Request, status
+
+from src.entity.models import User
+from src.services.auth import auth_service
+from src.services.tracing import tracer
+
+
+class TokenBucket:
+    """Classic token bucket holding up to ``capacity`` tokens, refilled continuously."""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: int, seconds: float, now: float):
+        self.capacity = capacity
+        self.rate = capacity / seconds
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self) -> int:
+        return max(1, int((1 - self.tokens) / self.rate + 0.999))
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class RateLimiter:
+    """Hybrid rate limiter: local token buckets, synchronized to Redis in batches.
+
+    Every decision is taken in-process, so a request never waits for Redis.
+    Hits are accumulated per key and flushed by :meth:`sync` in one pipelined
+    round trip (``INCRBY`` + ``EXPIRE`` per key on a fixed window). The counts
+    Redis sends back are the totals across all workers; a key over its limit
+    is blocked locally until the end of the window.
+
+    If Redis is missing, slow or failing, the limiter keeps working on the
+    local buckets alone and retries the flush on the next interval.
+    """
+
+    def __init__(self, prefix: str = "ratelimit", sync_interval: float = 1.0, timeout: float = 0.5):
+        self.prefix = prefix
+        self.sync_interval = sync_interval
+        self.timeout = timeout
+        self.redis = None
+        self._buckets: dict[str, TokenBucket] = {}
+        self._pending: dict[str, list] = {}
+        self._blocked_until: dict[str, float] = {}
+        self._task: asyncio.Task | None = None
+        self.stats = {"requests": 0, "rejected": 0, "redis_round_trips": 0, "redis_errors": 0}
+
+    @property
+    def round_trips_per_request(self) -> float:
+        return self.stats["redis_round_trips"] / max(self.stats["requests"], 1)
+
+    def hit(self, key: str, times: int, seconds: int) -> tuple[bool, int]:
+        """Register a hit for ``key`` and decide whether it is allowed.
+
+        :param key: rate limit key, usually route and user
+        :type key: str
+        :param times: number of hits allowed per window
+        :type times: int
+        :param seconds: window length in seconds
+        :type seconds: int
+        :return: whether the hit is allowed and the suggested ``Retry-After``
+        :rtype: tuple[bool, int]
+        """
+        now = time.monotonic()
+        self.stats["requests"] += 1
+        blocked_until = self._blocked_until.get(key)
+        if blocked_until is not None:
+            if blocked_until > now:
+                self.stats["rejected"] += 1
+                return False, max(1, int(blocked_until - now + 0.999))
+            del self._blocked_until[key]
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(times, seconds, now)
+        if not bucket.take(now):
+            self.stats["rejected"] += 1
+            return False, bucket.retry_after()
+
+        pending = self._pending.get(key)
+        if pending is None:
+            self._pending[key] = [1, times, seconds]
+        else:
+            pending[0] += 1
+        return True, 0
+
+    async def sync(self) -> None:
+        """Flush pending hits to Redis and block keys over their global limit."""
+        # before any early return: without Redis, or while it fails, idle
+        # keys must still be forgotten
+        self._prune(time.monotonic())
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        if self.redis is None:
+            return
+
+        wall = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        for key, (count, times, seconds) in pending.items():
+            window = int(wall // seconds)
+            redis_key = f"{self.prefix}:{key}:{window}"
+            pipe.incrby(redis_key, count)
+            pipe.expire(redis_key, seconds)
+        try:
+            self.stats["redis_round_trips"] += 1
+            with tracer.span("redis PIPELINE", kind="client", keys=len(pending)):
+                results = await asyncio.wait_for(pipe.execute(), self.timeout)
+        except Exception as err:
+            self.stats["redis_errors"] += 1
+            print(f"Error in rate limiter sync: {err}")
+            for key, (count, times, seconds) in pending.items():
+                current = self._pending.setdefault(key, [0, times, seconds])
+                current[0] += count
+            return
+
+        now = time.monotonic()
+        for (key, (count, times, seconds)), total in zip(pending.items(), results[::2]):
+            if total >= times:
+                window_end = (int(wall // seconds) + 1) * seconds
+                self._blocked_until[key] = now + window_end - wall
+
+    def _prune(self, now: float) -> None:
+        # a full bucket without pending hits behaves like a missing one
+        for key in [key for key, bucket in self._buckets.items() if bucket.is_full(now)]:
+            if key not in self._pending:
+                del self._buckets[key]
+        for key in [key for key, until in self._blocked_until.items() if until <= now]:
+            del self._blocked_until[key]
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            await self.sync()
+
+    def start(self, redis) -> None:
+        """Attach a Redis client and start the periodic background sync.
+
+        :param redis: Redis client
+        """
+        self.redis = redis
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background sync and flush what is left."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.sync()
+        self.redis = None
+
+    def limit(self, times: int, seconds: int):
+        """Route dependency enforcing a per-route policy keyed by the authenticated user.
+
+        :param times: number of requests allowed per window
+        :type times: int
+        :param seconds: window length in seconds
+        :type seconds: int
+        :return: FastAPI dependency
+        """
+
+        async def dependency(request: Request, user: User = Depends(auth_service.get_current_user)):
+            route = request.scope.get("route")
+            path = route.path if route is not None else request.url.path
+            key = f"{request.method}:{path}:{user.id}"
+            allowed, retry_after = self.hit(key, times, seconds)
+            if not allowed:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too Many Requests",
+                    headers={"Retry-After": str(retry_after)},
+                )
+
+        return dependency
+
+
+rate_limiter = RateLimiter()
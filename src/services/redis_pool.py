@@ -0,0 +1,261 @@
+import asyncio
+import contextlib
+import os
+import secrets
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterable, Mapping
+
+from fastapi import HTTPException, status
+
+from src.conf.config import config
+from src.services.metrics import redis_command_duration
+from src.services.tracing import tracer
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+# delete the lock only if it still holds our token, so an expired lock that
+# was taken over by another worker is never released by mistake
+RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class LockTimeout(Exception):
+    pass
+
+
+class CommandStats:
+    __slots__ = ("count", "errors", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def to_dict(self, command: str) -> dict:
+        return {
+            "command": command,
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / max(self.count, 1), 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class RedisPool:
+    """Per-process Redis connection pool shared by every feature that needs Redis.
+
+    The client is created by the app lifespan, or on first use, in the
+    process that uses it; a forked child drops the inherited one. Every
+    command and pipeline is timed into ``redis_command_duration_seconds`` and
+    into :attr:`stats`, whatever feature issued it.
+    """
+
+    def __init__(self, max_connections: int, socket_timeout: float):
+        self.max_connections = max_connections
+        self.socket_timeout = socket_timeout
+        self.client: "Redis | None" = None
+        self.stats: dict[str, CommandStats] = {}
+        self._release_lock = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def start(self, client: "Redis | None" = None) -> "Redis":
+        """Create the pooled client, or adopt ``client`` (e.g. a fake Redis in tests).
+
+        :param client: client to use instead of connecting to ``REDIS_DOMAIN``
+        :type client: Redis | None
+        :return: the instrumented client
+        :rtype: Redis
+        """
+        if self.client is not None:
+            return self.client
+        if client is None:
+            import redis.asyncio as redis
+
+            pool = redis.BlockingConnectionPool(
+                host=config.REDIS_DOMAIN,
+                port=config.REDIS_PORT,
+                db=0,
+                password=config.REDIS_PASSWORD,
+                max_connections=self.max_connections,
+                socket_timeout=self.socket_timeout,
+                socket_connect_timeout=self.socket_timeout,
+            )
+            client = redis.Redis(connection_pool=pool)
+        self._instrument(client)
+        self._release_lock = client.register_script(RELEASE_LOCK)
+        self.client = client
+        return client
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+        self.client = None
+        self._release_lock = None
+
+    def _after_fork(self) -> None:
+        # the inherited sockets belong to the parent; never touch them here
+        self.client = None
+        self._release_lock = None
+
+    def _record(self, command: str, elapsed: float, failed: bool) -> None:
+        stats = self.stats.get(command)
+        if stats is None:
+            stats = self.stats[command] = CommandStats()
+        stats.count += 1
+        stats.errors += failed
+        stats.total += elapsed
+        if elapsed > stats.max:
+            stats.max = elapsed
+        redis_command_duration.observe(elapsed, command)
+
+    def _timed(self, method: Callable, command: Callable[[tuple], str]) -> Callable:
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = await method(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self._record(command(args), time.perf_counter() - started, failed)
+
+        return wrapper
+
+    def _instrument(self, client: "Redis") -> None:
+        client.execute_command = self._timed(client.execute_command, lambda args: str(args[0]).upper())
+        create_pipeline = client.pipeline
+
+        def pipeline(*args, **kwargs):
+            pipe = create_pipeline(*args, **kwargs)
+            pipe.execute = self._timed(pipe.execute, lambda args: "PIPELINE")
+            return pipe
+
+        client.pipeline = pipeline
+
+    def report(self) -> list[dict]:
+        """Per-command statistics of this worker, slowest in total first."""
+        rows = [stats.to_dict(command) for command, stats in self.stats.items()]
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def reset(self) -> None:
+        self.stats.clear()
+
+    async def get_many(self, keys: Iterable[str]) -> dict[str, bytes]:
+        """Read many keys in one round trip.
+
+        :param keys: keys to read
+        :type keys: Iterable[str]
+        :return: values of the keys that exist
+        :rtype: dict[str, bytes]
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = await self.start().mget(keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    async def set_many(self, items: Mapping[str, bytes | str | int], ttl: float | None = None) -> None:
+        """Write many keys in one pipelined round trip, each with its own expiry.
+
+        ``MSET`` cannot set a TTL, so the pipeline sends one ``SET ... PX``
+        per key; without a TTL a single ``MSET`` is used.
+
+        :param items: values by key
+        :type items: Mapping[str, bytes | str | int]
+        :param ttl: expiry in seconds, ``None`` for none
+        :type ttl: float | None
+        """
+        if not items:
+            return
+        client = self.start()
+        if ttl is None:
+            await client.mset(dict(items))
+            return
+        pipe = client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(key, value, px=int(ttl * 1000))
+        await pipe.execute()
+
+    @contextlib.asynccontextmanager
+    async def lock(self, name: str, ttl: float = 10, wait: float = 5, poll: float = 0.05):
+        """Hold a lock shared by all workers, for at most ``ttl`` seconds.
+
+        The lock is a key set with ``SET NX PX`` to a random token and
+        released by a Lua script that deletes it only while it still holds
+        that token.
+
+        :param name: lock name; the key is ``lock:<name>``
+        :type name: str
+        :param ttl: seconds after which Redis drops the lock of a crashed holder
+        :type ttl: float
+        :param wait: seconds to wait for the lock before raising :class:`LockTimeout`
+        :type wait: float
+        :param poll: seconds between attempts
+        :type poll: float
+        """
+        client = self.start()
+        key = f"lock:{name}"
+        token = secrets.token_hex(16)
+        deadline = time.monotonic() + wait
+        with tracer.span("redis.lock", kind="client", key=key):
+            while not await client.set(key, token, nx=True, px=int(ttl * 1000)):
+                if time.monotonic() >= deadline:
+                    raise LockTimeout(key)
+                await asyncio.sleep(poll)
+        try:
+            yield
+        finally:
+            await self._release_lock(keys=[key], args=[token])
+
+    async def single_flight(
+        self, key: str, compute: Callable[[], Awaitable[bytes | str]], ttl: float, lock_ttl: float = 10
+    ) -> bytes:
+        """Return the cached value of ``key``, computing it at most once across workers.
+
+        On a miss only the worker holding the lock runs ``compute``; the
+        others wait for the lock and then find the value in the cache.
+
+        :param key: cache key
+        :type key: str
+        :param compute: coroutine function producing the value
+        :type compute: Callable[[], Awaitable[bytes | str]]
+        :param ttl: expiry of the cached value in seconds
+        :type ttl: float
+        :param lock_ttl: upper bound for ``compute`` in seconds
+        :type lock_ttl: float
+        :return: cached or computed value
+        :rtype: bytes
+        """
+        client = self.start()
+        value = await client.get(key)
+        if value is not None:
+            return value
+        async with self.lock(key, ttl=lock_ttl, wait=lock_ttl):
+            value = await client.get(key)
+            if value is not None:
+                return value
+            value = await compute()
+            if isinstance(value, str):
+                value = value.encode()
+            await client.set(key, value, px=int(ttl * 1000))
+            return value
+
+
+redis_pool = RedisPool(config.REDIS_MAX_CONNECTIONS, config.REDIS_SOCKET_TIMEOUT)
+
+
+async def get_redis() -> "Redis":
+    """Dependency returning the shared Redis client of this worker."""
+    try:
+        return redis_pool.start()
+    except Exception as err:
+        print(f"Error in get_redis: {err}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Redis is not available")
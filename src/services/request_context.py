@@ -0,0 +1,18 @@
+from contextvars import ContextVar
+
+from starlette.types import Scope
+
+request_scope: ContextVar[Scope | None] = ContextVar("request_scope", default=None)
+
+
+def current_route() -> str | None:
+    """Return ``"METHOD /route/template"`` for the request being handled, if any.
+
+    The route template is only known once the router has matched the request;
+    before that the raw path is returned.
+    """
+    scope = request_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope.get('method')} {getattr(route, 'path', scope.get('path'))}"
@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import math
+import time
+
+from src.conf.config import config
+from src.services.metrics import Counter, registry
+from src.services.redis_pool import RedisPool, redis_pool
+
+denylist_checks = registry.register(
+    Counter(
+        "token_denylist_checks_total",
+        "Access token revocation checks: filter_miss needed no Redis call, "
+        "revoked and false_positive were confirmed in Redis.",
+        ("result",),
+    )
+)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings.
+
+    Sized for ``capacity`` items at a false positive rate of ``error_rate``;
+    the ``k`` bit positions come from one BLAKE2b digest by double hashing.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenDenylist:
+    """Revoked access tokens, checked without a Redis round trip in the common case.
+
+    A revoked ``jti`` is stored in Redis under ``<key>:<jti>`` with a TTL
+    equal to the token's remaining lifetime, indexed in the sorted set
+    ``<key>`` by expiry, and published on ``<key>:new``. Every worker keeps
+    a :class:`BloomFilter` of the revoked ids: loaded from the sorted set and
+    kept current from the channel by :meth:`watch`, and rebuilt every
+    ``rebuild_interval`` seconds so expired ids do not pile up. A token whose
+    ``jti`` is not in the filter is certainly not revoked; only probable
+    hits are confirmed in Redis.
+
+    Until the first load has completed every check goes to Redis, and a
+    token Redis cannot check then is let through rather than locking every
+    user out. Once loaded, the filter is kept across watcher errors and
+    refreshed when the watcher reconnects. Without a running watcher (no
+    lifespan, e.g. the test client) the filter holds the revocations made
+    by this process only.
+    """
+
+    def __init__(
+        self, redis_pool: RedisPool, key: str, capacity: int, error_rate: float, rebuild_interval: float = 3600
+    ):
+        self.redis_pool = redis_pool
+        self.key = key
+        self.channel = f"{key}:new"
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.filter = BloomFilter(capacity, error_rate)
+        self.watching = False
+        self.loaded = False
+
+    async def revoke(self, jti: str, expires_at: float) -> None:
+        """Revoke a token until it expires anyway, in one pipelined round trip.
+
+        :param jti: token id
+        :type jti: str
+        :param expires_at: Unix timestamp of the token's ``exp``
+        :type expires_at: float
+        """
+        ttl = math.ceil(expires_at - time.time())
+        if ttl <= 0:
+            return
+        self.filter.add(jti)
+        pipe = self.redis_pool.start().pipeline(transaction=False)
+        pipe.set(f"{self.key}:{jti}", 1, ex=ttl)
+        pipe.zadd(self.key, {jti: expires_at})
+        pipe.publish(self.channel, jti)
+        await pipe.execute()
+
+    async def is_revoked(self, jti: str | None) -> bool:
+        """Tell whether the token with id ``jti`` was revoked.
+
+        Tokens issued without a ``jti`` cannot be revoked. When Redis cannot
+        confirm a probable hit of the filter, the token is treated as
+        revoked; before the filter was ever loaded, as not revoked.
+
+        :param jti: token id
+        :type jti: str | None
+        :rtype: bool
+        """
+        if jti is None:
+            return False
+        probable_hit = jti in self.filter
+        if not probable_hit and (self.loaded or not self.watching):
+            denylist_checks.inc("filter_miss")
+            return False
+        try:
+            revoked = await self.redis_pool.start().exists(f"{self.key}:{jti}") > 0
+        except Exception as err:
+            print(f"Error in token denylist: {err}")
+            return probable_hit
+        denylist_checks.inc("revoked" if revoked else "false_positive")
+        return revoked
+
+    async def load(self) -> None:
+        """Rebuild the filter from the ids in Redis that have not expired."""
+        redis = self.redis_pool.start()
+        now = time.time()
+        pipe = redis.pipeline(transaction=False)
+        pipe.zremrangebyscore(self.key, "-inf", now)
+        pipe.zrange(self.key, 0, -1)
+        _, members = await pipe.execute()
+        revoked = BloomFilter(max(self.capacity, len(members) * 2), self.error_rate)
+        for jti in members:
+            revoked.add(jti.decode() if isinstance(jti, bytes) else jti)
+        # ids published while loading stay queued on the subscription, which
+        # :meth:`watch` opened before loading, and are added afterwards
+        self.filter = revoked
+        self.loaded = True
+
+    async def watch(self) -> None:
+        """Keep the filter in sync with Redis until cancelled."""
+        self.watching = True
+        try:
+            while True:
+                try:
+                    async with self.redis_pool.start().pubsub() as pubsub:
+                        await pubsub.subscribe(self.channel)
+                        await self.load()
+                        loaded_at = time.monotonic()
+                        while True:
+                            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                            if message is not None and message["type"] == "message":
+                                data = message["data"]
+                                self.filter.add(data.decode() if isinstance(data, bytes) else data)
+                            if time.monotonic() - loaded_at > self.rebuild_interval:
+                                await self.load()
+                                loaded_at = time.monotonic()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as err:
+                    # keep serving the last loaded filter; it is reloaded on reconnect
+                    print(f"Error in token denylist watcher: {err}")
+                    await asyncio.sleep(5)
+        finally:
+            self.watching = False
+
+
+token_denylist = TokenDenylist(
+    redis_pool, config.TOKEN_DENYLIST_KEY, config.TOKEN_DENYLIST_CAPACITY, config.TOKEN_DENYLIST_ERROR_RATE
+)
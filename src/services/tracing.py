@@ -0,0 +1,260 @@
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable
+
+from sqlalchemy import event
+
+from src.conf.config import config
+
+
+class Span:
+    """A single timed operation of a trace, identified as in W3C trace context."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "sampled", "start", "end", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, sampled: bool, kind: str = "internal"):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.kind = kind
+        self.start = time.time_ns()
+        self.end: int | None = None
+        self.attributes: dict[str, Any] = {}
+        self.error: str | None = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.sampled:
+            self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        """Serialize the span using the field names of the OTLP JSON encoding."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": self.start,
+            "endTimeUnixNano": self.end,
+            "attributes": [{"key": key, "value": value} for key, value in self.attributes.items()],
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+        }
+
+
+def parse_traceparent(header: str | None) -> tuple[str, str, bool] | None:
+    """Parse a W3C ``traceparent`` header.
+
+    >>> parse_traceparent("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01")
+    ('4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7', True)
+    >>> parse_traceparent("garbage") is None
+    True
+
+    :param header: header value
+    :type header: str | None
+    :return: trace id, parent span id and sampled flag, or None if invalid
+    :rtype: tuple[str, str, bool] | None
+    """
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or parts[0] == "ff":
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class JsonLinesExporter:
+    """Buffer finished spans and append them as JSON lines to a local file.
+
+    Full batches are written in the default executor, and :meth:`flush` in
+    a thread, so the file I/O never blocks the event loop.
+    """
+
+    def __init__(self, path: str, batch_size: int = 256):
+        self.path = path
+        self.batch_size = batch_size
+        self._buffer: list[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        self._buffer.append(span)
+        if len(self._buffer) < self.batch_size:
+            return
+        batch, self._buffer = self._buffer, []
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # no loop, e.g. a script or a worker thread
+            self._write(batch)
+        else:
+            loop.run_in_executor(None, self._write, batch)
+
+    async def flush(self) -> None:
+        """Write the buffered spans."""
+        batch, self._buffer = self._buffer, []
+        if batch:
+            await asyncio.to_thread(self._write, batch)
+
+    def _write(self, batch: list[Span]) -> None:
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in batch)
+        directory = os.path.dirname(self.path)
+        with self._lock:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(lines)
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """Head-sampled tracer keeping the active span in a context variable.
+
+    The sampling decision is taken once per trace, on the root span, and is
+    inherited by every child (or taken from the ``sampled`` flag of an incoming
+    ``traceparent``). Inside an unsampled trace :meth:`span` does nothing, so
+    tracing costs close to zero for the requests that are not recorded.
+    """
+
+    def __init__(self, sample_ratio: float, exporter: JsonLinesExporter):
+        self.sample_ratio = sample_ratio
+        self.exporter = exporter
+
+    @staticmethod
+    def current_span() -> Span | None:
+        return _current_span.get()
+
+    def start_span(self, name: str, parent: tuple[str, str, bool] | None = None, kind: str = "internal") -> Span:
+        """Create a span as a child of ``parent`` or of the current span; it is not activated.
+
+        :param name: span name
+        :type name: str
+        :param parent: remote parent as returned by :func:`parse_traceparent`
+        :type parent: tuple[str, str, bool] | None
+        :param kind: span kind, e.g. ``server`` or ``client``
+        :type kind: str
+        :return: new span
+        :rtype: Span
+        """
+        if parent is not None:
+            return Span(name, parent[0], parent[1], parent[2], kind)
+        current = _current_span.get()
+        if current is not None:
+            return Span(name, current.trace_id, current.span_id, current.sampled, kind)
+        return Span(name, f"{random.getrandbits(128):032x}", None, random.random() < self.sample_ratio, kind)
+
+    def end_span(self, span: Span, error: BaseException | None = None) -> None:
+        span.end = time.time_ns()
+        if error is not None:
+            span.error = repr(error)
+        if span.sampled:
+            self.exporter.export(span)
+
+    @contextlib.contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes):
+        """Run a block inside a child span of the current span.
+
+        :param name: span name
+        :type name: str
+        :param kind: span kind
+        :type kind: str
+        :param attributes: span attributes
+        """
+        current = _current_span.get()
+        if current is not None and not current.sampled:
+            yield current
+            return
+        span = self.start_span(name, kind=kind)
+        if span.sampled:
+            span.attributes.update(attributes)
+        token = _current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as err:
+            error = err
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span, error)
+
+    def activate(self, span: Span):
+        return _current_span.set(span)
+
+    def deactivate(self, token) -> None:
+        _current_span.reset(token)
+
+
+tracer = Tracer(config.TRACE_SAMPLE_RATIO, JsonLinesExporter(config.TRACE_EXPORT_PATH))
+
+
+def traced(name: str | None = None) -> Callable:
+    """Decorate a coroutine function so each call runs in its own span.
+
+    :param name: span name, defaults to the qualified function name
+    :type name: str | None
+    """
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(span_name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_engine(engine) -> None:
+    """Create a client span for every SQL statement executed by ``engine``.
+
+    :param engine: SQLAlchemy engine, sync or async
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        current = _current_span.get()
+        if current is None or not current.sampled:
+            return
+        span = tracer.start_span("db.query", kind="client")
+        span.attributes["db.system"] = sync_engine.dialect.name
+        span.attributes["db.statement"] = statement
+        conn.info["tracing_span"] = span
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = conn.info.pop("tracing_span", None)
+        if span is not None:
+            span.attributes["db.rows"] = cursor.rowcount
+            tracer.end_span(span)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        connection = exception_context.connection
+        span = connection.info.pop("tracing_span", None) if connection is not None else None
+        if span is not None:
+            tracer.end_span(span, exception_context.original_exception)
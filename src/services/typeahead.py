@@ -0,0 +1,197 @@
+import asyncio
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import config
+from src.entity.models import Contact
+from src.services.metrics import cache_requests
+
+
+class PrefixIndex:
+    """Contacts of one user searchable by prefix of their name, surname or email.
+
+    Every contact contributes one ``(key, id)`` entry per lower-cased field to
+    a sorted list, so the entries starting with a prefix are a contiguous run
+    found with :func:`bisect.bisect_left`. Adding or removing a contact costs
+    three binary searches and list shifts, never a rebuild.
+    """
+
+    __slots__ = ("entries", "contacts", "keys")
+
+    def __init__(self, contacts=()):
+        self.contacts: dict[int, tuple[str, str, str]] = {}
+        self.keys: dict[int, tuple[str, ...]] = {}
+        entries = []
+        for contact_id, name, surname, email in contacts:
+            self.contacts[contact_id] = (name, surname, email)
+            keys = self.keys[contact_id] = self._keys(name, surname, email)
+            entries.extend((key, contact_id) for key in keys)
+        entries.sort()
+        self.entries: list[tuple[str, int]] = entries
+
+    def __len__(self) -> int:
+        return len(self.contacts)
+
+    @staticmethod
+    def _keys(*fields: str) -> tuple[str, ...]:
+        return tuple({field.lower() for field in fields if field})
+
+    def add(self, contact_id: int, name: str, surname: str, email: str) -> None:
+        self.remove(contact_id)
+        self.contacts[contact_id] = (name, surname, email)
+        keys = self.keys[contact_id] = self._keys(name, surname, email)
+        for key in keys:
+            insort(self.entries, (key, contact_id))
+
+    def remove(self, contact_id: int) -> None:
+        if self.contacts.pop(contact_id, None) is None:
+            return
+        entries = self.entries
+        for key in self.keys.pop(contact_id):
+            position = bisect_left(entries, (key, contact_id))
+            if position < len(entries) and entries[position] == (key, contact_id):
+                del entries[position]
+
+    def search(self, query: str, limit: int) -> list[dict]:
+        """Contacts matching every word of ``query`` by prefix.
+
+        The word with the fewest matching keys is looked up in the index; the
+        other words must be prefixes of another field of the same contact, so
+        ``"olena shev"`` finds Olena Shevchenko.
+
+        :param query: text typed so far
+        :type query: str
+        :param limit: maximum number of suggestions
+        :type limit: int
+        :return: suggestions ordered by the matched key
+        :rtype: list[dict]
+        """
+        words = query.lower().split()
+        if not words:
+            return []
+        entries = self.entries
+        runs = sorted(
+            (bisect_left(entries, (word + "\U0010ffff",)) - start, start, word)
+            for word in words
+            for start in (bisect_left(entries, (word,)),)
+        )
+        _, start, first = runs[0]
+        rest = [word for _, _, word in runs[1:]]
+        found = []
+        seen = set()
+        for position in range(start, len(entries)):
+            key, contact_id = entries[position]
+            if not key.startswith(first):
+                break
+            if contact_id in seen:
+                continue
+            seen.add(contact_id)
+            if rest:
+                others = [other for other in self.keys[contact_id] if other != key]
+                if not all(any(other.startswith(word) for other in others) for word in rest):
+                    continue
+            name, surname, email = self.contacts[contact_id]
+            found.append({"id": contact_id, "name": name, "surname": surname, "email": email})
+            if len(found) >= limit:
+                break
+        return found
+
+
+class Typeahead:
+    """Per-user :class:`PrefixIndex` cache with LRU eviction.
+
+    A user's index is built from the ``contacts`` table on their first
+    suggestion request and kept current by :meth:`add` and :meth:`remove`,
+    which the contact routes call after each write. Writes handled by other
+    workers are not seen here, so an index is rebuilt once it is older than
+    ``ttl`` seconds. At most ``max_users`` indexes are kept per worker.
+    """
+
+    def __init__(self, max_users: int, ttl: float):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._indexes: OrderedDict[int, tuple[PrefixIndex, float]] = OrderedDict()
+        self._builds: dict[int, asyncio.Future] = {}
+        self._stale: set[int] = set()
+
+    async def suggest(self, query: str, limit: int, db: AsyncSession, user_id: int) -> list[dict]:
+        """Suggest contacts of ``user_id`` whose fields start with ``query``.
+
+        :param query: text typed so far
+        :type query: str
+        :param limit: maximum number of suggestions
+        :type limit: int
+        :param db: database session, used only when the index must be built
+        :type db: AsyncSession
+        :param user_id: owner of the contacts
+        :type user_id: int
+        :return: suggestions with id, name, surname and email
+        :rtype: list[dict]
+        """
+        index = await self._index(db, user_id)
+        return index.search(query, limit)
+
+    async def _index(self, db: AsyncSession, user_id: int) -> PrefixIndex:
+        cached = self._indexes.get(user_id)
+        if cached is not None and time.monotonic() - cached[1] < self.ttl:
+            self._indexes.move_to_end(user_id)
+            cache_requests.inc("typeahead", "hit")
+            return cached[0]
+        cache_requests.inc("typeahead", "miss")
+        build = self._builds.get(user_id)
+        if build is not None:
+            return await asyncio.shield(build)
+
+        build = self._builds[user_id] = asyncio.get_running_loop().create_future()
+        try:
+            result = await db.execute(
+                select(Contact.id, Contact.name, Contact.surname, Contact.email).where(Contact.user_id == user_id)
+            )
+            index = PrefixIndex(result.all())
+        except BaseException as err:
+            build.set_exception(err)
+            # nobody may be waiting on the build; do not warn about an unretrieved exception
+            build.exception()
+            raise
+        finally:
+            del self._builds[user_id]
+        # a write that committed while the rows were read may be missing from them
+        if user_id in self._stale:
+            self._stale.discard(user_id)
+        else:
+            self._store(user_id, index)
+        build.set_result(index)
+        return index
+
+    def _store(self, user_id: int, index: PrefixIndex) -> None:
+        self._indexes[user_id] = (index, time.monotonic())
+        self._indexes.move_to_end(user_id)
+        while len(self._indexes) > self.max_users:
+            self._indexes.popitem(last=False)
+
+    def add(self, contact: Contact) -> None:
+        """Index a created or updated contact."""
+        if contact.user_id in self._builds:
+            self._stale.add(contact.user_id)
+        cached = self._indexes.get(contact.user_id)
+        if cached is not None:
+            cached[0].add(contact.id, contact.name, contact.surname, contact.email)
+
+    def remove(self, user_id: int, contact_id: int) -> None:
+        """Drop a deleted contact from the index."""
+        if user_id in self._builds:
+            self._stale.add(user_id)
+        cached = self._indexes.get(user_id)
+        if cached is not None:
+            cached[0].remove(contact_id)
+
+    def clear(self) -> None:
+        self._indexes.clear()
+        self._stale.clear()
+
+
+typeahead = Typeahead(config.TYPEAHEAD_MAX_USERS, config.TYPEAHEAD_TTL)
@@ -8,8 +8,10 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, Asyn
 
 from main import app
 from src.entity.models import Base, User
-from src.database.db import get_db
+from src.database.db import enable_sqlite_savepoints, get_db
 from src.services.auth import auth_service
+from src.services.loop_watchdog import loop_watchdog
+from tests.query_budget import QueryBudgetGuard
 
 SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
@@ -18,11 +20,14 @@ engine = create_async_engine(
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
+enable_sqlite_savepoints(engine)
 
 TestingSessionLocal = async_sessionmaker(
     autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
 )
 
+query_guard = QueryBudgetGuard(app, engine)
+
 test_user = {
     "username": "testuser",
     "email": "testuser@example.com",
@@ -66,10 +71,27 @@ def client():
 
     app.dependency_overrides[get_db] = override_get_db
 
-    yield TestClient(app)
+    yield TestClient(query_guard)
 
 
 @pytest_asyncio.fixture()
 async def get_token():
     token = await auth_service.create_access_token(data={"sub": test_user["email"]})
     return token
+
+
+@pytest.fixture(autouse=True)
+def fail_on_blocked_event_loop():
+    loop_watchdog.violations.clear()
+    yield
+    if loop_watchdog.strict and loop_watchdog.violations:
+        routes = ", ".join(violation["route"] for violation in loop_watchdog.violations)
+        pytest.fail(f"Event loop was blocked in: {routes}", pytrace=False)
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets():
+    query_guard.reset()
+    yield
+    if query_guard.violations:
+        pytest.fail("\n".join(query_guard.violations), pytrace=False)
@@ -0,0 +1,119 @@
+import functools
+import sys
+from contextvars import ContextVar
+
+import greenlet
+from redis.asyncio.client import Pipeline, Redis
+from sqlalchemy import event
+
+_current: ContextVar["RequestQueries | None"] = ContextVar("request_queries", default=None)
+
+
+def _origin() -> str:
+    """Name the ``src.repository`` function that issued the current statement.
+
+    SQL runs inside the greenlet spawned by the async session, so once the
+    greenlet's own stack is exhausted the walk continues in the parent
+    greenlet, which is suspended inside the awaiting coroutines.
+    """
+    frame = sys._getframe(2)
+    current = greenlet.getcurrent()
+    while True:
+        while frame is not None:
+            module = frame.f_globals.get("__name__", "")
+            if module.startswith(("src.repository.", "src.services.", "src.routes.", "main")):
+                return f"{module}.{frame.f_code.co_name}"
+            frame = frame.f_back
+        current = current.parent
+        if current is None:
+            return "<unknown>"
+        frame = current.gr_frame
+
+
+class RequestQueries:
+    def __init__(self):
+        self.sql: list[tuple[str, str]] = []
+        self.redis: list[tuple[str, str]] = []
+
+
+class QueryBudgetGuard:
+    """ASGI wrapper counting SQL statements and Redis commands per request.
+
+    Counts are compared with the budget declared on the endpoint through
+    :func:`src.services.query_budget.query_budget`; requests over budget and
+    routes without a budget are collected in :attr:`violations`.
+    """
+
+    def __init__(self, app, engine):
+        self.app = app
+        self.violations: list[str] = []
+        self.requests: list[tuple[str, RequestQueries]] = []
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_statement)
+        self._patch_redis()
+
+    def __getattr__(self, name):
+        return getattr(self.app, name)
+
+    def _on_statement(self, conn, cursor, statement, parameters, context, executemany):
+        if statement == "BEGIN":
+            # emitted by the engine on SQLite only, implicit in the Postgres driver
+            return
+        queries = _current.get()
+        if queries is not None:
+            queries.sql.append((" ".join(statement.split()), _origin()))
+
+    def _patch_redis(self) -> None:
+        def counted(method, name):
+            @functools.wraps(method)
+            async def wrapper(self, *args, **kwargs):
+                queries = _current.get()
+                if queries is not None:
+                    command = name or str(args[0])
+                    queries.redis.append((command, _origin()))
+                return await method(self, *args, **kwargs)
+
+            return wrapper
+
+        if not getattr(Redis.execute_command, "__query_budget_patched__", False):
+            Redis.execute_command = counted(Redis.execute_command, None)
+            Redis.execute_command.__query_budget_patched__ = True
+            Pipeline.execute = counted(Pipeline.execute, "PIPELINE")
+
+    def reset(self) -> None:
+        self.violations.clear()
+        self.requests.clear()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        queries = RequestQueries()
+        token = _current.set(queries)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            self._check(scope, queries)
+
+    def _check(self, scope, queries: RequestQueries) -> None:
+        route = scope.get("route")
+        if route is None:
+            return
+        name = f"{scope['method']} {route.path}"
+        self.requests.append((name, queries))
+        budget = getattr(route.endpoint, "__query_budget__", None)
+        if budget is None:
+            self.violations.append(f"{name} has no query budget\n{self._describe(queries)}")
+            return
+        if len(queries.sql) > budget["sql"] or len(queries.redis) > budget["redis"]:
+            self.violations.append(
+                f"{name} issued {len(queries.sql)} SQL statements (budget {budget['sql']}) "
+                f"and {len(queries.redis)} Redis commands (budget {budget['redis']})\n"
+                f"{self._describe(queries)}"
+            )
+
+    @staticmethod
+    def _describe(queries: RequestQueries) -> str:
+        lines = [f"  SQL   {origin}: {statement[:120]}" for statement, origin in queries.sql]
+        lines += [f"  Redis {origin}: {command}" for command, origin in queries.redis]
+        return "\n".join(lines)
@@ -0,0 +1,24 @@
+from src.database.query_log import query_log
+
+
+def test_query_report_requires_token(client, monkeypatch):
+    monkeypatch.setattr("src.conf.config.config.ADMIN_TOKEN", None)
+    response = client.get("/api/admin/queries", headers={"X-Admin-Token": "anything"})
+    assert response.status_code == 403, response.text
+
+
+def test_query_report(client, monkeypatch):
+    monkeypatch.setattr("src.conf.config.config.ADMIN_TOKEN", "admin-secret")
+    query_log.reset()
+    query_log.record("SELECT * FROM contacts WHERE id = 1", 0.002, 1)
+    response = client.get(
+        "/api/admin/queries", params={"limit": 5}, headers={"X-Admin-Token": "wrong"}
+    )
+    assert response.status_code == 403, response.text
+    response = client.get(
+        "/api/admin/queries", params={"limit": 5}, headers={"X-Admin-Token": "admin-secret"}
+    )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data[0]["fingerprint"] == "SELECT * FROM contacts WHERE id = ?"
+    assert data[0]["count"] == 1
@@ -1,12 +1,16 @@
-from unittest.mock import Mock
+import asyncio
+from unittest.mock import Mock, patch
 
 import pytest
+from fakeredis import FakeAsyncRedis
 from sqlalchemy import select
 from fastapi import status
 
 from src.conf import messages
 from src.entity.models import User
 from src.services.auth import auth_service
+from src.services.redis_pool import redis_pool
+from src.services.token_denylist import token_denylist
 from tests.conftest import TestingSessionLocal
 
 
@@ -105,3 +109,44 @@ def test_refresh_token(client):
     assert response.status_code == 401, response.text
     data = response.json()
     assert data["detail"] == messages.INVALID_REFRESH_TOKEN
+
+
+@pytest.fixture()
+def fake_redis():
+    redis_pool.start(FakeAsyncRedis())
+    yield
+    asyncio.run(redis_pool.close())
+
+
+def test_logout_revokes_access_token(client, fake_redis):
+    response = client.post(
+        "api/auth/login",
+        data={"username": user_data.get("email"), "password": user_data.get("password")},
+    )
+    assert response.status_code == 200, response.text
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert client.get("api/users/me/", headers=headers).status_code == 200
+
+    response = client.post("api/auth/logout", headers=headers)
+    assert response.status_code == 204, response.text
+    response = client.get("api/users/me/", headers=headers)
+    assert response.status_code == 401, response.text
+
+
+def test_logout_without_redis_drops_the_refresh_token(client, fake_redis):
+    response = client.post(
+        "api/auth/login",
+        data={"username": user_data.get("email"), "password": user_data.get("password")},
+    )
+    assert response.status_code == 200, response.text
+    tokens = response.json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    with patch.object(token_denylist, "revoke", side_effect=ConnectionError("Redis is down")):
+        response = client.post("api/auth/logout", headers=headers)
+    assert response.status_code == 503, response.text
+    assert response.json()["detail"] == messages.LOGOUT_NOT_REVOKED
+    response = client.post(
+        "api/auth/refresh_token", headers={"Authorization": f"Bearer {tokens['refresh_token']}"}
+    )
+    assert response.status_code == 401, response.text
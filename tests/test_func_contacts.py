@@ -1,13 +1,20 @@
-from unittest.mock import Mock, patch, AsyncMock
+import asyncio
+from datetime import date
+from unittest.mock import Mock, patch
 
 import pytest
 import pytest_asyncio
+from fakeredis import FakeAsyncRedis
+from sqlalchemy import select
 
 from src.conf import messages
-from src.entity.models import Contact
-from tests.conftest import client, test_user, TestingSessionLocal
+from src.entity.models import Contact, User
+from src.database.counters import reconcile
+from tests.conftest import client, engine, query_guard, test_user, TestingSessionLocal
 
 from src.services.auth import auth_service
+from src.services.redis_pool import redis_pool
+from src.services.typeahead import typeahead
 
 contact_data = {
     "name": "test",
@@ -27,10 +34,7 @@ def test_get_contacts(client, get_token):
     assert len(data) == 0
 
 
-def test_create_contact(client, get_token, monkeypatch):
-    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.redis", AsyncMock())
-    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.identifier", AsyncMock())
-    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.http_callback", AsyncMock())
+def test_create_contact(client, get_token):
     token = get_token
     headers = {"Authorization": f"Bearer {token}"}
     response = client.post(
@@ -94,6 +98,40 @@ def test_get_contact_by_surname(client, get_token):
     assert data["birthday"] == contact_data["birthday"]
 
 
+def test_get_contact_by_exact_email_and_phone(client, get_token):
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get(
+        "/api/contacts/search",
+        params={"email": contact_data["email"].upper()},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["email"] == contact_data["email"]
+    response = client.get(
+        "/api/contacts/search", params={"phone": "111-111-111"}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["phone"] == contact_data["phone"]
+    response = client.get(
+        "/api/contacts/search", params={"email": "other@test.com"}, headers=headers
+    )
+    assert response.status_code == 404, response.text
+
+
+def test_suggest_contacts(client, get_token):
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    typeahead.clear()
+    response = client.get("/api/contacts/suggest", params={"q": "TE"}, headers=headers)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert [suggestion["email"] for suggestion in data] == [contact_data["email"]]
+    response = client.get("/api/contacts/suggest", params={"q": "nobody"}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json() == []
+
+
 def test_update_contact(client, get_token):
     token = get_token
     headers = {"Authorization": f"Bearer {token}"}
@@ -112,6 +150,8 @@ def test_update_contact(client, get_token):
     updated_contact = update_response.json()
     assert updated_contact["email"] == updated_contact_data["email"]
     assert updated_contact["phone"] == updated_contact_data["phone"]
+    response = client.get("/api/contacts/suggest", params={"q": "test1"}, headers=headers)
+    assert [suggestion["email"] for suggestion in response.json()] == [updated_contact_data["email"]]
 
 
 def test_delete_contact(client, get_token):
@@ -123,6 +163,8 @@ def test_delete_contact(client, get_token):
         headers=headers,
     )
     assert delete_response.status_code == 204, delete_response.text
+    response = client.get("/api/contacts/suggest", params={"q": "te"}, headers=headers)
+    assert response.json() == []
 
 
 def test_get_upcoming_birthday(client, get_token):
@@ -132,3 +174,193 @@ def test_get_upcoming_birthday(client, get_token):
     assert response.status_code == 404, response.text
     data = response.json()
     assert data["detail"] == messages.BIRTHDAYS_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_find_and_merge_duplicates(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    async with TestingSessionLocal() as session:
+        user = (await session.execute(select(User).where(User.email == test_user["email"]))).scalar_one()
+        contacts = [
+            Contact(name="Olena", surname="Shevchenko", email="olena.shevchenko@gmail.com",
+                    phone="0501234567", birthday=date(1990, 1, 1), user_id=user.id),
+            Contact(name="Olena", surname="Shevcenko", email="olenashevchenko@ukr.net",
+                    phone="501234567", birthday=date(1990, 1, 1), user_id=user.id),
+            Contact(name="Ivan", surname="Koval", email="ivan@koval.com",
+                    phone="0670000000", birthday=date(1985, 5, 5), user_id=user.id),
+        ]
+        session.add_all(contacts)
+        await session.commit()
+        primary, duplicate, _ = [contact.id for contact in contacts]
+
+    response = client.get("/api/contacts/duplicates", headers=headers)
+    assert response.status_code == 200, response.text
+    groups = response.json()
+    assert len(groups) == 1
+    assert [contact["id"] for contact in groups[0]["contacts"]] == [primary, duplicate]
+    # same mailbox name at another domain is not evidence
+    assert groups[0]["reasons"] == ["birthday", "name", "phone"]
+
+    response = client.post(
+        "/api/contacts/merge",
+        json={"primary_id": primary, "duplicate_ids": [primary]},
+        headers=headers,
+    )
+    assert response.status_code == 400, response.text
+    async with TestingSessionLocal() as session:
+        count = (await session.execute(select(User.contacts_count).where(User.id == user.id))).scalar_one()
+    # a repeated id is one contact
+    response = client.post(
+        "/api/contacts/merge",
+        json={"primary_id": primary, "duplicate_ids": [duplicate, duplicate], "keep": {"email": duplicate}},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    async with TestingSessionLocal() as session:
+        merged = (await session.execute(select(User.contacts_count).where(User.id == user.id))).scalar_one()
+    assert merged == count - 1
+    assert response.json()["id"] == primary
+    assert response.json()["email"] == "olenashevchenko@ukr.net"
+    response = client.post(
+        "/api/contacts/merge",
+        json={"primary_id": primary, "duplicate_ids": [duplicate]},
+        headers=headers,
+    )
+    assert response.status_code == 404, response.text
+
+    response = client.get("/api/contacts/duplicates", headers=headers)
+    assert response.json() == []
+    response = client.get("/api/contacts/search", params={"email": "OlenaShevchenko@ukr.net"}, headers=headers)
+    assert response.json()["id"] == primary
+
+
+def batch_contact(n):
+    return {
+        "name": f"batch{n}",
+        "surname": "batch",
+        "email": f"batch{n}@test.com",
+        "phone": f"555000{n:04d}",
+        "birthday": "1990-05-05",
+    }
+
+
+def test_batch_contacts(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    response = client.post(
+        "/api/contacts/batch",
+        json={"operations": [{"op": "create", "data": batch_contact(n)} for n in (1, 2)]},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["committed"] is True
+    assert [result["status"] for result in data["results"]] == [201, 201]
+    first, second = [result["contact"]["id"] for result in data["results"]]
+
+    response = client.post(
+        "/api/contacts/batch",
+        json={
+            "atomic": False,
+            "operations": [
+                {"op": "update", "id": first, "data": {"email": "batch1-new@test.com"}},
+                {"op": "create", "data": {**batch_contact(3), "email": batch_contact(2)["email"]}},
+                {"op": "create", "data": batch_contact(4)},
+                {"op": "delete", "id": second},
+                {"op": "update", "id": 999999, "data": {"phone": "0"}},
+            ],
+        },
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["committed"] is True
+    assert [result["status"] for result in data["results"]] == [200, 409, 201, 204, 404]
+    assert data["results"][0]["contact"]["email"] == "batch1-new@test.com"
+    assert data["results"][2]["contact"]["email"] == batch_contact(4)["email"]
+
+    response = client.post(
+        "/api/contacts/batch",
+        json={
+            "operations": [
+                {"op": "create", "data": batch_contact(5)},
+                {"op": "delete", "id": first},
+                {"op": "create", "data": {**batch_contact(6), "email": batch_contact(4)["email"]}},
+            ],
+        },
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["committed"] is False
+    assert [result["status"] for result in data["results"]] == [424, 424, 409]
+    response = client.get("/api/contacts/search", params={"email": "batch1-new@test.com"}, headers=headers)
+    assert response.status_code == 200, response.text
+    response = client.get("/api/contacts/search", params={"email": batch_contact(5)["email"]}, headers=headers)
+    assert response.status_code == 404, response.text
+
+
+@pytest.fixture()
+def fake_redis():
+    # earlier requests may have started the pool against a missing server
+    asyncio.run(redis_pool.close())
+    redis_pool.start(FakeAsyncRedis())
+    yield
+    asyncio.run(redis_pool.close())
+
+
+def test_update_contact_retry_is_replayed(client, get_token, fake_redis):
+    headers = {"Authorization": f"Bearer {get_token}", "Idempotency-Key": "update-retry-1"}
+    params = {"email": batch_contact(4)["email"]}
+    body = {"phone": "5550009999"}
+    response = client.patch("/api/contacts/update", params=params, json=body, headers=headers)
+    assert response.status_code == 200, response.text
+    query_guard.requests.clear()
+    retry = client.patch("/api/contacts/update", params=params, json=body, headers=headers)
+    assert retry.status_code == 200, retry.text
+    assert retry.json() == response.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert [len(queries.sql) for _, queries in query_guard.requests] == [0]
+    retry = client.patch("/api/contacts/update", params=params, json={"phone": "5550008888"}, headers=headers)
+    assert retry.status_code == 422, retry.text
+
+
+@pytest.mark.asyncio
+async def test_get_contacts_total_count(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    response = client.get("/api/contacts/", params={"limit": 500}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert "X-Total-Count" not in response.headers
+    total = len(response.json())
+    assert total > 1
+    # contacts added behind the API's back (test_find_and_merge_duplicates)
+    # are not counted: a drifted counter never reports fewer than a full page
+    # shows, and reconciling fixes it
+    response = client.get("/api/contacts/", params={"limit": 1, "offset": 2, "count": "counter"}, headers=headers)
+    assert int(response.headers["X-Total-Count"]) >= 3
+    assert await reconcile(engine, pause=0, report=lambda line: None) == 1
+    assert await reconcile(engine, pause=0, report=lambda line: None) == 0
+    # estimate needs Postgres and falls back to the counter
+    for mode, used in (("exact", "exact"), ("counter", "counter"), ("estimate", "counter")):
+        for offset, page in ((0, 1), (total - 1, 1), (total + 5, 0)):
+            response = client.get(
+                "/api/contacts/", params={"limit": 1, "offset": offset, "count": mode}, headers=headers
+            )
+            assert response.status_code == 200, response.text
+            assert len(response.json()) == page
+            assert response.headers["X-Total-Count"] == str(total)
+            assert response.headers["X-Total-Pages"] == str(total)
+            assert response.headers["X-Total-Count-Mode"] == used
+
+    response = client.post(
+        "/api/contacts/batch", json={"operations": [{"op": "create", "data": batch_contact(7)}]}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    created = response.json()["results"][0]["id"]
+    response = client.get("/api/contacts/", params={"limit": 1, "count": "counter"}, headers=headers)
+    assert response.headers["X-Total-Count"] == str(total + 1)
+    response = client.post(
+        "/api/contacts/batch", json={"operations": [{"op": "delete", "id": created}]}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    response = client.get("/api/contacts/", params={"limit": 1, "count": "counter"}, headers=headers)
+    assert response.headers["X-Total-Count"] == str(total)
@@ -0,0 +1,26 @@
+from src.services.metrics import Histogram
+
+
+def test_histogram_render():
+    histogram = Histogram("test_seconds", "Test histogram.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+    rendered = histogram.render()
+    assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in rendered
+    assert 'test_seconds_bucket{route="/a",le="1.0"} 2' in rendered
+    assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in rendered
+    assert 'test_seconds_count{route="/a"} 3' in rendered
+
+
+def test_metrics_endpoint(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    response = client.get("api/contacts/", headers=headers)
+    assert response.status_code == 200, response.text
+    response = client.get("/metrics")
+    assert response.status_code == 200, response.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/api/contacts/"}'
+        in response.text
+    )
+    assert 'http_requests_total{method="GET",route="/api/contacts/",status="200"}' in response.text
@@ -0,0 +1,29 @@
+from main import app
+from tests.conftest import query_guard
+
+
+def _endpoint(path, method):
+    for route in app.routes:
+        if getattr(route, "path", None) == path and method in getattr(route, "methods", ()):
+            return route.endpoint
+
+
+def test_list_contacts_within_budget(client, get_token):
+    response = client.get("api/contacts", headers={"Authorization": f"Bearer {get_token}"})
+    assert response.status_code == 200, response.text
+    name, queries = query_guard.requests[-1]
+    assert name == "GET /api/contacts/"
+    assert len(queries.sql) == 2
+    assert any(origin.startswith("src.repository.contacts.") for _, origin in queries.sql)
+
+
+def test_over_budget_is_reported(client, get_token, monkeypatch):
+    endpoint = _endpoint("/api/contacts/", "GET")
+    monkeypatch.setattr(endpoint, "__query_budget__", {"sql": 1, "redis": 0})
+    response = client.get("api/contacts", headers={"Authorization": f"Bearer {get_token}"})
+    assert response.status_code == 200, response.text
+    violations = list(query_guard.violations)
+    query_guard.reset()
+    assert len(violations) == 1
+    assert "issued 2 SQL statements (budget 1)" in violations[0]
+    assert "src.repository.users.get_user_by_email" in violations[0]
@@ -0,0 +1,78 @@
+import asyncio
+import unittest
+
+from fakeredis import FakeAsyncRedis
+
+from src.middleware.coalesce import CapturedResponse, CoalescingMiddleware
+from src.services.redis_pool import RedisPool
+
+
+class CountingApp:
+    def __init__(self, status: int = 200):
+        self.calls = 0
+        self.status = status
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.start", "status": self.status, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": f'{{"call": {self.calls}}}'.encode()})
+
+
+def http_scope(path="/api/contacts/", token=b"Bearer a", query=b"limit=10", method="GET"):
+    return {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query,
+        "headers": [(b"authorization", token)],
+    }
+
+
+async def request(middleware, scope) -> CapturedResponse:
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    return await CapturedResponse().capture(middleware, scope, receive)
+
+
+class TestCoalescingMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def test_identical_concurrent_reads_share_one_response(self):
+        app = CountingApp()
+        middleware = CoalescingMiddleware(app, ["/api/contacts/"])
+        responses = await asyncio.gather(*(request(middleware, http_scope()) for _ in range(5)))
+        self.assertEqual(app.calls, 1)
+        self.assertEqual({response.body for response in responses}, {b'{"call": 1}'})
+        # the next read after the first one finished is not served stale
+        self.assertEqual((await request(middleware, http_scope())).body, b'{"call": 2}')
+
+    async def test_different_users_queries_and_methods_are_not_merged(self):
+        app = CountingApp()
+        middleware = CoalescingMiddleware(app, ["/api/contacts/"])
+        await asyncio.gather(
+            request(middleware, http_scope(token=b"Bearer a")),
+            request(middleware, http_scope(token=b"Bearer b")),
+            request(middleware, http_scope(query=b"limit=20")),
+            request(middleware, http_scope(method="POST")),
+            request(middleware, http_scope(path="/api/contacts/search")),
+        )
+        self.assertEqual(app.calls, 5)
+
+    async def test_server_errors_are_not_shared(self):
+        app = CountingApp(status=500)
+        middleware = CoalescingMiddleware(app, ["/api/contacts/"])
+        await asyncio.gather(*(request(middleware, http_scope()) for _ in range(3)))
+        self.assertEqual(app.calls, 3)
+
+    async def test_workers_share_a_response_through_redis(self):
+        pool = RedisPool(max_connections=10, socket_timeout=1)
+        pool.start(FakeAsyncRedis())
+        app = CountingApp()
+        workers = [CoalescingMiddleware(app, ["/api/contacts/"], redis_pool=pool, redis_ttl=5) for _ in range(3)]
+        try:
+            responses = await asyncio.gather(*(request(worker, http_scope()) for worker in workers))
+        finally:
+            await pool.close()
+        self.assertEqual(app.calls, 1)
+        self.assertEqual({response.body for response in responses}, {b'{"call": 1}'})
+        self.assertEqual(responses[1].headers, [(b"content-type", b"application/json")])
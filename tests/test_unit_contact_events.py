@@ -0,0 +1,88 @@
+import asyncio
+import unittest
+
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from src.services.contact_events import RESYNC, ContactEvents, Subscription
+from src.services.redis_pool import RedisPool
+
+
+async def next_event(stream, skip_heartbeats: bool = True) -> bytes:
+    while True:
+        event = await asyncio.wait_for(anext(stream), 1)
+        if not (skip_heartbeats and event.startswith(b":")):
+            return event
+
+
+class TestSubscription(unittest.TestCase):
+    def test_overflow_is_replaced_with_resync(self):
+        subscription = Subscription(2)
+        self.assertTrue(subscription.put(b"a"))
+        self.assertTrue(subscription.put(b"b"))
+        self.assertFalse(subscription.put(b"c"))
+        self.assertEqual(subscription.queue.qsize(), 1)
+        self.assertEqual(subscription.queue.get_nowait(), RESYNC)
+
+
+class TestContactEvents(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        server = FakeServer()
+        # two workers, each with its own pool, sharing one Redis
+        self.pools = [RedisPool(max_connections=10, socket_timeout=1) for _ in range(2)]
+        for pool in self.pools:
+            pool.start(FakeAsyncRedis(server=server))
+        self.workers = [ContactEvents(pool, "contact_events", queue_size=2, heartbeat=0.05) for pool in self.pools]
+
+    async def asyncTearDown(self):
+        for pool in self.pools:
+            await pool.close()
+
+    async def test_dispatch_reaches_only_the_users_streams(self):
+        worker = self.workers[0]
+        own, other = worker.subscribe(1), worker.subscribe(2)
+        worker.dispatch(1, b'[{"op":"create","id":5}]')
+        self.assertEqual(own.queue.get_nowait(), b'event: contacts\ndata: [{"op":"create","id":5}]\n\n')
+        self.assertTrue(other.queue.empty())
+        worker.unsubscribe(1, own)
+        worker.unsubscribe(2, other)
+        self.assertEqual(worker.open_streams(), 0)
+
+    async def test_change_published_by_one_worker_reaches_streams_of_another(self):
+        watcher = asyncio.create_task(self.workers[1].watch())
+        stream = self.workers[1].stream(7)
+        try:
+            self.assertEqual(await next_event(stream), b"retry: 5000\n\n")
+            self.assertEqual(self.workers[1].open_streams(), 1)
+            # the pattern subscription may not be in place yet: publish until it is
+            event = None
+            for _ in range(100):
+                await self.workers[0].publish(7, [("update", 3), ("delete", 4)])
+                try:
+                    event = await next_event(stream)
+                    break
+                except asyncio.TimeoutError:
+                    continue
+            self.assertEqual(event, b'event: contacts\ndata: [{"op":"update","id":3},{"op":"delete","id":4}]\n\n')
+        finally:
+            await stream.aclose()
+            watcher.cancel()
+            await asyncio.gather(watcher, return_exceptions=True)
+        self.assertEqual(self.workers[1].open_streams(), 0)
+
+    async def test_idle_stream_gets_heartbeats(self):
+        stream = self.workers[0].stream(1)
+        await next_event(stream)
+        self.assertEqual(await next_event(stream, skip_heartbeats=False), b": ping\n\n")
+        await stream.aclose()
+
+    async def test_close_ends_open_streams_and_refuses_new_ones(self):
+        worker = self.workers[0]
+        stream = worker.stream(1)
+        await next_event(stream)
+        worker.dispatch(1, b"[]")
+        worker.close()
+        with self.assertRaises(StopAsyncIteration):
+            await next_event(stream)
+        with self.assertRaises(StopAsyncIteration):
+            await next_event(worker.stream(1))
+        self.assertEqual(worker.open_streams(), 0)
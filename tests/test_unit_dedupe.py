@@ -0,0 +1,59 @@
+import unittest
+from datetime import date
+from types import SimpleNamespace
+
+from src.services.dedupe import DuplicateFinder, soundex
+
+
+def contact(id, name, surname, email, phone, birthday=date(1990, 1, 1)):
+    return SimpleNamespace(id=id, name=name, surname=surname, email=email, phone=phone, birthday=birthday)
+
+
+class TestSoundex(unittest.TestCase):
+    def test_codes(self):
+        self.assertEqual(soundex("Robert"), "R163")
+        self.assertEqual(soundex("Rupert"), "R163")
+        self.assertEqual(soundex("Ashcraft"), "A261")
+        self.assertEqual(soundex("Tymczak"), "T522")
+        self.assertEqual(soundex("Pfister"), "P236")
+        self.assertEqual(soundex("Шевченко"), "шевч")
+
+
+class TestDuplicateFinder(unittest.TestCase):
+    def setUp(self):
+        self.finder = DuplicateFinder(threshold=0.7, window=50)
+
+    def test_groups_contacts_sharing_evidence(self):
+        rows = [
+            contact(1, "Olena", "Shevchenko", "olena.shevchenko@gmail.com", "0501234567"),
+            contact(2, "Olena", "Shevcenko", "olenashevchenko@googlemail.com", "0999999999"),
+            contact(3, "Olena", "Shevchenko", "o.s@proton.me", "+38 (050) 123-45-67"),
+            contact(4, "Ivan", "Koval", "ivan@koval.com", "0670000000"),
+        ]
+        groups = self.finder.find(rows)
+        self.assertEqual(len(groups), 1)
+        self.assertEqual([row.id for row in groups[0]["contacts"]], [1, 2, 3])
+        self.assertEqual(groups[0]["reasons"], ["birthday", "email", "name", "phone"])
+        self.assertGreater(groups[0]["score"], 0.9)
+
+    def test_same_name_alone_is_not_a_duplicate(self):
+        rows = [
+            contact(1, "Olena", "Shevchenko", "olena@gmail.com", "0501234567", date(1990, 1, 1)),
+            contact(2, "Olena", "Shevchenko", "shevchenko@ukr.net", "0670000000", date(1991, 2, 2)),
+        ]
+        self.assertEqual(self.finder.find(rows), [])
+        score, reasons = self.finder.score(*rows)
+        self.assertEqual(reasons, ["name"])
+        self.assertLess(score, 0.7)
+
+    def test_large_blocks_only_compare_neighbours(self):
+        finder = DuplicateFinder(threshold=0.7, window=2)
+        scored = []
+        score = finder.score
+        finder.score = lambda a, b: scored.append((a.id, b.id)) or score(a, b)
+        rows = [contact(n, "Info", f"Company{n}", f"info@company{n}.com", f"{n:010d}") for n in range(10)]
+        groups = finder.find(rows)
+        self.assertEqual(len(scored), 17)
+        # the same mailbox name at other domains shares a block but is no evidence
+        self.assertEqual(groups, [])
+        self.assertNotIn("email", finder.score(rows[0], rows[9])[1])
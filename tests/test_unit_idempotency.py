@@ -0,0 +1,132 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+
+from fakeredis import FakeAsyncRedis
+
+from src.middleware.coalesce import CapturedResponse
+from src.middleware.idempotency import IdempotencyMiddleware
+from src.services.metrics import cache_requests
+from src.services.redis_pool import RedisPool
+
+
+class CountingApp:
+    def __init__(self, status: int = 201):
+        self.calls = 0
+        self.bodies = []
+        self.status = status
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        self.bodies.append((await receive())["body"])
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.start", "status": self.status, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": f'{{"call": {self.calls}}}'.encode()})
+
+
+def http_scope(key=b"retry-1", path="/api/contacts/", method="POST", token=b"a"):
+    headers = [(b"authorization", b"Bearer " + token)]
+    if key is not None:
+        headers.append((b"idempotency-key", key))
+    return {"type": "http", "method": method, "path": path, "query_string": b"", "headers": headers}
+
+
+async def request(middleware, scope, body=b'{"name": "a"}') -> CapturedResponse:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return await CapturedResponse().capture(middleware, scope, receive)
+
+
+class TestIdempotencyMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.pool = RedisPool(max_connections=10, socket_timeout=1)
+        self.pool.start(FakeAsyncRedis())
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+
+    def middleware(self, app, **kwargs):
+        return IdempotencyMiddleware(app, self.pool, ["/api/contacts/"], ttl=60, wait=1, **kwargs)
+
+    async def test_retry_is_replayed_without_running_the_route(self):
+        app = CountingApp()
+        middleware = self.middleware(app)
+        hits = cache_requests.value("idempotency", "hit")
+        first = await request(middleware, http_scope())
+        retry = await request(middleware, http_scope())
+        self.assertEqual(app.calls, 1)
+        self.assertEqual(cache_requests.value("idempotency", "hit") - hits, 1)
+        self.assertEqual(app.bodies, [b'{"name": "a"}'])
+        self.assertEqual((retry.status, retry.body), (201, b'{"call": 1}'))
+        self.assertNotIn((b"idempotent-replayed", b"true"), first.headers)
+        self.assertIn((b"idempotent-replayed", b"true"), retry.headers)
+        # another key, method or path is another request
+        await request(middleware, http_scope(key=b"retry-2"))
+        await request(middleware, http_scope(method="PATCH"))
+        await request(middleware, http_scope(key=None))
+        self.assertEqual(app.calls, 4)
+
+    async def test_concurrent_duplicates_wait_for_the_first(self):
+        app = CountingApp()
+        middleware = self.middleware(app)
+        responses = await asyncio.gather(*(request(middleware, http_scope()) for _ in range(4)))
+        self.assertEqual(app.calls, 1)
+        self.assertEqual({response.body for response in responses}, {b'{"call": 1}'})
+
+    async def test_key_reused_with_another_body_is_rejected(self):
+        app = CountingApp()
+        middleware = self.middleware(app)
+        await request(middleware, http_scope())
+        response = await request(middleware, http_scope(), body=b'{"name": "b"}')
+        self.assertEqual(response.status, 422)
+        self.assertEqual(app.calls, 1)
+
+    async def test_server_errors_are_not_stored(self):
+        app = CountingApp(status=500)
+        middleware = self.middleware(app)
+        await request(middleware, http_scope())
+        response = await request(middleware, http_scope())
+        self.assertEqual(app.calls, 2)
+        self.assertEqual(response.status, 500)
+
+    async def test_requests_run_when_redis_is_down(self):
+        app = CountingApp()
+        middleware = self.middleware(app)
+        self.pool.client.set = AsyncMock(side_effect=ConnectionError("Redis is down"))
+        response = await request(middleware, http_scope())
+        self.assertEqual((app.calls, response.status), (1, 201))
+        self.pool.client.set.assert_awaited()
+
+    async def test_route_that_raises_releases_the_key(self):
+        app = CountingApp()
+        middleware = self.middleware(app)
+
+        async def failing(scope, receive, send):
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            await request(self.middleware(failing), http_scope())
+        response = await request(middleware, http_scope())
+        self.assertEqual((app.calls, response.status), (1, 201))
+
+    async def test_retry_with_a_refreshed_token_is_replayed(self):
+        app = CountingApp()
+        users = {"a": "olena@example.com", "b": "olena@example.com", "c": "ivan@example.com"}
+
+        async def identify(token):
+            return users.get(token)
+
+        middleware = self.middleware(app, identify=identify)
+        await request(middleware, http_scope(token=b"a"))
+        retry = await request(middleware, http_scope(token=b"b"))
+        self.assertEqual((retry.status, retry.body, app.calls), (201, b'{"call": 1}', 1))
+        self.assertIn((b"idempotent-replayed", b"true"), retry.headers)
+        # the same key of another user is another request
+        await request(middleware, http_scope(token=b"c"))
+        self.assertEqual(app.calls, 2)
+
+        response = await request(middleware, http_scope(token=b"revoked"))
+        self.assertEqual(response.status, 401)
+        self.assertIn((b"www-authenticate", b"Bearer"), response.headers)
+        self.assertEqual(app.calls, 2)
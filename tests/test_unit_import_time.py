@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# cumulative import time of ``main``; wall-clock, so only checked when set,
+# e.g. IMPORT_TIME_BUDGET_MS=2000 on a machine known to be quiet
+IMPORT_TIME_BUDGET_MS = float(os.environ.get("IMPORT_TIME_BUDGET_MS", 0))
+LAZY_MODULES = ("cloudinary", "fastapi_mail", "passlib", "jose.jwt", "redis")
+
+
+def import_times(module: str) -> dict[str, tuple[float, float]]:
+    """Import ``module`` in a fresh interpreter under ``-X importtime``.
+
+    :return: self and cumulative milliseconds per imported module
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            times[name.strip()] = (int(own) / 1000, int(cumulative) / 1000)
+    return times
+
+
+def slowest(times: dict[str, tuple[float, float]], limit: int = 15) -> str:
+    ranked = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+    return "\n".join(f"  {own:8.1f} ms self {cumulative:8.1f} ms total  {name}" for name, (own, cumulative) in ranked)
+
+
+class TestImportTime(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.times = import_times("main")
+
+    def test_heavy_integrations_are_not_imported_at_startup(self):
+        eager = [module for module in LAZY_MODULES if module in self.times]
+        self.assertEqual(eager, [], f"imported eagerly by main:\n{slowest(self.times)}")
+
+    @unittest.skipUnless(IMPORT_TIME_BUDGET_MS, "set IMPORT_TIME_BUDGET_MS to check the import time")
+    def test_startup_import_budget(self):
+        total = self.times["main"][1]
+        self.assertLessEqual(
+            total,
+            IMPORT_TIME_BUDGET_MS,
+            f"importing main took {total:.0f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms); slowest modules:\n"
+            f"{slowest(self.times)}",
+        )
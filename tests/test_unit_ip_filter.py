@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import AsyncMock
+
+from src.middleware.ip_filter import BanList, IPFilterMiddleware
+
+
+class TestBanList(unittest.TestCase):
+    def test_single_addresses(self):
+        ban_list = BanList(["192.168.1.1", "192.168.1.2"])
+        self.assertIn("192.168.1.1", ban_list)
+        self.assertIn("192.168.1.2", ban_list)
+        self.assertNotIn("192.168.1.3", ban_list)
+
+    def test_cidr_ranges(self):
+        ban_list = BanList(["10.0.0.0/8", "172.16.5.0/24"])
+        self.assertIn("10.255.255.255", ban_list)
+        self.assertIn("172.16.5.17", ban_list)
+        self.assertNotIn("11.0.0.0", ban_list)
+        self.assertNotIn("172.16.6.1", ban_list)
+
+    def test_ipv6(self):
+        ban_list = BanList(["2001:db8::/32", "10.0.0.0/8"])
+        self.assertIn("2001:db8:1::1", ban_list)
+        self.assertNotIn("2001:db9::1", ban_list)
+        self.assertIn("::ffff:10.1.2.3", ban_list)
+
+    def test_overlapping_ranges_are_merged(self):
+        ban_list = BanList(["10.0.0.0/24", "10.0.0.128/25", "10.0.1.0/24"])
+        self.assertEqual(ban_list._tables[4][0], [int.from_bytes(bytes([10, 0, 0, 0]), "big")])
+        self.assertIn("10.0.1.200", ban_list)
+
+    def test_invalid_entries_and_hosts(self):
+        ban_list = BanList(["not an ip", b"192.168.0.0/16"])
+        self.assertEqual(ban_list.size, 1)
+        self.assertIn("192.168.10.10", ban_list)
+        self.assertNotIn("testclient", ban_list)
+
+    def test_replace(self):
+        ban_list = BanList(["192.168.1.1"])
+        ban_list.replace(["192.168.1.2"])
+        self.assertNotIn("192.168.1.1", ban_list)
+        self.assertIn("192.168.1.2", ban_list)
+
+
+class TestIPFilterMiddleware(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.app = AsyncMock()
+        self.middleware = IPFilterMiddleware(self.app, BanList(["10.0.0.0/8"]))
+
+    async def test_banned_client(self):
+        send = AsyncMock()
+        scope = {"type": "http", "client": ("10.1.1.1", 1234)}
+        await self.middleware(scope, AsyncMock(), send)
+        self.app.assert_not_awaited()
+        self.assertEqual(send.await_args_list[0].args[0]["status"], 403)
+
+    async def test_allowed_client(self):
+        scope = {"type": "http", "client": ("127.0.0.1", 1234)}
+        await self.middleware(scope, AsyncMock(), AsyncMock())
+        self.app.assert_awaited_once()
+
+    async def test_load_from_redis(self):
+        redis = AsyncMock()
+        redis.smembers.return_value = {b"127.0.0.0/8"}
+        await self.middleware.ban_list.load(redis, "banned_ips")
+        self.assertIn("127.0.0.1", self.middleware.ban_list)
+        self.assertNotIn("10.1.1.1", self.middleware.ban_list)
+
+
+if __name__ == "__main__":
+    unittest.main()
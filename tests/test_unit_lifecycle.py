@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import unittest
+
+from src.database.db import DatabaseSessionManager
+from src.middleware.drain import DrainMiddleware, InFlightRequests
+from src.services.auth import Auth
+
+
+class TestDrain(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.in_flight = InFlightRequests()
+        self.release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await self.release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"done"})
+
+        self.middleware = DrainMiddleware(app, self.in_flight)
+
+    async def request(self) -> list[dict]:
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        await self.middleware({"type": "http", "method": "GET", "path": "/", "headers": []}, receive, send)
+        return messages
+
+    async def test_drain_waits_for_requests_in_flight(self):
+        running = asyncio.create_task(self.request())
+        await asyncio.sleep(0)
+        self.assertEqual(self.in_flight.count, 1)
+
+        drain = asyncio.create_task(self.in_flight.drain(timeout=5))
+        await asyncio.sleep(0)
+        rejected = await self.request()
+        self.assertEqual(rejected[0]["status"], 503)
+        self.assertIn((b"connection", b"close"), rejected[0]["headers"])
+        self.assertFalse(drain.done())
+
+        self.release.set()
+        self.assertEqual(await drain, 0)
+        self.assertEqual((await running)[1]["body"], b"done")
+
+    async def test_drain_gives_up_after_timeout(self):
+        running = asyncio.create_task(self.request())
+        await asyncio.sleep(0)
+        self.assertEqual(await self.in_flight.drain(timeout=0.05), 1)
+        self.release.set()
+        await running
+        self.assertEqual(self.in_flight.count, 0)
+
+
+class TestHashingPool(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.auth = Auth()
+        self.auth.start_hashing_pool(2)
+
+    def tearDown(self):
+        self.auth.stop_hashing_pool()
+
+    async def test_hashing_runs_on_pool_threads(self):
+        threads = []
+        get_password_hash = self.auth.get_password_hash
+
+        def recording_hash(password):
+            threads.append(threading.current_thread().name)
+            return get_password_hash(password)
+
+        self.auth.get_password_hash = recording_hash
+        hashed = await self.auth.get_password_hash_async("secret")
+        self.assertTrue(await self.auth.verify_password_async("secret", hashed))
+        self.assertFalse(await self.auth.verify_password_async("wrong", hashed))
+        self.assertTrue(threads[0].startswith("password-hash"))
+
+
+class TestSessionManager(unittest.IsolatedAsyncioTestCase):
+    async def test_engine_is_created_lazily_and_replaced_after_fork(self):
+        manager = DatabaseSessionManager("sqlite+aiosqlite://")
+        self.assertIsNone(manager._engine)
+        engine = manager.engine
+        await manager.warmup()
+
+        manager._after_fork()
+        self.assertIsNone(manager._engine)
+        self.assertIsNot(manager.engine, engine)
+        await manager.close()
+        await engine.dispose()
@@ -0,0 +1,60 @@
+import asyncio
+import time
+import unittest
+
+from src.services.loop_watchdog import LoopWatchdog
+from src.services.request_context import request_scope
+
+
+class _Route:
+    path = "/api/users/avatar"
+
+
+def blocking_upload():
+    time.sleep(0.3)
+
+
+class AvatarApp:
+    async def __call__(self, scope, receive, send):
+        blocking_upload()
+
+
+class TestLoopWatchdog(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.watchdog = LoopWatchdog(threshold=0.1, strict=True)
+
+    def tearDown(self):
+        self.watchdog.stop()
+
+    async def test_blocking_call_is_reported_with_stack_and_route(self):
+        self.watchdog.ensure_running()
+        await asyncio.sleep(0.05)
+        scope = {"type": "http", "method": "PATCH", "path": "/api/users/avatar", "route": _Route}
+        token = request_scope.set(scope)
+        try:
+            await AvatarApp()(scope, None, None)
+        finally:
+            request_scope.reset(token)
+        await asyncio.sleep(0.05)
+        [violation] = self.watchdog.violations
+        self.assertIn("blocking_upload", violation["stack"])
+        self.assertGreaterEqual(violation["blocked_ms"], 100)
+        self.assertEqual(violation["route"], "PATCH /api/users/avatar")
+
+    async def test_stall_outside_a_request_has_no_route(self):
+        self.watchdog.ensure_running()
+        await asyncio.sleep(0.05)
+        blocking_upload()
+        await asyncio.sleep(0.05)
+        [violation] = self.watchdog.violations
+        self.assertEqual(violation["route"], "<no request>")
+
+    async def test_non_blocking_code_is_not_reported(self):
+        self.watchdog.ensure_running()
+        for _ in range(10):
+            await asyncio.sleep(0.02)
+        self.assertEqual(self.watchdog.violations, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
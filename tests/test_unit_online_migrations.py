@@ -0,0 +1,78 @@
+import unittest
+
+from sqlalchemy import create_engine, text
+
+from src.database.online_migrations import (
+    backfill,
+    create_index_concurrently,
+    drop_index_concurrently,
+    reset_backfill,
+)
+
+
+class Crash(Exception):
+    pass
+
+
+class TestOnlineMigrations(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        self.connection = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        self.connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT, derived TEXT)"))
+        self.connection.execute(
+            text("INSERT INTO items (id, value) VALUES (:id, :value)"),
+            [{"id": n, "value": f"V{n}"} for n in range(1, 101)],
+        )
+        self.connection.execute(text("UPDATE items SET derived = 'done' WHERE id % 10 = 0"))
+
+    def tearDown(self):
+        self.connection.close()
+        self.engine.dispose()
+
+    def backfill(self, report=lambda line: None):
+        return backfill(
+            "items", "derived = lower(value)", name="test_items", where="derived IS NULL",
+            chunk_size=7, pause=0, connection=self.connection, report=report,
+        )
+
+    def test_backfill_updates_in_chunks(self):
+        lines = []
+        self.assertEqual(self.backfill(lines.append), 90)
+        self.assertEqual(len(lines), 16)  # 15 chunks of at most 7 ids, then the summary
+        rows = dict(self.connection.execute(text("SELECT id, derived FROM items")).all())
+        self.assertEqual(rows[1], "v1")
+        self.assertEqual(rows[10], "done")
+        self.assertNotIn(None, rows.values())
+
+    def test_backfill_resumes_after_crash_and_skips_when_finished(self):
+        def crash_after_three_chunks(line):
+            if "up to 21 " in line:
+                raise Crash()
+
+        with self.assertRaises(Crash):
+            self.backfill(crash_after_three_chunks)
+        updated = self.connection.execute(text("SELECT count(*) FROM items WHERE derived IS NOT NULL")).scalar()
+        self.assertEqual(updated, 10 + 19)
+
+        resumed = []
+        self.assertEqual(self.backfill(resumed.append), 90)
+        self.assertIn("up to 28 ", resumed[0])
+        self.assertEqual(self.backfill(resumed.append), 90)
+        self.assertIn("already finished", resumed[-1])
+
+        reset_backfill("test_items", connection=self.connection)
+        self.assertEqual(self.backfill(), 0)
+
+    def test_index_helpers_are_idempotent(self):
+        for _ in range(2):
+            create_index_concurrently("ix_items_derived", "items", ["derived"], connection=self.connection)
+        indexes = self.connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars()
+        self.assertIn("ix_items_derived", list(indexes))
+        for _ in range(2):
+            drop_index_concurrently("ix_items_derived", connection=self.connection)
+        indexes = self.connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars()
+        self.assertNotIn("ix_items_derived", list(indexes))
+
+
+if __name__ == "__main__":
+    unittest.main()
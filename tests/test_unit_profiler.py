@@ -0,0 +1,82 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import AsyncMock
+
+from src.middleware.profiler import ProfilerMiddleware, sign_profile_token, verify_profile_token
+
+
+def busy_handler():
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def app(scope, receive, send):
+    busy_handler()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+class TestProfiler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.middleware = ProfilerMiddleware(app, "profile-secret", self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def scope(self, headers):
+        return {"type": "http", "method": "GET", "path": "/api/contacts/", "headers": headers}
+
+    def test_token(self):
+        token = sign_profile_token("profile-secret", int(time.time()) + 60)
+        self.assertTrue(verify_profile_token("profile-secret", token))
+        self.assertFalse(verify_profile_token("other-secret", token))
+        expired = sign_profile_token("profile-secret", int(time.time()) - 1)
+        self.assertFalse(verify_profile_token("profile-secret", expired))
+        self.assertFalse(verify_profile_token("profile-secret", "garbage"))
+
+    async def test_profiled_request(self):
+        token = sign_profile_token("profile-secret", int(time.time()) + 60)
+        send = AsyncMock()
+        await self.middleware(self.scope([(b"x-profile", token.encode())]), AsyncMock(), send)
+        headers = dict(send.await_args_list[0].args[0]["headers"])
+        summary = headers[b"x-profile-summary"].decode()
+        self.assertIn("samples=", summary)
+        [filename] = os.listdir(self.directory.name)
+        with open(os.path.join(self.directory.name, filename)) as file:
+            self.assertIn("busy_handler", file.read())
+
+    async def test_streamed_response_is_passed_through(self):
+        chunks = []
+
+        async def streaming_app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            for n in range(3):
+                await send({"type": "http.response.body", "body": b"data: %d\n\n" % n, "more_body": True})
+                # each chunk reaches the client before the next is produced
+                self.assertEqual(len(chunks), n + 2)
+            await send({"type": "http.response.body", "body": b""})
+
+        async def send(message):
+            chunks.append(message)
+
+        middleware = ProfilerMiddleware(streaming_app, "profile-secret", self.directory.name)
+        token = sign_profile_token("profile-secret", int(time.time()) + 60)
+        await middleware(self.scope([(b"x-profile", token.encode())]), AsyncMock(), send)
+        self.assertEqual(len(chunks), 5)
+        self.assertIn(b"streaming", dict(chunks[0]["headers"])[b"x-profile-summary"])
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+
+    async def test_request_without_valid_header_is_not_profiled(self):
+        for headers in ([], [(b"x-profile", b"1.forged")]):
+            send = AsyncMock()
+            await self.middleware(self.scope(headers), AsyncMock(), send)
+            self.assertNotIn(b"x-profile-summary", dict(send.await_args_list[0].args[0]["headers"]))
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
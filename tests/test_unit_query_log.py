@@ -0,0 +1,51 @@
+import unittest
+from unittest.mock import patch
+
+from src.database.query_log import QueryLog
+from src.services.request_context import request_scope
+
+
+class _Route:
+    path = "/api/contacts/birthdays"
+
+
+class TestQueryLog(unittest.TestCase):
+    def setUp(self):
+        self.query_log = QueryLog(threshold_ms=100)
+
+    def test_aggregates_by_fingerprint(self):
+        self.query_log.record("SELECT * FROM contacts WHERE id = 1", 0.010, 1)
+        self.query_log.record("SELECT * FROM contacts WHERE id = 2", 0.030, 1)
+        self.query_log.record("DELETE FROM contacts WHERE id = 2", 0.001, 1)
+        top, second = self.query_log.report(order_by="total")
+        self.assertEqual(top["fingerprint"], "SELECT * FROM contacts WHERE id = ?")
+        self.assertEqual(top["count"], 2)
+        self.assertEqual(top["rows"], 2)
+        self.assertAlmostEqual(top["total"], 40)
+        self.assertAlmostEqual(top["p95"], 10)
+        self.assertAlmostEqual(top["max"], 30)
+        self.assertEqual(second["count"], 1)
+
+    def test_slow_query_is_logged_with_route(self):
+        token = request_scope.set({"method": "GET", "path": "/api/contacts/birthdays", "route": _Route})
+        try:
+            with patch("src.database.query_log.logger") as logger:
+                self.query_log.record("SELECT 1", 0.5, 1)
+                self.query_log.record("SELECT 2", 0.01, 1)
+        finally:
+            request_scope.reset(token)
+        logger.warning.assert_called_once()
+        self.assertIn("GET /api/contacts/birthdays", logger.warning.call_args.args)
+        [row] = self.query_log.report()
+        self.assertEqual(row["routes"], {"GET /api/contacts/birthdays": 2})
+
+    def test_fingerprints_are_bounded(self):
+        query_log = QueryLog(threshold_ms=100, max_fingerprints=2)
+        for table in ("a", "b", "c", "d"):
+            query_log.record(f"SELECT * FROM {table}", 0.001, 0)
+        fingerprints = {row["fingerprint"] for row in query_log.report()}
+        self.assertEqual(fingerprints, {"SELECT * FROM a", "SELECT * FROM b", QueryLog.OTHER})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.services.rate_limit import RateLimiter
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.limiter = RateLimiter()
+
+    def test_local_bucket(self):
+        self.assertEqual(self.limiter.hit("user:1", 2, 30), (True, 0))
+        self.assertEqual(self.limiter.hit("user:1", 2, 30), (True, 0))
+        allowed, retry_after = self.limiter.hit("user:1", 2, 30)
+        self.assertFalse(allowed)
+        self.assertGreater(retry_after, 0)
+        self.assertTrue(self.limiter.hit("user:2", 2, 30)[0])
+        self.assertEqual(self.limiter.stats["redis_round_trips"], 0)
+
+    async def test_sync_batches_hits_in_one_round_trip(self):
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[1, True, 5, True])
+        self.limiter.redis = MagicMock()
+        self.limiter.redis.pipeline.return_value = pipe
+        self.limiter.hit("user:1", 5, 30)
+        self.limiter.hit("user:2", 5, 30)
+        await self.limiter.sync()
+        self.assertEqual(pipe.incrby.call_count, 2)
+        self.assertEqual(self.limiter.stats["redis_round_trips"], 1)
+        self.assertTrue(self.limiter.hit("user:1", 5, 30)[0])
+        self.assertFalse(self.limiter.hit("user:2", 5, 30)[0])
+
+    async def test_redis_failure_degrades_to_local(self):
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(side_effect=ConnectionError("redis is down"))
+        self.limiter.redis = MagicMock()
+        self.limiter.redis.pipeline.return_value = pipe
+        self.limiter.hit("user:1", 5, 30)
+        await self.limiter.sync()
+        self.assertEqual(self.limiter.stats["redis_errors"], 1)
+        self.assertEqual(self.limiter._pending["user:1"][0], 1)
+        self.assertTrue(self.limiter.hit("user:1", 5, 30)[0])
+
+
+    async def test_idle_keys_are_pruned_without_redis(self):
+        with patch("src.services.rate_limit.time.monotonic", return_value=1000.0):
+            self.limiter.hit("user:1", 5, 30)
+            self.limiter._blocked_until["user:2"] = 1010.0
+            await self.limiter.sync()
+            await self.limiter.sync()
+        self.assertIn("user:1", self.limiter._buckets)
+        with patch("src.services.rate_limit.time.monotonic", return_value=1100.0):
+            await self.limiter.sync()
+        self.assertEqual((self.limiter._buckets, self.limiter._blocked_until), ({}, {}))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from fakeredis import FakeAsyncRedis
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from src.services.redis_pool import LockTimeout, RedisPool, get_redis, redis_pool
+
+
+class TestRedisPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.pool = RedisPool(max_connections=10, socket_timeout=1)
+        self.redis = self.pool.start(FakeAsyncRedis())
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+
+    async def test_get_many_and_set_many(self):
+        await self.pool.set_many({"a": "1", "b": "2"}, ttl=60)
+        await self.pool.set_many({"c": "3"})
+        self.assertEqual(await self.pool.get_many(["a", "b", "c", "missing"]), {"a": b"1", "b": b"2", "c": b"3"})
+        self.assertGreater(await self.redis.pttl("a"), 0)
+        self.assertEqual(await self.redis.pttl("c"), -1)
+        self.assertEqual(await self.pool.get_many([]), {})
+
+    async def test_commands_and_pipelines_are_timed(self):
+        await self.pool.set_many({"a": "1", "b": "2"}, ttl=60)
+        await self.pool.get_many(["a", "b"])
+        await self.redis.get("a")
+        report = {row["command"]: row for row in self.pool.report()}
+        self.assertEqual(report["PIPELINE"]["count"], 1)
+        self.assertEqual(report["MGET"]["count"], 1)
+        self.assertEqual(report["GET"]["count"], 1)
+        self.pool.reset()
+        self.assertEqual(self.pool.report(), [])
+
+    async def test_lock_is_exclusive_and_released_by_its_holder_only(self):
+        async with self.pool.lock("job", ttl=5):
+            with self.assertRaises(LockTimeout):
+                async with self.pool.lock("job", wait=0.1):
+                    pass
+            # a stale holder must not release a lock taken over by someone else
+            await self.redis.set("lock:job", "other")
+        self.assertEqual(await self.redis.get("lock:job"), b"other")
+        await self.redis.delete("lock:job")
+        async with self.pool.lock("job", wait=0.1):
+            pass
+        self.assertIsNone(await self.redis.get("lock:job"))
+
+    async def test_single_flight_computes_once(self):
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "value"
+
+        results = await asyncio.gather(
+            *(self.pool.single_flight("report", compute, ttl=60) for _ in range(5))
+        )
+        self.assertEqual(calls, 1)
+        self.assertEqual(results, [b"value"] * 5)
+        self.assertEqual(await self.redis.get("report"), b"value")
+
+
+class TestGetRedis(unittest.TestCase):
+    def setUp(self):
+        app = FastAPI()
+
+        @app.get("/ping")
+        async def ping(redis=Depends(get_redis)):
+            return {"pong": await redis.ping()}
+
+        self.client = TestClient(app)
+
+    def test_injects_the_shared_client(self):
+        asyncio.run(redis_pool.close())
+        redis_pool.start(FakeAsyncRedis())
+        try:
+            response = self.client.get("/ping")
+        finally:
+            asyncio.run(redis_pool.close())
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.json(), {"pong": True})
+
+    def test_unavailable_redis_is_503(self):
+        with patch.object(redis_pool, "start", side_effect=ConnectionError("down")):
+            response = self.client.get("/ping")
+        self.assertEqual(response.status_code, 503, response.text)
+
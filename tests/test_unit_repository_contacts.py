@@ -1,19 +1,21 @@
 import unittest
-from unittest.mock import MagicMock, Mock, AsyncMock
+from unittest.mock import MagicMock, Mock, AsyncMock, patch
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 
 
 from src.entity.models import Contact, User
-from src.schemas.contact import ContactSchema, ContactUpdateSchema, ContactResponse
+from src.schemas.contact import ContactSchema, ContactUpdateSchema, ContactResponse, BatchCreate, BatchUpdate
 from src.repository.contacts import (
     get_contacts,
+    get_contacts_page,
     get_contact,
     create_contact,
     update_contact,
     delete_contact,
     get_upcoming_birthdays,
+    _batch_conflicts,
 )
 
 
@@ -23,6 +25,9 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.user = MagicMock(spec=User)
         self.user.id = 1
         self.user._sa_instance_state = MagicMock()
+        publisher = patch("src.repository.contacts.contact_events.publish", new_callable=AsyncMock)
+        self.publish = publisher.start()
+        self.addCleanup(publisher.stop)
 
     async def test_get_contacts(self):
         limit = 10
@@ -47,6 +52,20 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         result = await get_contacts(limit, offset, self.session, self.user)
         self.assertEqual(result, contacts)
 
+    async def test_get_contacts_page_estimate(self):
+        self.session.get_bind.return_value.dialect.name = "postgresql"
+        page = Mock()
+        page.scalars.return_value.all.return_value = [Contact(id=n) for n in range(10)]
+        plan = Mock()
+        plan.scalar.return_value = '[{"Plan": {"Plan Rows": 1234}}]'
+        self.session.execute.side_effect = [page, plan, page, plan]
+        contacts, total, mode = await get_contacts_page(10, 0, "estimate", self.session, self.user)
+        self.assertEqual((len(contacts), total, mode), (10, 1234, "estimate"))
+        self.assertIn("EXPLAIN", str(self.session.execute.call_args_list[1].args[0]))
+        # never less than the contacts already seen
+        _, total, _ = await get_contacts_page(10, 5000, "estimate", self.session, self.user)
+        self.assertEqual(total, 5010)
+
     async def test_get_contact(self):
         contact = Contact(
             id=1,
@@ -67,6 +86,21 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         )
         self.assertEqual(result, contact)
 
+    async def test_get_contact_uses_exact_match_for_full_email_and_phone(self):
+        self.session.execute.return_value = MagicMock()
+        await get_contact(None, None, " Test@Email.COM ", self.session, self.user, phone="+1 (050) 123-4567")
+        sql = str(self.session.execute.call_args.args[0].compile(compile_kwargs={"literal_binds": True}))
+        self.assertIn("contacts.email_normalized = 'test@email.com'", sql)
+        self.assertIn("contacts.phone_normalized = '10501234567'", sql)
+        self.assertNotIn("LIKE", sql.upper())
+
+    async def test_get_contact_falls_back_to_substring_match(self):
+        self.session.execute.return_value = MagicMock()
+        await get_contact(None, None, "email.com", self.session, self.user, phone="123")
+        sql = str(self.session.execute.call_args.args[0].compile(compile_kwargs={"literal_binds": True}))
+        self.assertIn("lower(contacts.email) LIKE lower('%email.com%')", sql)
+        self.assertIn("contacts.phone_normalized LIKE '%' || '123' || '%'", sql)
+
     async def test_create_contact(self):
         body = ContactSchema(
             name="user_1",
@@ -82,6 +116,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result.email, body.email)
         self.assertEqual(result.phone, body.phone)
         self.assertEqual(result.birthday, body.birthday)
+        self.publish.assert_awaited_once_with(1, [("create", result.id)])
 
     async def test_update_contact(self):
         body = ContactUpdateSchema(email="test@email.com", phone="111111111")
@@ -98,6 +133,10 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.assertIsInstance(result, Contact)
         self.assertEqual(result.phone, body.phone)
         self.assertEqual(result.email, body.email)
+        self.publish.assert_awaited_once_with(1, [("update", 1)])
+        # the partition key is always part of the statement
+        sql = str(self.session.execute.call_args_list[0].args[0])
+        self.assertIn("contacts.user_id = :user_id_1", sql)
 
     async def test_delete_contact(self):
         mocked_contact = MagicMock()
@@ -114,6 +153,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.session.delete.assert_called_once()
         self.session.commit.assert_called_once()
         self.assertIsInstance(result, Contact)
+        self.publish.assert_awaited_once_with(1, [("delete", 1)])
 
     async def test_get_upcoming_birthdays(self):
         today = datetime.today()
@@ -135,6 +175,21 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.session.execute.assert_called_once()
         self.assertEqual(result, [contact])
 
+    async def test_batch_conflicts(self):
+        result_mock = MagicMock()
+        result_mock.all.return_value = [(7, "taken@email.com", "0000000007")]
+        self.session.execute.return_value = result_mock
+        data = dict(name="user_1", surname="sur_user_1", phone="111111111", birthday="1986-10-25")
+        items = list(enumerate([
+            BatchCreate(op="create", data=ContactSchema(**data, email="new@email.com")),
+            BatchCreate(op="create", data=ContactSchema(**{**data, "phone": "222222222"}, email="new@email.com")),
+            BatchCreate(op="create", data=ContactSchema(**{**data, "phone": "333333333"}, email="taken@email.com")),
+            BatchUpdate(op="update", id=7, data=ContactUpdateSchema(email="taken@email.com")),
+            BatchUpdate(op="update", id=8, data=ContactUpdateSchema(phone="0000000007")),
+        ]))
+        self.assertEqual(await _batch_conflicts(items, self.session, self.user), {1, 2, 4})
+        self.session.execute.assert_called_once()
+
 
 if __name__ == "__main__":
     unittest.main()
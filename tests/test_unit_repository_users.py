@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import MagicMock, Mock, AsyncMock, patch
 
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -12,6 +13,7 @@ from src.repository.users import (
     update_token,
     confirmed_email,
     update_avatar,
+    rotate_refresh_token,
 )
 
 
@@ -33,10 +35,27 @@ class TestUsers(unittest.IsolatedAsyncioTestCase):
         body = UserSchema(
             username="test_user", email="test@email.com", password="secret"
         )
+        user = User(**body.model_dump())
+        result_mock = MagicMock()
+        result_mock.scalar_one_or_none.return_value = user
+        self.session.execute.return_value = result_mock
+
         result = await create_user(body, self.session)
-        self.assertIsInstance(result, User)
-        self.assertEqual(result.email, body.email)
-        self.assertEqual(result.password, body.password)
+        self.assertEqual(result, user)
+        stmt = self.session.execute.await_args.args[0]
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        self.assertIn("ON CONFLICT (email) DO NOTHING", sql)
+        self.assertIn("RETURNING", sql)
+        self.session.commit.assert_awaited_once()
+
+    async def test_create_user_existing_email(self):
+        body = UserSchema(
+            username="test_user", email="test@email.com", password="secret"
+        )
+        result_mock = MagicMock()
+        result_mock.scalar_one_or_none.return_value = None
+        self.session.execute.return_value = result_mock
+        self.assertIsNone(await create_user(body, self.session))
 
     async def test_update_token(self):
         token = "new_refresh_token"
@@ -45,21 +64,33 @@ class TestUsers(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(self.user.refresh_token, token)
         self.session.commit.assert_awaited_once()
 
-    @patch("src.repository.users.get_user_by_email")
-    async def test_confirmed_email(self, mock_get_user_by_email):
-        email = "test@email.com"
-        mock_get_user_by_email.return_value = self.user
-        await confirmed_email(email, self.session)
-        self.assertTrue(self.user.confirmed)
+    async def test_rotate_refresh_token(self):
+        result_mock = MagicMock()
+        result_mock.scalar_one_or_none.return_value = 1
+        self.session.execute.return_value = result_mock
+        self.assertTrue(await rotate_refresh_token("test@email.com", "old", "new", self.session))
+        sql = str(self.session.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+        self.assertIn("users.refresh_token = %(refresh_token_1)s", sql)
+
+        result_mock.scalar_one_or_none.return_value = None
+        self.assertFalse(await rotate_refresh_token("test@email.com", "stale", "new", self.session))
+
+    async def test_confirmed_email(self):
+        user = User(id=1, email="test@email.com")
+        await confirmed_email(user, self.session)
+        sql = str(self.session.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+        self.assertTrue(sql.endswith("confirmed=%(confirmed)s WHERE users.id = %(id_1)s"), sql)
         self.session.commit.assert_awaited_once()
 
-    @patch("src.repository.users.get_user_by_email")
-    async def test_update_avatar(self, mock_get_user_by_email):
-        email = "test@email.com"
-        avatar = "test_avatar_url"
-        mock_get_user_by_email.return_value = self.user
-        result = await update_avatar(email, avatar, self.session)
-        self.assertEqual(self.user.avatar, avatar)
+    async def test_update_avatar(self):
+        user = User(id=1, email="test@email.com")
+        updated = User(id=1, email="test@email.com", avatar="test_avatar_url")
+        result_mock = MagicMock()
+        result_mock.scalar_one.return_value = updated
+        self.session.execute.return_value = result_mock
+        result = await update_avatar(user, "test_avatar_url", self.session)
+        self.assertEqual(result, updated)
+        self.session.execute.assert_awaited_once()
         self.session.commit.assert_awaited_once()
 
 
@@ -0,0 +1,96 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from src.services.redis_pool import RedisPool
+from src.services.token_denylist import BloomFilter, TokenDenylist
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+        for n in range(10_000):
+            bloom.add(f"revoked-{n}")
+        self.assertTrue(all(f"revoked-{n}" in bloom for n in range(10_000)))
+        false_positives = sum(f"valid-{n}" in bloom for n in range(10_000))
+        self.assertLess(false_positives, 300)
+
+
+class TestTokenDenylist(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        server = FakeServer()
+        # two workers, each with its own pool, sharing one Redis
+        self.pools = [RedisPool(max_connections=10, socket_timeout=1) for _ in range(2)]
+        for pool in self.pools:
+            pool.start(FakeAsyncRedis(server=server))
+        self.workers = [TokenDenylist(pool, "revoked_tokens", capacity=1000, error_rate=0.001) for pool in self.pools]
+
+    async def asyncTearDown(self):
+        for pool in self.pools:
+            await pool.close()
+
+    async def test_unknown_tokens_are_checked_without_redis(self):
+        worker = self.workers[0]
+        await worker.revoke("abc", time.time() + 60)
+        self.assertTrue(await worker.is_revoked("abc"))
+        self.pools[0].reset()
+        self.assertFalse(await worker.is_revoked("def"))
+        self.assertFalse(await worker.is_revoked(None))
+        self.assertEqual(self.pools[0].report(), [])
+
+    async def test_revocation_reaches_other_workers(self):
+        watcher = asyncio.create_task(self.workers[1].watch())
+        try:
+            await self.workers[0].revoke("before", time.time() + 60)
+            for _ in range(100):
+                if self.workers[1].loaded:
+                    break
+                await asyncio.sleep(0.01)
+            await self.workers[0].revoke("after", time.time() + 60)
+            for _ in range(200):
+                if "after" in self.workers[1].filter:
+                    break
+                await asyncio.sleep(0.01)
+            self.assertTrue(await self.workers[1].is_revoked("before"))
+            self.assertTrue(await self.workers[1].is_revoked("after"))
+        finally:
+            watcher.cancel()
+            await asyncio.gather(watcher, return_exceptions=True)
+
+    async def test_redis_outage_rejects_only_probable_hits(self):
+        worker = self.workers[0]
+        await worker.revoke("abc", time.time() + 60)
+        worker.watching = True
+        with patch.object(self.pools[0], "start", side_effect=ConnectionError("down")):
+            # never loaded: nothing to go by, so tokens are let through
+            self.assertFalse(await worker.is_revoked("def"))
+            worker.loaded = True
+            self.assertTrue(await worker.is_revoked("abc"))
+            self.assertFalse(await worker.is_revoked("def"))
+
+    async def test_watcher_error_keeps_the_loaded_filter(self):
+        worker = self.workers[0]
+        await worker.revoke("abc", time.time() + 60)
+        await worker.load()
+        with patch.object(self.pools[0], "start", side_effect=ConnectionError("down")):
+            watcher = asyncio.create_task(worker.watch())
+            await asyncio.sleep(0.05)
+            try:
+                self.assertTrue(worker.loaded)
+                self.assertIn("abc", worker.filter)
+                self.assertFalse(await worker.is_revoked("def"))
+            finally:
+                watcher.cancel()
+                await asyncio.gather(watcher, return_exceptions=True)
+
+    async def test_expired_ids_are_dropped_on_load(self):
+        redis = self.pools[0].client
+        await redis.zadd("revoked_tokens", {"expired": time.time() - 1})
+        await self.workers[0].revoke("live", time.time() + 60)
+        await self.workers[1].load()
+        self.assertEqual(await redis.zrange("revoked_tokens", 0, -1), [b"live"])
+        self.assertIn("live", self.workers[1].filter)
+        self.assertNotIn("expired", self.workers[1].filter)
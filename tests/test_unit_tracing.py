@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from src.middleware.tracing import TracingMiddleware
+from src.services.tracing import JsonLinesExporter, Tracer, parse_traceparent
+
+
+class TestTracing(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "spans.jsonl")
+        self.tracer = Tracer(1.0, JsonLinesExporter(self.path))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    async def read_spans(self):
+        await self.tracer.exporter.flush()
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as file:
+            return [json.loads(line) for line in file]
+
+    def test_parse_traceparent(self):
+        trace_id, parent_id, sampled = parse_traceparent(
+            "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-00"
+        )
+        self.assertEqual(trace_id, "4bf92f3577b34da6a3ce929d0e0e4736")
+        self.assertEqual(parent_id, "00f067aa0ba902b7")
+        self.assertFalse(sampled)
+        self.assertIsNone(parse_traceparent("00-0000-0000-01"))
+        self.assertIsNone(parse_traceparent(None))
+
+    async def test_nested_spans(self):
+        with self.tracer.span("parent") as parent:
+            with self.tracer.span("child", key="value") as child:
+                pass
+        spans = {span["name"]: span for span in await self.read_spans()}
+        self.assertEqual(spans["child"]["parentSpanId"], parent.span_id)
+        self.assertEqual(spans["child"]["traceId"], parent.trace_id)
+        self.assertEqual(spans["child"]["attributes"], [{"key": "key", "value": "value"}])
+        self.assertEqual(spans["parent"]["parentSpanId"], "")
+        self.assertNotEqual(child.span_id, parent.span_id)
+
+    async def test_unsampled_trace_is_not_exported(self):
+        self.tracer.sample_ratio = 0.0
+        with self.tracer.span("parent"):
+            with self.tracer.span("child"):
+                pass
+        self.assertEqual(await self.read_spans(), [])
+
+    async def test_middleware_continues_incoming_trace(self):
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        send = AsyncMock()
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/contacts/",
+            "headers": [(b"traceparent", b"00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01")],
+        }
+        with patch("src.middleware.tracing.tracer", self.tracer):
+            await TracingMiddleware(app)(scope, AsyncMock(), send)
+        headers = dict(send.await_args_list[0].args[0]["headers"])
+        self.assertTrue(headers[b"traceparent"].startswith(b"00-4bf92f3577b34da6a3ce929d0e0e4736-"))
+        [span] = await self.read_spans()
+        self.assertEqual(span["parentSpanId"], "00f067aa0ba902b7")
+        self.assertEqual(span["kind"], "server")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.entity.models import Contact
+from src.services.metrics import cache_requests
+from src.services.typeahead import PrefixIndex, Typeahead
+
+CONTACTS = [
+    (1, "Olena", "Shevchenko", "olena.shevchenko@gmail.com"),
+    (2, "Oleh", "Melnyk", "oleh@ukr.net"),
+    (3, "Ivan", "Oliynyk", "ivan.o@example.org"),
+]
+
+
+class TestPrefixIndex(unittest.TestCase):
+    def test_search_by_prefix_of_any_field(self):
+        index = PrefixIndex(CONTACTS)
+        self.assertEqual([s["id"] for s in index.search("OLE", 10)], [2, 1])
+        self.assertEqual([s["id"] for s in index.search("ol", 10)], [2, 1, 3])
+        self.assertEqual([s["id"] for s in index.search("ol", 2)], [2, 1])
+        self.assertEqual([s["id"] for s in index.search("olena shev", 10)], [1])
+        self.assertEqual(index.search("olena mel", 10), [])
+        self.assertEqual(index.search("  ", 10), [])
+
+    def test_incremental_add_update_and_remove(self):
+        index = PrefixIndex(CONTACTS)
+        index.add(4, "Taras", "Boyko", "taras@proton.me")
+        self.assertEqual([s["id"] for s in index.search("ta", 10)], [4])
+        index.add(4, "Taras", "Koval", "taras@proton.me")
+        self.assertEqual(index.search("boy", 10), [])
+        self.assertEqual(index.search("kov", 10)[0]["surname"], "Koval")
+        index.remove(4)
+        index.remove(4)
+        self.assertEqual(index.search("ta", 10), [])
+        self.assertEqual(len(index.entries), 9)
+
+
+class TestTypeahead(unittest.IsolatedAsyncioTestCase):
+    def session(self):
+        session = MagicMock(spec=AsyncSession)
+        result = MagicMock()
+        result.all.return_value = list(CONTACTS)
+        session.execute = AsyncMock(return_value=result)
+        return session
+
+    async def test_index_is_built_once_and_kept_current(self):
+        typeahead = Typeahead(max_users=10, ttl=60)
+        db = self.session()
+        self.assertEqual(len(await typeahead.suggest("ol", 10, db, 1)), 3)
+        typeahead.add(Contact(id=4, name="Olga", surname="Rudenko", email="olga@example.org", user_id=1))
+        typeahead.remove(1, 2)
+        self.assertEqual([s["id"] for s in await typeahead.suggest("ol", 10, db, 1)], [1, 4, 3])
+        db.execute.assert_awaited_once()
+
+    async def test_least_recently_used_index_is_evicted(self):
+        typeahead = Typeahead(max_users=2, ttl=60)
+        db = self.session()
+        hits, misses = cache_requests.value("typeahead", "hit"), cache_requests.value("typeahead", "miss")
+        for user_id in (1, 2, 1, 3, 1):
+            await typeahead.suggest("ol", 10, db, user_id)
+        self.assertEqual(list(typeahead._indexes), [3, 1])
+        self.assertEqual(db.execute.await_count, 3)
+        self.assertEqual(cache_requests.value("typeahead", "hit") - hits, 2)
+        self.assertEqual(cache_requests.value("typeahead", "miss") - misses, 3)